@@ -0,0 +1,126 @@
+"""
+Address normalization for geocoding.
+
+Project addresses come in many spellings of the same place ("Av. Providencia
+1234", "AVENIDA PROVIDENCIA N° 1234, Providencia", "Avda Providencia 1234
+depto 501"). canonical_address() reduces address, commune and region to one
+comparable form, used to group projects before geocoding and as the
+geocoding cache key:
+
+    canonical_address("Av. Providencia N° 1234 Depto 501", "Providencia", "RM")
+    → "avenida providencia 1234|providencia|rm"
+
+Steps: accent folding and lowercasing, punctuation to spaces, abbreviation
+expansion (ABBREVIATIONS, plus the positional AFTER_NAME / BEFORE_NAME
+ones), dropping number markers ("N°", "nro") and unit
+details (depto, oficina, torre, ... after the street number), dropping a
+repetition of the commune after the street number, and extracting the
+street number (the number ending the address, without leading zeros).
+Results are memoized per distinct input, since a run sees the same handful
+of spellings many times.
+"""
+from __future__ import annotations
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+ABBREVIATIONS = {
+    "av": "avenida", "avda": "avenida", "avd": "avenida", "ave": "avenida",
+    "pje": "pasaje", "psje": "pasaje",
+    "cll": "calle",
+    "cno": "camino", "cam": "camino",
+    "pob": "poblacion", "vla": "villa",
+    "km": "kilometro",
+    "gral": "general", "pdte": "presidente", "cdte": "comandante", "almte": "almirante",
+    "cnel": "coronel", "tte": "teniente", "sgto": "sargento", "dr": "doctor", "prof": "profesor",
+    "sta": "santa", "sto": "santo", "stgo": "santiago",
+    "nte": "norte", "ote": "oriente",
+}
+# "Pte." depends on position: "Av. Pte. Kennedy" (presidente) and "Pte. Alto"
+# (puente) lead the street name, while "Kennedy Pte." (poniente) follows it
+STREET_TYPES = {"avenida", "pasaje", "calle", "camino", "poblacion", "villa"}
+AFTER_NAME = {"pte": "poniente", "pnte": "poniente"}
+BEFORE_NAME = {"pte": "presidente"}
+NUMBER_MARKERS = {"n", "no", "nro", "num", "numero"}  # dropped when a number follows
+UNIT_MARKERS = {
+    "depto", "dpto", "dto", "departamento", "of", "ofic", "oficina",
+    "local", "loc", "torre", "block", "piso", "bodega",
+}
+NO_NUMBER = ("s n", "sn", "sin numero")  # "S/N"
+METROPOLITAN_REGION = {"", "rm", "metropolitana", "region metropolitana", "region metropolitana de santiago", "xiii", "13"}
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+class ParsedAddress(NamedTuple):
+    street: str
+    number: Optional[str]
+
+
+def fold(text) -> str:
+    """Lowercase, strip accents (ñ → n) and turn punctuation into single spaces."""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _NON_ALNUM.sub(" ", text).strip()
+
+
+@lru_cache(maxsize=None)
+def parse_address(address: str, commune: str = "") -> ParsedAddress:
+    """Street (abbreviations expanded) and street number of an address; number None when there is none."""
+    text = fold(address)
+    for no_number in NO_NUMBER:
+        text = re.sub(rf"\b{no_number}\b", " ", text)
+    tokens = [ABBREVIATIONS.get(t, t) for t in text.split()]
+    for i, t in enumerate(tokens):
+        if t in AFTER_NAME or t in BEFORE_NAME:
+            leading = i == 0 or tokens[i - 1] in STREET_TYPES
+            if t == "pte" and i + 1 < len(tokens) and tokens[i + 1] == "alto":
+                tokens[i] = "puente"
+            elif leading:
+                tokens[i] = BEFORE_NAME.get(t, t)
+            elif not tokens[i - 1].isdigit():
+                tokens[i] = AFTER_NAME[t]
+
+    # "N° 123" → "123"
+    tokens = [t for i, t in enumerate(tokens)
+              if not (t in NUMBER_MARKERS and i + 1 < len(tokens) and tokens[i + 1].isdigit())]
+
+    # Unit details after the street number ("1234 depto 501", "1234 of 3")
+    seen_number = False
+    for i, t in enumerate(tokens):
+        if t in UNIT_MARKERS and seen_number:
+            tokens = tokens[:i]
+            break
+        seen_number = seen_number or t.isdigit()
+
+    # "1234, Providencia" when the commune is Providencia (but not "Av. Providencia" itself)
+    commune_tokens = fold(commune).split()
+    if (commune_tokens and len(tokens) > len(commune_tokens) and tokens[-len(commune_tokens):] == commune_tokens
+            and any(t.isdigit() for t in tokens[:-len(commune_tokens)])):
+        tokens = tokens[:-len(commune_tokens)]
+
+    # The street number ends the address, at most followed by a letter ("1234 B");
+    # numbers inside the name ("Av. 10 de Julio") stay in the street.
+    last = len(tokens) - 1
+    if last > 0 and len(tokens[last]) == 1 and not tokens[last].isdigit():
+        last -= 1
+    if last <= 0 or not tokens[last].isdigit():
+        return ParsedAddress(" ".join(tokens), None)
+    return ParsedAddress(" ".join(tokens[:last]), str(int(tokens[last])))
+
+
+def canonical_region(region) -> str:
+    region = fold(region)
+    return "rm" if region in METROPOLITAN_REGION else region
+
+
+@lru_cache(maxsize=None)
+def canonical_address(address, commune, region) -> str:
+    """'street number|commune|region' in normalized form; equal for spellings of the same address."""
+    street, number = parse_address(address or "", commune or "")
+    street = f"{street} {number}" if number else street
+    return f"{street}|{fold(commune)}|{canonical_region(region)}"
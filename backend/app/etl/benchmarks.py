@@ -0,0 +1,677 @@
+"""
+ETL benchmarks on synthetic TINSA data (no network, no Supabase).
+
+Uso:
+    python -m app.etl.benchmarks parsing --rows 100000
+    python -m app.etl.benchmarks transform --rows 100000
+    python -m app.etl.benchmarks upload --rows 20000
+    python -m app.etl.benchmarks coordinates --rows 1000000
+    python -m app.etl.benchmarks import_tinsa --rows 100000
+    python -m app.etl.benchmarks bigquery --rows 200000
+    python -m app.etl.benchmarks excel --rows 20000
+    python -m app.etl.benchmarks postgres --rows 100000
+    python -m app.etl.benchmarks geocoding --rows 200  # filas = direcciones
+    python -m app.etl.benchmarks suite --rows 100000 --record  # Todos los importadores; guarda el resultado
+
+Los CSV sintéticos salen de app.etl.synthetic. Con --record cada corrida se
+agrega a data/benchmark_history.jsonl junto al commit; toda corrida se compara
+con la última registrada de otro commit (mismo benchmark y filas).
+"""
+from __future__ import annotations
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.etl.synthetic import COMMUNES, PERIODS, SEPARATOR_NAMES, TYPOLOGIES, make_synthetic_tinsa_frame, write_synthetic_tinsa_csv
+
+
+def write_synthetic_csv(rows: int, seed: int = 0, encoding: str = "utf-8", sep: str = "\t") -> Path:
+    """Write a synthetic TINSA CSV (tab-separated, UTF-8 unless told otherwise) to the temp dir, once."""
+    suffix = "" if (encoding, sep) == ("utf-8", "\t") else f"_{encoding}_{SEPARATOR_NAMES[sep]}"
+    path = Path(tempfile.gettempdir()) / f"tinsa_synthetic_{rows}_{seed}{suffix}.csv"
+    if not path.exists():
+        write_synthetic_tinsa_csv(path, rows, seed, encoding, sep)
+    return path
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_parsing(rows: int):
+    """Per-cell scalar parsing vs. column-level parse_columns on the TINSA column map."""
+    from app.etl.parsing import SCALAR_PARSERS, parse_columns
+    from app.etl.tinsa_importer import TINSA_COLUMN_TYPES, read_tinsa_csv
+
+    df = read_tinsa_csv(write_synthetic_csv(rows))
+    print(f"  Filas: {len(df):,}  Campos tipados: {len(TINSA_COLUMN_TYPES)}")
+
+    def scalar_pass():
+        out = {}
+        for field, (sources, kind) in TINSA_COLUMN_TYPES.items():
+            source = next((c for c in sources if c in df.columns), None)
+            cells = df[source].tolist() if source else [None] * len(df)
+            out[field] = [SCALAR_PARSERS[kind](v) for v in cells]
+        return out
+
+    scalar, t_scalar = _timed(scalar_pass)
+    typed, t_vector = _timed(parse_columns, df, TINSA_COLUMN_TYPES)
+
+    mismatches = 0
+    for field, expected in scalar.items():
+        got = typed[field].astype(object).where(typed[field].notna(), None).tolist()
+        mismatches += sum(1 for a, b in zip(expected, got) if a != b)
+
+    print(f"  Escalar (por celda): {t_scalar:8.3f} s")
+    print(f"  Vectorizado:         {t_vector:8.3f} s")
+    print(f"  Speedup:             {t_scalar / t_vector:8.1f}x")
+    print(f"  Diferencias:         {mismatches}")
+    return {"rows": len(df), "scalar_s": t_scalar, "vector_s": t_vector, "mismatches": mismatches}
+
+
+def bench_transform(rows: int):
+    """transform_projects end to end (parsing, latest-period selection, rollups) and period snapshots."""
+    from app.etl.tinsa_importer import add_typed_columns, read_tinsa_csv, transform_projects, transform_snapshots
+
+    df = read_tinsa_csv(write_synthetic_csv(rows))
+    (projects, typologies), elapsed = _timed(transform_projects, df)
+
+    print(f"  Filas: {len(df):,}  Proyectos: {len(projects):,}  Tipologías: {len(typologies):,}")
+    print(f"  Tiempo:              {elapsed:8.3f} s")
+    print(f"  Throughput:          {len(df) / elapsed:10,.0f} filas/s")
+
+    typed = add_typed_columns(df)
+    snapshots, snap_elapsed = _timed(transform_snapshots, typed)
+    print(f"  Snapshots:           {len(snapshots):,} en {snap_elapsed:.3f} s")
+    return {"rows": len(df), "transform_s": elapsed, "projects": len(projects), "typologies": len(typologies),
+            "snapshots": len(snapshots), "snapshots_s": snap_elapsed}
+
+
+def bench_upload(rows: int, latency: float = 0.02):
+    """
+    insert_projects + insert_typologies against LocalSupabase with a simulated
+    round-trip latency: one request at a time vs. the concurrent writer. ~1%
+    of projects are rejected so failing batches go through bisection.
+    """
+    import contextlib
+    import io
+
+    from app.etl.local_supabase import LocalSupabase
+    from app.etl.tinsa_importer import insert_projects, insert_typologies, read_tinsa_csv, transform_projects
+
+    df = read_tinsa_csv(write_synthetic_csv(rows))
+    projects, typologies = transform_projects(df)
+    rejected = {p["name"] for p in projects[::100]}
+
+    def reject(table, row):
+        return table == "projects" and row.get("name") in rejected
+
+    print(f"  Proyectos: {len(projects):,}  Tipologías: {len(typologies):,}  Latencia: {latency * 1000:.0f} ms/request")
+    result = {"rows": len(df), "projects": len(projects), "typologies": len(typologies)}
+    stored = {}
+    for concurrency in (1, 8):
+        client = LocalSupabase(latency=latency, reject=reject)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            ids = insert_projects(client, projects, concurrency=concurrency)
+            insert_typologies(client, [dict(t) for t in typologies], ids, concurrency=concurrency)
+            elapsed = time.perf_counter() - start
+        written = len(client.rows("projects")) + len(client.rows("project_typologies"))
+        stored[concurrency] = (
+            sorted((p["name"], p["commune"]) for p in client.rows("projects")),
+            len(client.rows("project_typologies")),
+        )
+        print(f"  Concurrencia {concurrency}: {elapsed:8.3f} s  {written / elapsed:10,.0f} filas/s  "
+              f"({client.requests} requests, {len(projects) - len(ids)} proyectos rechazados)")
+        result[f"c{concurrency}_s"] = elapsed
+
+    result["mismatches"] = int(stored[1] != stored[8])
+    print(f"  Speedup:             {result['c1_s'] / result['c8_s']:8.1f}x")
+    print(f"  Diferencias:         {result['mismatches']}")
+    return result
+
+
+def bench_coordinates(rows: int):
+    """normalize_coordinates on rows lat/lon pairs with lost decimals, swaps and junk."""
+    from app.etl.coordinates import format_repair_summary, normalize_coordinates
+
+    rng = np.random.default_rng(0)
+    lat = np.round(-rng.uniform(17, 56, rows), 6)
+    lon = np.round(-rng.uniform(66, 76, rows), 6)
+    lat_scale = rng.integers(0, 8, rows)
+    lon_scale = np.where(rng.uniform(0, 1, rows) < 0.8, lat_scale, rng.integers(0, 8, rows))
+    lat, lon = lat * 10.0 ** lat_scale, lon * 10.0 ** lon_scale
+    swapped = rng.uniform(0, 1, rows) < 0.2
+    lat, lon = np.where(swapped, lon, lat), np.where(swapped, lat, lon)
+    junk = rng.uniform(0, 1, rows) < 0.05
+    lat[junk] = rng.uniform(-1000, 1000, int(junk.sum()))
+    lat[rng.uniform(0, 1, rows) < 0.03] = np.nan
+
+    (_, _, reason), elapsed = _timed(normalize_coordinates, lat, lon)
+    print(f"  Pares:               {rows:,}")
+    print(f"  Tiempo:              {elapsed:8.3f} s")
+    print(f"  Throughput:          {rows / elapsed:10,.0f} pares/s")
+    print(f"  Reparaciones:        {format_repair_summary(reason)}")
+    return {"rows": rows, "normalize_s": elapsed}
+
+
+def _rowwise_tinsa_projects(df: pd.DataFrame, lats: list, lons: list) -> list[dict]:
+    """The former import_tinsa path: map_tinsa_to_supabase per row, then a dict merge."""
+    from app.etl.import_tinsa import map_tinsa_to_supabase
+
+    merged = {}
+    for pos, (_, row) in enumerate(df.iterrows()):
+        project = map_tinsa_to_supabase(row, coords=(lats[pos], lons[pos]))
+        if not (project and project.get("name") and project.get("commune")):
+            continue
+        existing = merged.setdefault((project["name"], project["commune"]), project)
+        if existing is project:
+            continue
+        for field, value in project.items():
+            if value is not None and (existing.get(field) is None or field in ("sold_units", "available_units")):
+                if field in ("sold_units", "available_units", "total_units"):
+                    existing[field] = max(existing.get(field, 0) or 0, value or 0)
+                else:
+                    existing[field] = value
+    return list(merged.values())
+
+
+def bench_import_tinsa(rows: int):
+    """import_tinsa transform + dedupe: row-wise map and dict merge vs. vectorized frame and groupby."""
+    import contextlib
+    import io
+
+    from app.etl.coordinates import normalize_coordinates
+    from app.etl.import_tinsa import build_projects_frame, deduplicate_projects, parse_coordinate_series
+
+    df = pd.read_csv(write_synthetic_csv(rows, sep=","), low_memory=False)
+    lats, lons, _ = normalize_coordinates(parse_coordinate_series(df["LATITUD"]), parse_coordinate_series(df["LONGITUD"]))
+    lats = [None if v != v else v for v in lats.tolist()]
+    lons = [None if v != v else v for v in lons.tolist()]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        rowwise, rowwise_elapsed = _timed(_rowwise_tinsa_projects, df, lats, lons)
+
+    def vectorized():
+        frame, _ = build_projects_frame(df, lats, lons)
+        return deduplicate_projects(frame)
+
+    projects, elapsed = _timed(vectorized)
+    identical = rowwise == projects and all(
+        type(a[k]) is type(b[k]) for a, b in zip(rowwise, projects) for k in a
+    )
+    print(f"  Filas: {len(df):,}  Proyectos únicos: {len(projects):,}")
+    print(f"  Por fila (iterrows): {rowwise_elapsed:8.3f} s")
+    print(f"  Vectorizado:         {elapsed:8.3f} s  ({rowwise_elapsed / elapsed:.1f}x)")
+    print(f"  Resultado idéntico:  {'sí' if identical else 'NO'}")
+    return {"rows": len(df), "rowwise_s": rowwise_elapsed, "vectorized_s": elapsed,
+            "projects": len(projects), "mismatches": 0 if identical else 1}
+
+
+def make_synthetic_bigquery_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Rows shaped like the BigQuery table as read by bigquery_to_supabase.COLUMN_MAP (~10 consecutive rows per project)."""
+    rng = np.random.default_rng(seed)
+    project = np.sort(rng.integers(0, max(1, rows // 10), rows))
+    commune = np.array([c for c, _, _ in COMMUNES], dtype=object)[project % len(COMMUNES)]
+    total = rng.integers(20, 400, rows)
+    sold = (total * rng.uniform(0, 1, rows)).astype(np.int64)
+    price = np.round(rng.uniform(1500, 15000, rows), 1)
+    price[rng.uniform(0, 1, rows) < 0.05] = np.nan
+    period = rng.integers(0, len(PERIODS), rows)
+    return pd.DataFrame({
+        "anio": np.array([y for y, _ in PERIODS])[period],
+        "periodo": np.array([p for _, p in PERIODS], dtype=object)[period],
+        "nombre_proyecto": [f"PROYECTO {p:06d}" for p in project],
+        "inmobiliaria": [f"INMOBILIARIA {p % 300:03d}" for p in project],
+        "comuna": commune,
+        "region": np.array([r for _, r, _ in COMMUNES], dtype=object)[project % len(COMMUNES)],
+        "direccion": [f"CALLE {p % 997} {p % 3000}" for p in project],
+        "latitud": np.round(-rng.uniform(18, 45, rows), 6),
+        "longitud": np.round(-rng.uniform(68, 73, rows), 6),
+        "total_unidades": total,
+        "unidades_vendidas": sold,
+        "unidades_disponibles": total - sold,
+        "precio_promedio_uf": price,
+        "precio_m2_uf": np.round(price / rng.uniform(40, 120, rows), 2),
+        "estado": np.where(sold < total, "EN VENTA", "AGOTADO").astype(object),
+        "tipo_propiedad": "DEPARTAMENTO",
+        # Columns the mapping never reads
+        "observaciones": [f"Proyecto {p} con observaciones de la fuente para el periodo" for p in project],
+        "tipologia": np.array(TYPOLOGIES, dtype=object)[rng.integers(0, len(TYPOLOGIES), rows)],
+        "superficie_promedio": np.round(rng.uniform(30, 140, rows), 2),
+        "precio_estacionamiento": np.round(rng.uniform(150, 600, rows), 1),
+        "precio_bodega": np.round(rng.uniform(40, 200, rows), 1),
+    })
+
+
+def bench_bigquery(rows: int, page_latency: float = 0.2, latency: float = 0.02):
+    """
+    bigquery_to_supabase against LocalBigQuery + LocalSupabase: fetch the
+    whole result then upload vs. streaming Arrow pages with the next page
+    downloading while the current one uploads; then bytes scanned and rows
+    transferred by SELECT *, the COLUMN_MAP projection and a watermark.
+    """
+    import contextlib
+    import io
+
+    from app.etl.bigquery_to_supabase import (
+        BATCH_SIZE, PAGE_SIZE, UPLOAD_CONCURRENCY, build_query, map_tinsa_to_supabase, normalize_watermark,
+        select_columns, stream_projects,
+    )
+    from app.etl.pipeline import iter_arrow_batches
+    from app.etl.local_bigquery import LocalBigQuery
+    from app.etl.local_supabase import LocalSupabase
+    from app.etl.writer import BatchWriter
+
+    data = make_synthetic_bigquery_frame(rows)
+    query = "SELECT * FROM `local.tinsa`"
+    print(f"  Filas: {rows:,}  Página: {PAGE_SIZE:,}  Latencia: {page_latency * 1000:.0f} ms/página, "
+          f"{latency * 1000:.0f} ms/request")
+
+    def full_fetch(bq, supabase):
+        import pyarrow as pa
+
+        table = pa.Table.from_batches(list(iter_arrow_batches(bq, query)))
+        projects = map_tinsa_to_supabase(table.to_pandas())
+        writer = BatchWriter(supabase, "projects", batch_size=BATCH_SIZE, concurrency=UPLOAD_CONCURRENCY)
+        return writer.upsert(projects, on_conflict="name,commune")
+
+    def streamed(bq, supabase):
+        return stream_projects(bq, supabase, query)[0].write
+
+    result = {"rows": rows}
+    stored = {}
+    for label, run in (("full", full_fetch), ("stream", streamed)):
+        bq = LocalBigQuery(data, latency=page_latency)
+        supabase = LocalSupabase(latency=latency)
+        with contextlib.redirect_stdout(io.StringIO()):
+            report, elapsed = _timed(run, bq, supabase)
+        stored[label] = sorted(tuple(sorted((k, str(v)) for k, v in r.items() if k != "id"))
+                               for r in supabase.rows("projects"))
+        print(f"  {'Todo y luego subir' if label == 'full' else 'Streaming por páginas'}: {elapsed:8.3f} s  "
+              f"({report.requests} requests, {len(stored[label]):,} proyectos)")
+        result[f"{label}_s"] = elapsed
+
+    result["mismatches"] = int(stored["full"] != stored["stream"])
+    print(f"  Speedup:             {result['full_s'] / result['stream_s']:8.1f}x")
+    print(f"  Diferencias:         {result['mismatches']}")
+
+    # Projection and watermark: bytes billed and rows transferred per query
+    bq = LocalBigQuery(data)
+    schema = {f.name: f.field_type for f in bq.get_table("local.tinsa").schema}
+    latest = normalize_watermark((max(y for y, _ in PERIODS), 1), schema)
+    for label, sql in (
+        ("SELECT *", build_query()),
+        ("Proyección", build_query(select_columns(set(schema)), field_types=schema)),
+        (f"Proyección + desde {latest[0]}-{latest[1]}", build_query(select_columns(set(schema)), latest, schema)),
+    ):
+        job = bq.query(sql)
+        print(f"  {label + ':':<28} {job.total_bytes_processed / 1e6:8.1f} MB escaneados, "
+              f"{job.table.num_rows:,} filas transferidas ({job.table.nbytes / 1e6:.1f} MB)")
+        result[f"{label}_bytes"] = job.total_bytes_processed
+    return result
+
+
+def write_synthetic_xlsx(rows: int, seed: int = 0) -> Path:
+    """Write a synthetic TINSA workbook (one sheet, header row) to the temp dir."""
+    from openpyxl import Workbook
+
+    path = Path(tempfile.gettempdir()) / f"tinsa_synthetic_{rows}_{seed}.xlsx"
+    if not path.exists():
+        df = make_synthetic_tinsa_frame(rows, seed)
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(list(df.columns))
+        for row in df.itertuples(index=False):
+            sheet.append([None if v != v else v for v in row])
+        workbook.save(path)
+    return path
+
+
+def bench_excel(rows: int, chunk_rows: int = 10_000):
+    """
+    Reading a TINSA .xlsx: pd.read_excel of the whole sheet vs. ExcelSource
+    streaming chunk_rows rows at a time with openpyxl in read-only mode.
+    Peak Python heap is measured (tracemalloc) in a separate pass, since
+    tracing slows both readers down.
+    """
+    import tracemalloc
+
+    from app.etl.pipeline import ExcelSource
+
+    path = write_synthetic_xlsx(rows)
+    print(f"  Archivo: {path.name} ({path.stat().st_size / 1e6:.1f} MB)  Chunk: {chunk_rows:,} filas")
+
+    def whole():
+        return [pd.read_excel(path)]
+
+    def streamed():
+        return ExcelSource(path, chunk_rows=chunk_rows)
+
+    def consume(read):
+        # Keep only row counts so the streamed pass holds one chunk at a time
+        return sum(len(chunk) for chunk in read())
+
+    result = {"rows": rows}
+    for label, read in (("whole", whole), ("stream", streamed)):
+        n, elapsed = _timed(consume, read)
+        tracemalloc.start()
+        consume(read)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  {'pd.read_excel' if label == 'whole' else 'ExcelSource streaming'}: {elapsed:8.3f} s  "
+              f"({n / elapsed:,.0f} filas/s, pico {peak / 1e6:,.1f} MB)")
+        result.update({f"{label}_s": elapsed, f"{label}_peak_mb": peak / 1e6})
+
+    expected = pd.read_excel(path)
+    streamed_df = pd.concat(list(streamed()), ignore_index=True)
+    result["mismatches"] = 0 if streamed_df.equals(expected) and (streamed_df.dtypes == expected.dtypes).all() else 1
+    print(f"  Resultado idéntico:  {'sí' if not result['mismatches'] else 'NO'}")
+    return result
+
+
+def bench_postgres(rows: int, latency: float = 0.02):
+    """
+    insert_projects + insert_typologies through the Supabase REST writer
+    (LocalSupabase) vs. COPY + INSERT ... ON CONFLICT (LocalPostgres), with
+    the same simulated latency per round trip; then the stored tables are
+    compared.
+    """
+    import contextlib
+    import io
+
+    from app.etl.local_postgres import LocalPostgres
+    from app.etl.local_supabase import LocalSupabase
+    from app.etl.postgres import PostgresClient
+    from app.etl.tinsa_importer import UPLOAD_CONCURRENCY, insert_projects, insert_typologies, read_tinsa_csv, transform_projects
+
+    df = read_tinsa_csv(write_synthetic_csv(rows))
+    projects, typologies = transform_projects(df)
+    print(f"  Proyectos: {len(projects):,}  Tipologías: {len(typologies):,}  Latencia: {latency * 1000:.0f} ms/round trip")
+
+    def stored(client, table, ids):
+        names = {v: k for k, v in ids.items()}
+        return sorted(
+            # SQLite stores booleans as 0/1
+            repr(sorted((k, names.get(v, v) if k == "project_id" else int(v) if isinstance(v, bool) else v)
+                        for k, v in row.items() if k not in ("id", "created_at", "updated_at") and v is not None))
+            for row in client.rows(table)
+        )
+
+    result = {"rows": len(df), "projects": len(projects), "typologies": len(typologies)}
+    tables = {}
+    for label in ("rest", "copy"):
+        db = LocalSupabase(latency=latency) if label == "rest" else LocalPostgres(latency=latency)
+        client = db if label == "rest" else PostgresClient(db)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            ids = insert_projects(client, projects, concurrency=UPLOAD_CONCURRENCY)
+            insert_typologies(client, [dict(t) for t in typologies], ids, concurrency=UPLOAD_CONCURRENCY)
+            elapsed = time.perf_counter() - start
+        round_trips = db.requests if label == "rest" else len(db.statements)
+        tables[label] = [stored(db, t, ids) for t in ("projects", "project_typologies")]
+        written = sum(len(t) for t in tables[label])
+        print(f"  {'REST upsert (c=' + str(UPLOAD_CONCURRENCY) + ')' if label == 'rest' else 'COPY + ON CONFLICT'}: "
+              f"{elapsed:8.3f} s  {written / elapsed:10,.0f} filas/s  ({round_trips} round trips)")
+        result[f"{label}_s"] = elapsed
+
+    result["mismatches"] = int(tables["rest"] != tables["copy"])
+    print(f"  Speedup:             {result['rest_s'] / result['copy_s']:8.1f}x")
+    print(f"  Diferencias:         {result['mismatches']}")
+    return result
+
+
+def bench_geocoding(rows: int, speedup: float = 10.0):
+    """
+    GeocodingService.geocode one address at a time vs. GeocodingScheduler on
+    `rows` addresses (~20% cached, ~20% repeated, ~30% unknown to Nominatim
+    and answered by Google), with LocalGeocoder as both providers. Rate limits
+    and latencies are PROVIDER_LIMITS and typical round trips sped up
+    `speedup` times; a request sent faster than the Nominatim limit is
+    rejected (and counted).
+    """
+    import contextlib
+    import io
+    import zlib
+
+    from app.etl.geocode_projects import GeocodingService
+    from app.etl.geocoding_cache import GeocodingCache
+    from app.etl.geocoding_scheduler import PROVIDER_LIMITS, GeocodingScheduler, RateLimit
+    from app.etl.local_geocoder import LocalGeocoder
+
+    rng = np.random.default_rng(0)
+    unique = [(f"Calle {i} {rng.integers(1, 9999)}", *COMMUNES[i % len(COMMUNES)][:2]) for i in range(rows)]
+    items = [unique[i] if rng.random() > 0.2 else unique[rng.integers(0, i + 1)] for i in range(rows)]
+    cached = unique[: rows // 5]
+    limits = {name: RateLimit(limit.rate * speedup, limit.burst, limit.concurrency)
+              for name, limit in PROVIDER_LIMITS.items()}
+    nominatim_interval = 1 / limits["nominatim"].rate
+    print(f"  Direcciones: {rows:,} ({len(set(items)):,} distintas)  "
+          f"Nominatim: 1 request cada {nominatim_interval * 1000:.0f} ms")
+
+    result = {"addresses": rows}
+    found = {}
+    for label in ("sequential", "scheduler"):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = GeocodingCache(Path(tmp) / "cache.jsonl", snapshot_file=None)
+            for address, commune, region in cached:
+                cache.set(address, commune, region, -33.45, -70.66)
+            nominatim = LocalGeocoder(latency=0.5 / speedup, min_interval=nominatim_interval,
+                                      miss=lambda query: zlib.crc32(query.encode()) % 10 < 3)
+            google = LocalGeocoder(latency=2.0 / speedup)
+            service = GeocodingService(cache, nominatim=nominatim, google=google, limits=limits)
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                if label == "sequential":
+                    coords = [service.geocode(*item) for item in items]
+                else:
+                    coords = GeocodingScheduler(service).run(items)
+                elapsed = time.perf_counter() - start
+        found[label] = coords
+        calls = len(nominatim.calls) + len(google.calls)
+        print(f"  {label:10s}: {elapsed:8.3f} s  {rows / elapsed:8,.1f} direcciones/s  ({calls} requests, "
+              f"{service.stats['cache_hits']} cache hits, {service.stats['deduplicated']} repetidas, "
+              f"{service.stats['failures']} fallos, {nominatim.rejected} rechazados por Nominatim)")
+        result[f"{label}_s"] = elapsed
+
+    result["mismatches"] = sum(a != b for a, b in zip(found["sequential"], found["scheduler"]))
+    print(f"  Speedup:             {result['sequential_s'] / result['scheduler_s']:8.1f}x")
+    print(f"  Diferencias:         {result['mismatches']}")
+    return result
+
+
+def write_synthetic_bigquery_csv(rows: int, seed: int = 0) -> Path:
+    """make_synthetic_bigquery_frame as a comma-separated CSV (the csv_to_supabase export) in the temp dir, once."""
+    path = Path(tempfile.gettempdir()) / f"bigquery_synthetic_{rows}_{seed}.csv"
+    if not path.exists():
+        make_synthetic_bigquery_frame(rows, seed).to_csv(path, index=False)
+    return path
+
+
+def bench_suite(rows: int, repeat: int = 3):
+    """
+    The transform path of every importer on synthetic data, with no network
+    (dry runs, sink=None): tinsa_importer (read with sniffing, parse,
+    transform, snapshots; a latin-1 ';' copy; --stream), import_tinsa,
+    csv_to_supabase, bigquery_to_supabase pages and importer.TinsaImporter.
+    Each step reports the best of `repeat` runs; keys are <importer>.<step>_s,
+    so runs can be compared with --record.
+    """
+    import contextlib
+    import io
+
+    from app.etl import csv_to_supabase, import_tinsa, tinsa_importer
+    from app.etl.bigquery_to_supabase import PAGE_SIZE, map_tinsa_to_supabase
+    from app.etl.importer import TinsaImporter
+    from app.etl.local_supabase import LocalSupabase
+    from app.etl.pipeline import CsvSource, Pipeline
+    from app.etl.sniffing import forget_csv_format
+
+    tinsa_csv = write_synthetic_csv(rows)
+    latin1_csv = write_synthetic_csv(rows, encoding="latin-1", sep=";")
+    comma_csv = write_synthetic_csv(rows, sep=",")
+    bigquery_csv = write_synthetic_bigquery_csv(rows)
+    bigquery_frame = make_synthetic_bigquery_frame(rows)
+
+    result = {"rows": rows}
+    steps = []
+
+    def step(key: str, fn, *args):
+        for path in (tinsa_csv, latin1_csv):
+            forget_csv_format(path)  # every run sniffs from scratch
+        timings = []
+        for _ in range(repeat):  # best of `repeat`: single timings on shared machines are noisy
+            with contextlib.redirect_stdout(io.StringIO()):
+                value, elapsed = _timed(fn, *args)
+            timings.append(elapsed)
+        result[f"{key}_s"] = min(timings)
+        steps.append(key)
+        return value
+
+    df = step("tinsa_importer.read", tinsa_importer.read_tinsa_csv, tinsa_csv)
+    typed = step("tinsa_importer.parse", tinsa_importer.add_typed_columns, df)
+    projects, typologies = step("tinsa_importer.transform", tinsa_importer.transform_typed, typed)
+    snapshots = step("tinsa_importer.snapshots", tinsa_importer.transform_snapshots, typed)
+    latin1 = step("tinsa_importer.read_latin1", tinsa_importer.read_tinsa_csv, latin1_csv)
+    step("tinsa_importer.stream", tinsa_importer.import_file_streaming, tinsa_csv)
+    result.update({"tinsa_importer.projects": len(projects), "tinsa_importer.typologies": len(typologies),
+                   "tinsa_importer.snapshots": len(snapshots)})
+
+    raw = step("import_tinsa.read", pd.read_csv, comma_csv)
+    result["import_tinsa.projects"] = len(step("import_tinsa.transform", import_tinsa.transform_projects, raw))
+
+    report = step("csv_to_supabase.pipeline", Pipeline(
+        CsvSource(bigquery_csv, chunk_rows=csv_to_supabase.CHUNK_ROWS), csv_to_supabase.map_tinsa_to_supabase,
+        None, verbose=False).run)
+    result["csv_to_supabase.projects"] = report.stages["transform"].rows_out
+
+    pages = [bigquery_frame.iloc[i:i + PAGE_SIZE] for i in range(0, rows, PAGE_SIZE)]
+    report = step("bigquery_to_supabase.pages", Pipeline(pages, map_tinsa_to_supabase, None, verbose=False).run)
+    result["bigquery_to_supabase.projects"] = report.stages["transform"].rows_out
+
+    report = step("importer.run", TinsaImporter(str(bigquery_csv), supabase=LocalSupabase()).run, True)
+    result["importer.projects"] = report.stages["transform"].rows_out
+
+    # The latin-1 ';' copy must parse to the same frame as the UTF-8 tab one
+    result["mismatches"] = int(not latin1.equals(df))
+
+    for key in steps:
+        print(f"  {key:<32} {result[key + '_s']:8.3f} s  {rows / result[key + '_s']:12,.0f} filas/s")
+    print(f"  Proyectos:           {len(projects):,} (tinsa_importer), {result['import_tinsa.projects']:,} (import_tinsa)")
+    print(f"  latin-1 ';' idéntico: {'sí' if not result['mismatches'] else 'NO'}")
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Recorded results (--record), compared across commits
+# ---------------------------------------------------------------------------
+
+HISTORY_FILE = Path(__file__).parent.parent.parent / "data" / "benchmark_history.jsonl"
+
+
+def current_commit() -> str:
+    """Short hash of HEAD, '-dirty' with uncommitted changes; 'unknown' outside git."""
+    import subprocess
+
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=Path(__file__).parent,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def load_history(path: Path = HISTORY_FILE) -> list[dict]:
+    import json
+
+    if not path.exists():
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def record_result(benchmark: str, rows: int, result: dict, path: Path = HISTORY_FILE) -> dict:
+    """Append one run to the history file (JSON lines) with the commit and environment it ran on."""
+    import json
+    import platform
+    from datetime import datetime
+
+    entry = {
+        "benchmark": benchmark,
+        "rows": rows,
+        "commit": current_commit(),
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "result": {k: round(v, 4) if isinstance(v, float) else v for k, v in result.items()},
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    return entry
+
+
+def compare_with_history(benchmark: str, rows: int, result: dict, commit: str | None = None,
+                         path: Path = HISTORY_FILE):
+    """Print every *_s timing against the latest recorded run of the same benchmark and size from another commit."""
+    commit = commit or current_commit()
+    previous = [e for e in load_history(path)
+                if e["benchmark"] == benchmark and e["rows"] == rows and e["commit"] != commit]
+    if not previous:
+        return
+    base = previous[-1]
+    print(f"\n  Comparado con {base['commit']} ({base['recorded_at']}, {base['host']}):")
+    for key, value in result.items():
+        old = base["result"].get(key)
+        if key.endswith("_s") and isinstance(old, (int, float)) and old > 0:
+            change = (value - old) / old * 100
+            flag = "  ⚠️" if change > 10 else ""
+            print(f"  {key:<32} {old:8.3f} → {value:8.3f} s  ({change:+.0f}%){flag}")
+
+
+BENCHMARKS = {
+    "parsing": bench_parsing,
+    "transform": bench_transform,
+    "upload": bench_upload,
+    "coordinates": bench_coordinates,
+    "import_tinsa": bench_import_tinsa,
+    "bigquery": bench_bigquery,
+    "excel": bench_excel,
+    "postgres": bench_postgres,
+    "geocoding": bench_geocoding,
+    "suite": bench_suite,
+}
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmarks del ETL TINSA (datos sintéticos)")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS), help="Benchmark a ejecutar")
+    parser.add_argument("--rows", type=int, default=100_000, help="Filas del CSV sintético")
+    parser.add_argument("--record", action="store_true",
+                        help="Guardar el resultado en data/benchmark_history.jsonl (con el commit actual)")
+    args = parser.parse_args()
+
+    print(f"\n{'='*70}")
+    print(f"  BENCHMARK: {args.benchmark} ({args.rows:,} filas)")
+    print(f"{'='*70}")
+    result = BENCHMARKS[args.benchmark](args.rows)
+    compare_with_history(args.benchmark, args.rows, result)
+    if args.record:
+        entry = record_result(args.benchmark, args.rows, result)
+        print(f"\n  📊 Resultado guardado en {HISTORY_FILE} (commit {entry['commit']})")
+    if result.get("mismatches"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
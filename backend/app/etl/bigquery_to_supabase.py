@@ -7,37 +7,65 @@ Requisitos:
 1. Credenciales de Google Cloud (JSON key file)
 2. Variables de entorno configuradas en .env
 
+La migración lee el resultado por páginas (Arrow record batches), transforma
+cada página por columnas y la sube mientras se descarga la siguiente, así la
+memoria no crece con el tamaño de la tabla.
+
+Sólo se leen las columnas que usa COLUMN_MAP, y con --since / --incremental
+sólo los periodos posteriores a la marca de agua (último AÑO/PERIODO importado,
+guardada en data/bigquery_watermark.json).
+
 Uso:
     python -m app.etl.bigquery_to_supabase
+    python -m app.etl.bigquery_to_supabase --migrate --page-size 20000
+    python -m app.etl.bigquery_to_supabase --migrate --incremental
+    python -m app.etl.bigquery_to_supabase --migrate --since 2024-1P
+    python -m app.etl.bigquery_to_supabase --migrate --postgres   # COPY directo (SUPABASE_DB_URL)
 """
+from __future__ import annotations
 
+import json
 import os
-import sys
+import re
 from pathlib import Path
 from dotenv import load_dotenv
+import pandas as pd
 
 # Load environment variables
 load_dotenv(Path(__file__).parent.parent.parent / ".env")
 
 try:
     from google.cloud import bigquery
-    import pandas as pd
-except ImportError:
-    print("❌ Error: Faltan dependencias requeridas.")
-    print("\nInstala las dependencias con:")
-    print("  .venv/bin/pip install google-cloud-bigquery pandas db-dtypes")
-    sys.exit(1)
+except ImportError:  # only needed against the real BigQuery (see local_bigquery)
+    bigquery = None
 
-from supabase import create_client, Client
+from app.etl.pipeline import (
+    BigQuerySource,
+    ColumnMapping,
+    Pipeline,
+    PipelineReport,
+    get_supabase_client,
+)
+from app.etl.postgres import get_postgres_client, make_sink
 
 # Configuration
 PROJECT_ID = "my-project-wap-486916"
 DATASET_ID = "BBDDTINSATables"
 TABLE_ID = "BBDDTINSA_PYTO_CENTROcsv_1770655119181"
 BATCH_SIZE = 100  # Number of records to insert at once
+UPLOAD_CONCURRENCY = 4
+PAGE_SIZE = 10_000  # Rows per Arrow batch fetched from BigQuery
+PREFETCH_PAGES = 2  # Pages buffered ahead of the transform/upload loop
+WATERMARK_FILE = Path(__file__).parent.parent.parent / "data" / "bigquery_watermark.json"
 
 def get_bigquery_client():
     """Initialize BigQuery client with credentials."""
+    if bigquery is None:
+        print("❌ Error: Faltan dependencias requeridas.")
+        print("\nInstala las dependencias con:")
+        print("  .venv/bin/pip install google-cloud-bigquery pandas pyarrow db-dtypes")
+        return None
+
     credentials_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
     
     if not credentials_path:
@@ -55,28 +83,12 @@ def get_bigquery_client():
     
     return bigquery.Client(project=PROJECT_ID)
 
-def get_supabase_client() -> Client:
-    """Initialize Supabase client."""
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_KEY")
-    
-    if not url or not key:
-        raise ValueError("SUPABASE_URL y SUPABASE_KEY deben estar en .env")
-    
-    return create_client(url, key)
-
 def preview_bigquery_data(client: bigquery.Client, limit: int = 5):
-    """Preview data from BigQuery table."""
-    query = f"""
-    SELECT *
-    FROM `{PROJECT_ID}.{DATASET_ID}.{TABLE_ID}`
-    LIMIT {limit}
-    """
-    
+    """Preview data from BigQuery table (tabledata.list: no query, no bytes billed)."""
     print(f"\n📊 Previsualizando {limit} registros de BigQuery...\n")
     
     try:
-        df = client.query(query).to_dataframe()
+        df = client.list_rows(f"{PROJECT_ID}.{DATASET_ID}.{TABLE_ID}", max_results=limit).to_dataframe()
         print(df.head())
         print(f"\n✅ Columnas disponibles: {list(df.columns)}")
         print(f"✅ Total de filas en preview: {len(df)}")
@@ -100,63 +112,234 @@ def get_table_schema(client: bigquery.Client):
         print(f"❌ Error al obtener esquema: {e}")
         return None, 0
 
+# ---------------------------------------------------------------------------
+# Mapping (column-wise, one Arrow page at a time)
+# ---------------------------------------------------------------------------
+
+# Supabase field → (BigQuery column, kind, default when the column is absent).
+# kind: "value" (as is, null → None), "int" (null → 0), "float" (null → None).
+# TODO: ajustar los nombres de columna según los campos reales de TINSA.
+YEAR_COLUMN = "anio"
+PERIOD_COLUMN = "periodo"
+COLUMN_MAP = {
+    # Campos básicos
+    "name": ("nombre_proyecto", "value", "Sin nombre"),
+    "developer": ("inmobiliaria", "value", None),
+    "commune": ("comuna", "value", None),
+    "region": ("region", "value", "RM"),
+    "address": ("direccion", "value", None),
+
+    # Ubicación
+    "latitude": ("latitud", "value", None),
+    "longitude": ("longitud", "value", None),
+
+    # Unidades
+    "total_units": ("total_unidades", "int", 0),
+    "sold_units": ("unidades_vendidas", "int", 0),
+    "available_units": ("unidades_disponibles", "int", 0),
+
+    # Precios
+    "avg_price_uf": ("precio_promedio_uf", "float", None),
+    "avg_price_m2_uf": ("precio_m2_uf", "float", None),
+
+    # Estado
+    "project_status": ("estado", "value", None),
+    "property_type": ("tipo_propiedad", "value", "Departamento"),
+}
+
+
+PROJECT_MAPPING = ColumnMapping(COLUMN_MAP, dedupe=("name", "commune"))
+
+
 def map_tinsa_to_supabase(df: pd.DataFrame) -> list:
     """
-    Transform TINSA data to match Supabase schema.
-    
-    Esta función debe ser personalizada según los campos reales de TINSA.
+    Transform a page of TINSA rows to project payloads (COLUMN_MAP), by column.
+
+    Rows repeating (name, commune) within the page keep only the last one, the
+    row a sequence of upserts would leave behind; a single upsert statement
+    cannot touch the same row twice.
     """
-    projects = []
-    
-    # TODO: Mapear campos reales de TINSA a nuestro esquema
-    # Ejemplo de mapeo (ajustar según campos reales):
-    
-    for _, row in df.iterrows():
-        project = {
-            # Campos básicos
-            "name": row.get("nombre_proyecto", "Sin nombre"),
-            "developer": row.get("inmobiliaria", None),
-            "commune": row.get("comuna", None),
-            "region": row.get("region", "RM"),
-            "address": row.get("direccion", None),
-            
-            # Ubicación
-            "latitude": row.get("latitud", None),
-            "longitude": row.get("longitud", None),
-            
-            # Unidades
-            "total_units": int(row.get("total_unidades", 0)) if pd.notna(row.get("total_unidades")) else 0,
-            "sold_units": int(row.get("unidades_vendidas", 0)) if pd.notna(row.get("unidades_vendidas")) else 0,
-            "available_units": int(row.get("unidades_disponibles", 0)) if pd.notna(row.get("unidades_disponibles")) else 0,
-            
-            # Precios
-            "avg_price_uf": float(row.get("precio_promedio_uf", 0)) if pd.notna(row.get("precio_promedio_uf")) else None,
-            "avg_price_m2_uf": float(row.get("precio_m2_uf", 0)) if pd.notna(row.get("precio_m2_uf")) else None,
-            
-            # Estado
-            "project_status": row.get("estado", None),
-            "property_type": row.get("tipo_propiedad", "Departamento"),
-        }
-        
-        projects.append(project)
-    
-    return projects
+    return PROJECT_MAPPING(df)
+
+
+# ---------------------------------------------------------------------------
+# Query generation (projection + watermark)
+# ---------------------------------------------------------------------------
+
+def select_columns(available: set[str] | None = None) -> list[str]:
+    """
+    Columns read by COLUMN_MAP plus the watermark columns, in map order.
+    Columns missing from `available` (the table schema) are left out; the
+    mapping falls back to their defaults.
+    """
+    columns = PROJECT_MAPPING.source_columns()
+    for column in (YEAR_COLUMN, PERIOD_COLUMN):
+        if column not in columns:
+            columns.append(column)
+    if available is not None:
+        columns = [c for c in columns if c in available]
+    return columns
+
+
+NUMERIC_TYPES = ("INTEGER", "INT64", "FLOAT", "FLOAT64", "NUMERIC")
+
+
+def _sql_literal(value, field_type: str | None = None) -> str:
+    if field_type in NUMERIC_TYPES or (
+            field_type is None and isinstance(value, (int, float))):
+        return str(int(value) if float(value).is_integer() else float(value))
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "\\'") + "'"
+
 
-def migrate_data(dry_run: bool = True):
+def build_query(columns: list[str] | None = None, watermark: tuple | None = None,
+                field_types: dict[str, str] | None = None) -> str:
+    """
+    SELECT of `columns` (all when None) from the TINSA table, restricted to
+    periods after `watermark` = (year, period) when given.
+    """
+    field_types = field_types or {}
+    select = ", ".join(f"`{c}`" for c in columns) if columns else "*"
+    query = f"SELECT {select} FROM `{PROJECT_ID}.{DATASET_ID}.{TABLE_ID}`"
+    if watermark is not None:
+        year, period = watermark
+        year_sql = _sql_literal(year, field_types.get(YEAR_COLUMN))
+        period_sql = _sql_literal(period, field_types.get(PERIOD_COLUMN))
+        query += (f" WHERE `{YEAR_COLUMN}` > {year_sql}"
+                  f" OR (`{YEAR_COLUMN}` = {year_sql} AND `{PERIOD_COLUMN}` > {period_sql})")
+    return query
+
+
+def parse_watermark(value: str) -> tuple:
+    """
+    --since value: '2024-2P' → (2024, '2P'), '2024-2' → (2024, 2); '2024' →
+    (2024, 0), which keeps every period of 2024. normalize_watermark() then
+    matches the period to the column's type.
+    """
+    year, _, period = value.partition("-")
+    period = period.strip().upper()
+    return int(year), (int(period) if period.isdigit() else period) if period else 0
+
+
+def normalize_watermark(watermark: tuple, field_types: dict[str, str]) -> tuple:
+    """
+    (year, period) in the types of the table's columns, so it compares with
+    the periods read back and quotes right in the WHERE clause. A STRING
+    periodo holds '1P'/'2P': a bare number n becomes 'nP', and 0 becomes ''
+    (before every period); a numeric periodo keeps the number of '2P'.
+    """
+    year, period = watermark
+    if field_types.get(YEAR_COLUMN) in NUMERIC_TYPES:
+        year = int(year)
+    period_type = field_types.get(PERIOD_COLUMN)
+    if period_type in NUMERIC_TYPES:
+        digits = re.match(r"\d*", str(period).strip()).group()
+        period = int(digits) if digits else 0
+    elif period_type is not None:
+        period = str(period).strip().upper()
+        if period.isdigit():
+            period = f"{int(period)}P" if int(period) else ""
+    return year, period
+
+
+def load_watermark() -> tuple | None:
+    table = f"{PROJECT_ID}.{DATASET_ID}.{TABLE_ID}"
+    if WATERMARK_FILE.exists():
+        try:
+            with open(WATERMARK_FILE, "r", encoding="utf-8") as f:
+                entry = json.load(f).get(table)
+            if entry:
+                return entry["year"], entry["period"]
+        except (OSError, ValueError, KeyError):
+            pass
+    return None
+
+
+def save_watermark(watermark: tuple):
+    table = f"{PROJECT_ID}.{DATASET_ID}.{TABLE_ID}"
+    state = {}
+    if WATERMARK_FILE.exists():
+        try:
+            with open(WATERMARK_FILE, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+    state[table] = {"year": watermark[0], "period": watermark[1]}
+    WATERMARK_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = WATERMARK_FILE.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    tmp.replace(WATERMARK_FILE)
+
+
+def latest_period(df: pd.DataFrame) -> tuple | None:
+    """Highest (year, period) in a page, or None without watermark columns or rows."""
+    if YEAR_COLUMN not in df.columns or PERIOD_COLUMN not in df.columns:
+        return None
+    periods = df[[YEAR_COLUMN, PERIOD_COLUMN]].dropna()
+    if periods.empty:
+        return None
+    latest = periods.sort_values([YEAR_COLUMN, PERIOD_COLUMN]).iloc[-1]
+    # A STRING periodo makes the row an object Series holding numpy scalars
+    return tuple(v.item() if hasattr(v, "item") else v for v in latest)
+
+
+# ---------------------------------------------------------------------------
+# Streaming extraction
+# ---------------------------------------------------------------------------
+
+def stream_projects(bq_client, supabase, query: str, page_size: int = PAGE_SIZE,
+                    batch_size: int = BATCH_SIZE, concurrency: int = UPLOAD_CONCURRENCY,
+                    prefetch: int = PREFETCH_PAGES) -> tuple[PipelineReport, tuple | None]:
+    """
+    Extract, transform and upsert a query result page by page.
+
+    Only `prefetch` pages plus the one being uploaded are held in memory.
+    `supabase` may also be a postgres.PostgresClient (COPY + merge per page).
+    Returns the pipeline report and the latest (year, period) read, the
+    next watermark.
+    """
+    latest = None
+
+    def transform(page: pd.DataFrame) -> list[dict]:
+        nonlocal latest
+        page_latest = latest_period(page)
+        if page_latest is not None and (latest is None or page_latest > latest):
+            latest = page_latest
+        return map_tinsa_to_supabase(page)
+
+    report = Pipeline(
+        BigQuerySource(bq_client, query, page_size),
+        transform,
+        make_sink(supabase, "projects", on_conflict="name,commune", batch_size=batch_size, concurrency=concurrency),
+        name="bigquery → projects",
+        prefetch=prefetch,
+    ).run()
+    return report, latest
+
+
+def migrate_data(dry_run: bool = True, page_size: int = PAGE_SIZE, batch_size: int = BATCH_SIZE,
+                 concurrency: int = UPLOAD_CONCURRENCY, since: tuple | None = None, incremental: bool = False,
+                 postgres: bool = False, bq_client=None, supabase=None):
     """
     Main migration function.
     
     Args:
         dry_run: If True, only preview data without inserting
+        since: (year, period) watermark; only later periods are read
+        incremental: use the watermark saved by the last successful run
+        postgres: write straight to Postgres (COPY + INSERT ... ON CONFLICT)
+            instead of the Supabase REST API
+        bq_client, supabase: clients to use instead of the configured ones
+            (e.g. local_bigquery.LocalBigQuery and local_supabase.LocalSupabase)
     """
     print("🚀 Iniciando migración BigQuery → Supabase\n")
     
     # Initialize clients
-    bq_client = get_bigquery_client()
+    bq_client = bq_client or get_bigquery_client()
     if not bq_client:
         return
     
-    supabase = get_supabase_client()
+    supabase = supabase or (get_postgres_client() if postgres else get_supabase_client())
     
     # Get schema info
     schema, total_rows = get_table_schema(bq_client)
@@ -175,33 +358,35 @@ def migrate_data(dry_run: bool = True):
         return
     
     # Full migration
-    print(f"\n🔄 Iniciando migración de {total_rows:,} registros...")
+    field_types = {field.name: field.field_type for field in schema}
+    watermark = since if since is not None else (load_watermark() if incremental else None)
+    if watermark is not None and not {YEAR_COLUMN, PERIOD_COLUMN} <= set(field_types):
+        print(f"⚠️  La tabla no tiene {YEAR_COLUMN}/{PERIOD_COLUMN}; se leen todos los periodos")
+        watermark = None
+    if watermark is not None:
+        watermark = normalize_watermark(watermark, field_types)
+    query = build_query(select_columns(set(field_types)), watermark, field_types)
     
-    query = f"SELECT * FROM `{PROJECT_ID}.{DATASET_ID}.{TABLE_ID}`"
+    if watermark is not None:
+        print(f"\n🔄 Migrando periodos posteriores a {watermark[0]}-{watermark[1]} (páginas de {page_size:,})...")
+    else:
+        print(f"\n🔄 Iniciando migración de {total_rows:,} registros (páginas de {page_size:,})...")
+    print(f"  {query}")
     
     try:
-        df = bq_client.query(query).to_dataframe()
-        print(f"✅ Datos extraídos: {len(df)} registros")
-        
-        # Transform data
-        projects = map_tinsa_to_supabase(df)
-        print(f"✅ Datos transformados: {len(projects)} proyectos")
-        
-        # Insert in batches
-        inserted_count = 0
-        for i in range(0, len(projects), BATCH_SIZE):
-            batch = projects[i:i + BATCH_SIZE]
-            try:
-                supabase.table("projects").upsert(
-                    batch, 
-                    on_conflict="name,commune"
-                ).execute()
-                inserted_count += len(batch)
-                print(f"  ✅ Insertados {inserted_count}/{len(projects)} proyectos...")
-            except Exception as e:
-                print(f"  ⚠️  Error en batch {i}: {e}")
-        
-        print(f"\n🎉 Migración completada: {inserted_count} proyectos insertados")
+        run, latest = stream_projects(bq_client, supabase, query, page_size=page_size,
+                                      batch_size=batch_size, concurrency=concurrency)
+        report = run.write
+        print(f"  {report.summary()}")
+        for error in report.errors[:3]:
+            print(f"    Error: {error}")
+        if report.failed:
+            print("⚠️  Hubo filas rechazadas: la marca de agua no avanza")
+        elif latest is not None and (watermark is None or latest > watermark):
+            save_watermark(latest)
+            print(f"💾 Marca de agua: {latest[0]}-{latest[1]}")
+        print(f"\n🎉 Migración completada: {report.written} proyectos enviados")
+        return report
         
     except Exception as e:
         print(f"❌ Error durante la migración: {e}")
@@ -212,6 +397,15 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Migrar datos de BigQuery a Supabase")
     parser.add_argument("--migrate", action="store_true", help="Ejecutar migración real (sin dry-run)")
     parser.add_argument("--preview", action="store_true", help="Solo mostrar preview de datos")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE, help="Filas por página leída de BigQuery")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Filas por request a Supabase")
+    parser.add_argument("--concurrency", type=int, default=UPLOAD_CONCURRENCY, help="Requests a Supabase en paralelo")
+    parser.add_argument("--since", type=parse_watermark, default=None,
+                        help="Sólo periodos posteriores a AÑO-PERIODO (p.ej. 2024-1P)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Sólo periodos posteriores a la última migración exitosa")
+    parser.add_argument("--postgres", action="store_true",
+                        help="Escribir directo en Postgres (COPY + INSERT ... ON CONFLICT) vía SUPABASE_DB_URL")
     
     args = parser.parse_args()
     
@@ -221,4 +415,6 @@ if __name__ == "__main__":
             get_table_schema(bq_client)
             preview_bigquery_data(bq_client, limit=20)
     else:
-        migrate_data(dry_run=not args.migrate)
+        migrate_data(dry_run=not args.migrate, page_size=args.page_size,
+                     batch_size=args.batch_size, concurrency=args.concurrency,
+                     since=args.since, incremental=args.incremental, postgres=args.postgres)
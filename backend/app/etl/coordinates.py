@@ -0,0 +1,109 @@
+"""
+Vectorized coordinate repair for TINSA exports.
+
+TINSA coordinates often lose their decimal point (-33,4567 exported as
+-334567), come with latitude and longitude swapped, or both.
+normalize_coordinates() takes already-parsed lat/lon arrays and, for every
+row at once, finds the power-of-ten scaling that brings each value into
+Chile's range, trying the swapped pair when the straight one does not fit.
+
+Chile's latitude range [-60, -15] and longitude range [-80, -60] never
+overlap after rescaling by a power of ten, so every value has at most one
+valid scaling and the repair is unambiguous. Latitude and longitude are
+scaled independently: a pair where each lost a different number of decimals
+is still repaired.
+
+Each row also gets a repair reason code (REPAIR_OK, REPAIR_SCALED, ...) for
+auditing; repair_summary() turns them into counts per label.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+LAT_RANGE = (-60.0, -15.0)
+LON_RANGE = (-80.0, -60.0)
+MAX_SCALE_EXPONENT = 9  # divide by up to 10^9
+DECIMALS = 6
+_POWERS = 10.0 ** np.arange(MAX_SCALE_EXPONENT + 1)
+
+REPAIR_OK = 0
+REPAIR_SCALED = 1
+REPAIR_SWAPPED = 2
+REPAIR_SWAPPED_SCALED = 3
+REPAIR_MISSING = 4
+REPAIR_OUT_OF_RANGE = 5
+
+REPAIR_REASONS = {
+    REPAIR_OK: "ok",
+    REPAIR_SCALED: "scaled",
+    REPAIR_SWAPPED: "swapped",
+    REPAIR_SWAPPED_SCALED: "swapped_scaled",
+    REPAIR_MISSING: "missing",
+    REPAIR_OUT_OF_RANGE: "out_of_range",
+}
+
+
+def _as_float_array(values) -> np.ndarray:
+    if isinstance(values, pd.Series):
+        return values.to_numpy(dtype="float64", na_value=np.nan)
+    return np.asarray(values, dtype="float64")
+
+
+def _rescale(values: np.ndarray, bounds: tuple[float, float]) -> tuple[np.ndarray, np.ndarray]:
+    """values / 10^k for the (unique) k that lands in bounds; NaN and k = -1 where none does."""
+    low, high = bounds
+    out = np.full(values.shape, np.nan)
+    exponent = np.full(values.shape, -1, dtype=np.int8)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Smallest k with |value| / 10^k <= |low|; log10 can be off by one at
+        # exact powers of ten, so the neighbours are checked too
+        guess = np.ceil(np.log10(np.abs(values) / -low))
+    guess = np.nan_to_num(guess, nan=-2, posinf=-2, neginf=0).astype(np.int64)
+    for shift in (-1, 0, 1):
+        k = guess + shift
+        usable = (k >= 0) & (k <= MAX_SCALE_EXPONENT) & (exponent < 0)
+        scaled = values / _POWERS[np.clip(k, 0, MAX_SCALE_EXPONENT)]
+        hit = usable & (scaled >= low) & (scaled <= high)
+        out[hit] = scaled[hit]
+        exponent[hit] = k[hit]
+    return out, exponent
+
+
+def normalize_coordinates(lat, lon) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Repair parsed lat/lon arrays (or Series).
+
+    Returns (lat, lon, reason): float64 arrays rounded to 6 decimals with NaN
+    where the pair could not be repaired, and an int8 array of REPAIR_* codes.
+    """
+    lat = _as_float_array(lat)
+    lon = _as_float_array(lon)
+
+    lat_straight, lat_k = _rescale(lat, LAT_RANGE)
+    lon_straight, lon_k = _rescale(lon, LON_RANGE)
+    straight = (lat_k >= 0) & (lon_k >= 0)
+
+    lat_swapped, lat_swap_k = _rescale(lon, LAT_RANGE)
+    lon_swapped, lon_swap_k = _rescale(lat, LON_RANGE)
+    swapped = ~straight & (lat_swap_k >= 0) & (lon_swap_k >= 0)
+
+    out_lat = np.where(straight, lat_straight, np.where(swapped, lat_swapped, np.nan))
+    out_lon = np.where(straight, lon_straight, np.where(swapped, lon_swapped, np.nan))
+
+    reason = np.full(lat.shape, REPAIR_OUT_OF_RANGE, dtype=np.int8)
+    reason[np.isnan(lat) | np.isnan(lon)] = REPAIR_MISSING
+    reason[straight] = np.where((lat_k == 0) & (lon_k == 0), REPAIR_OK, REPAIR_SCALED)[straight]
+    reason[swapped] = np.where((lat_swap_k == 0) & (lon_swap_k == 0), REPAIR_SWAPPED, REPAIR_SWAPPED_SCALED)[swapped]
+
+    return np.round(out_lat, DECIMALS), np.round(out_lon, DECIMALS), reason
+
+
+def repair_summary(reason: np.ndarray) -> dict[str, int]:
+    """Row count per repair reason label (labels with zero rows omitted)."""
+    counts = np.bincount(np.asarray(reason, dtype=np.int64), minlength=len(REPAIR_REASONS))
+    return {REPAIR_REASONS[code]: int(n) for code, n in enumerate(counts) if n}
+
+
+def format_repair_summary(reason: np.ndarray) -> str:
+    return ", ".join(f"{label} {n:,}" for label, n in repair_summary(reason).items())
@@ -7,10 +7,9 @@ Uso:
     1. Exporta la tabla desde BigQuery a CSV
     2. Guarda el CSV en: backend/data/tinsa_export.csv
     3. Ejecuta: python -m app.etl.csv_to_supabase
+    4. Con --migrate --postgres escribe directo en Postgres (COPY, SUPABASE_DB_URL)
 """
 
-import os
-import sys
 from pathlib import Path
 from dotenv import load_dotenv
 import pandas as pd
@@ -18,21 +17,47 @@ import pandas as pd
 # Load environment variables
 load_dotenv(Path(__file__).parent.parent.parent / ".env")
 
-from supabase import create_client, Client
+from app.etl.pipeline import ColumnMapping, CsvSource, Pipeline, get_supabase_client
+from app.etl.postgres import get_postgres_client, make_sink
 
 # Configuration
 CSV_PATH = Path(__file__).parent.parent.parent / "data" / "tinsa_export.csv"
 BATCH_SIZE = 100
+UPLOAD_CONCURRENCY = 4
+CHUNK_ROWS = 50_000
 
-def get_supabase_client() -> Client:
-    """Initialize Supabase client."""
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_KEY")
-    
-    if not url or not key:
-        raise ValueError("SUPABASE_URL y SUPABASE_KEY deben estar en .env")
-    
-    return create_client(url, key)
+# Supabase field → (CSV column or candidates, kind, default); see pipeline.ColumnMapping.
+# TODO: Ajustar estos nombres según las columnas reales del CSV
+# (usa el preview para ver los nombres exactos).
+COLUMN_MAP = {
+    # Campos básicos
+    "name": (("nombre_proyecto", "proyecto"), "text", lambda idx: f"Proyecto {idx}"),
+    "developer": (("inmobiliaria", "desarrolladora"), "text", None),
+    "commune": ("comuna", "text", None),
+    "region": ("region", "text", "RM"),
+    "address": ("direccion", "text", None),
+
+    # Ubicación
+    "latitude": (("latitud", "lat"), "float", None),
+    "longitude": (("longitud", "lon", "lng"), "float", None),
+
+    # Unidades
+    "total_units": (("total_unidades", "unidades_totales"), "int", 0),
+    "sold_units": (("unidades_vendidas", "vendidas"), "int", 0),
+    "available_units": (("unidades_disponibles", "disponibles"), "int", 0),
+
+    # Precios
+    "avg_price_uf": (("precio_promedio_uf", "precio_uf"), "float", None),
+    "avg_price_m2_uf": (("precio_m2_uf", "uf_m2"), "float", None),
+
+    # Estado
+    "project_status": (("estado", "estado_proyecto"), "text", None),
+    "property_type": ("tipo_propiedad", "text", "Departamento"),
+}
+# Validación básica: al menos debe tener nombre y comuna; las filas con números
+# ilegibles se omiten (no se sobrescriben con 0 / None)
+PROJECT_MAPPING = ColumnMapping(COLUMN_MAP, required=("name", "commune"), dedupe=("name", "commune"),
+                                skip_invalid=True)
 
 def preview_csv(limit: int = 10):
     """Preview CSV data."""
@@ -79,64 +104,23 @@ def preview_csv(limit: int = 10):
 
 def map_tinsa_to_supabase(df: pd.DataFrame) -> list:
     """
-    Transform TINSA CSV data to match Supabase schema.
+    Transform TINSA CSV data to match Supabase schema (COLUMN_MAP, by column).
     
     IMPORTANTE: Ajustar los nombres de columnas según el CSV real.
     """
-    projects = []
-    
     print(f"\n🔄 Transformando {len(df)} registros...")
-    
-    for idx, row in df.iterrows():
-        try:
-            # TODO: Ajustar estos nombres según las columnas reales del CSV
-            # Usa el preview para ver los nombres exactos
-            
-            project = {
-                # Campos básicos - AJUSTAR NOMBRES
-                "name": str(row.get("nombre_proyecto", row.get("proyecto", f"Proyecto {idx}"))),
-                "developer": str(row.get("inmobiliaria", row.get("desarrolladora", None))) if pd.notna(row.get("inmobiliaria", row.get("desarrolladora"))) else None,
-                "commune": str(row.get("comuna", None)) if pd.notna(row.get("comuna")) else None,
-                "region": str(row.get("region", "RM")) if pd.notna(row.get("region")) else "RM",
-                "address": str(row.get("direccion", None)) if pd.notna(row.get("direccion")) else None,
-                
-                # Ubicación - AJUSTAR NOMBRES
-                "latitude": float(row.get("latitud", row.get("lat", None))) if pd.notna(row.get("latitud", row.get("lat"))) else None,
-                "longitude": float(row.get("longitud", row.get("lon", row.get("lng", None)))) if pd.notna(row.get("longitud", row.get("lon", row.get("lng")))) else None,
-                
-                # Unidades - AJUSTAR NOMBRES
-                "total_units": int(row.get("total_unidades", row.get("unidades_totales", 0))) if pd.notna(row.get("total_unidades", row.get("unidades_totales"))) else 0,
-                "sold_units": int(row.get("unidades_vendidas", row.get("vendidas", 0))) if pd.notna(row.get("unidades_vendidas", row.get("vendidas"))) else 0,
-                "available_units": int(row.get("unidades_disponibles", row.get("disponibles", 0))) if pd.notna(row.get("unidades_disponibles", row.get("disponibles"))) else 0,
-                
-                # Precios - AJUSTAR NOMBRES
-                "avg_price_uf": float(row.get("precio_promedio_uf", row.get("precio_uf", None))) if pd.notna(row.get("precio_promedio_uf", row.get("precio_uf"))) else None,
-                "avg_price_m2_uf": float(row.get("precio_m2_uf", row.get("uf_m2", None))) if pd.notna(row.get("precio_m2_uf", row.get("uf_m2"))) else None,
-                
-                # Estado - AJUSTAR NOMBRES
-                "project_status": str(row.get("estado", row.get("estado_proyecto", None))) if pd.notna(row.get("estado", row.get("estado_proyecto"))) else None,
-                "property_type": str(row.get("tipo_propiedad", "Departamento")) if pd.notna(row.get("tipo_propiedad")) else "Departamento",
-            }
-            
-            # Validación básica: al menos debe tener nombre y comuna
-            if project["name"] and project["commune"]:
-                projects.append(project)
-            else:
-                print(f"  ⚠️  Fila {idx} omitida: falta nombre o comuna")
-                
-        except Exception as e:
-            print(f"  ⚠️  Error en fila {idx}: {e}")
-            continue
-    
+    projects = PROJECT_MAPPING(df)
     print(f"✅ Transformados {len(projects)} proyectos válidos")
     return projects
 
-def migrate_from_csv(dry_run: bool = True):
+def migrate_from_csv(dry_run: bool = True, postgres: bool = False):
     """
     Main migration function from CSV.
     
     Args:
         dry_run: If True, only preview data without inserting
+        postgres: write straight to Postgres (COPY + INSERT ... ON CONFLICT)
+            instead of the Supabase REST API
     """
     print("🚀 Iniciando importación CSV → Supabase\n")
     
@@ -156,7 +140,7 @@ def migrate_from_csv(dry_run: bool = True):
         print("\n⚠️  Modo DRY RUN activado. No se insertarán datos.")
         print("\n📝 Pasos siguientes:")
         print("1. Revisa las columnas mostradas arriba")
-        print("2. Edita la función map_tinsa_to_supabase() en este archivo")
+        print("2. Edita COLUMN_MAP en este archivo")
         print("3. Ajusta los nombres de columnas según tu CSV")
         print("4. Ejecuta: python -m app.etl.csv_to_supabase --migrate")
         return
@@ -165,39 +149,25 @@ def migrate_from_csv(dry_run: bool = True):
     print(f"\n🔄 Iniciando migración completa...")
     
     try:
-        # Read full CSV
-        df = pd.read_csv(CSV_PATH)
-        print(f"✅ CSV cargado: {len(df):,} registros")
-        
-        # Transform data
-        projects = map_tinsa_to_supabase(df)
+        report = Pipeline(
+            CsvSource(CSV_PATH, chunk_rows=CHUNK_ROWS),
+            PROJECT_MAPPING,
+            make_sink(get_postgres_client() if postgres else get_supabase_client(), "projects",
+                      on_conflict="name,commune", batch_size=BATCH_SIZE, concurrency=UPLOAD_CONCURRENCY),
+            name="csv → projects",
+            prefetch=1,
+        ).run()
         
-        if not projects:
+        if not report.stages["transform"].rows_out:
             print("❌ No se generaron proyectos válidos. Revisa el mapeo.")
             return
         
-        # Insert in batches
-        supabase = get_supabase_client()
-        inserted_count = 0
-        errors = 0
-        
-        for i in range(0, len(projects), BATCH_SIZE):
-            batch = projects[i:i + BATCH_SIZE]
-            try:
-                supabase.table("projects").upsert(
-                    batch, 
-                    on_conflict="name,commune"
-                ).execute()
-                inserted_count += len(batch)
-                print(f"  ✅ Insertados {inserted_count}/{len(projects)} proyectos...")
-            except Exception as e:
-                errors += 1
-                print(f"  ⚠️  Error en batch {i//BATCH_SIZE + 1}: {e}")
-        
         print(f"\n🎉 Migración completada:")
-        print(f"   ✅ Insertados: {inserted_count} proyectos")
-        if errors > 0:
-            print(f"   ⚠️  Errores: {errors} batches")
+        print(f"   ✅ Insertados: {report.write.written} proyectos")
+        if report.write.failed > 0:
+            print(f"   ⚠️  Rechazados: {report.write.failed} proyectos")
+            for error in report.write.errors[:3]:
+                print(f"      {error}")
         
     except Exception as e:
         print(f"❌ Error durante la migración: {e}")
@@ -210,10 +180,12 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Importar CSV de TINSA a Supabase")
     parser.add_argument("--migrate", action="store_true", help="Ejecutar migración real (sin dry-run)")
     parser.add_argument("--preview", action="store_true", help="Solo mostrar preview del CSV")
+    parser.add_argument("--postgres", action="store_true",
+                        help="Escribir directo en Postgres (COPY + INSERT ... ON CONFLICT) vía SUPABASE_DB_URL")
     
     args = parser.parse_args()
     
     if args.preview:
         preview_csv(limit=20)
     else:
-        migrate_from_csv(dry_run=not args.migrate)
+        migrate_from_csv(dry_run=not args.migrate, postgres=args.postgres)
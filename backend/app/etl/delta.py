@@ -0,0 +1,203 @@
+"""
+Delta imports: only write what changed since the last import of a file.
+
+Every project payload and typology row gets a stable content hash. A local
+manifest (data/import_manifest.json) remembers, per Supabase URL and source
+file, the last imported hash and id of each project and the ids of its
+typology rows grouped by row hash:
+
+    {"version": 1, "imports": {"<url>|<file>": {
+        "<name>|<commune>": {"id": "...", "hash": "...",
+                             "typologies": {"<row hash>": ["<id>", ...]},
+                             "snapshots": {"<recorded_at>": "<hash>"}}}}}
+
+plan_delta() compares a fresh transform against that state:
+
+  - projects whose hash is unchanged are not sent at all;
+  - typology rows are matched by hash, so only new rows are inserted (with a
+    client-side id) and only rows that disappeared are deleted by id;
+  - projects the manifest does not know yet go through the regular
+    delete-by-project_id + insert path, since their current rows are unknown;
+  - period snapshots are upserted only when their hash changed.
+
+A full import is the same plan against an empty state: every project is
+upserted, its typologies are replaced, and the manifest is refreshed.
+Projects missing from the new file are left untouched either way.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+MANIFEST_FILE = Path(__file__).parent.parent.parent / "data" / "import_manifest.json"
+MANIFEST_VERSION = 1
+
+# Keys of child rows (typologies, snapshots) that are not content (links and ids)
+LINK_KEYS = ("_project_name", "_project_commune", "project_id", "id")
+
+
+def content_hash(record: dict) -> str:
+    """SHA-1 of a record's canonical JSON (sorted keys)."""
+    payload = json.dumps(record, sort_keys=True, default=str, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def row_hash(row: dict) -> str:
+    return content_hash({k: v for k, v in row.items() if k not in LINK_KEYS})
+
+
+def project_key(name: str, commune: str) -> str:
+    return f"{name}|{commune}"
+
+
+# ---------------------------------------------------------------------------
+# Manifest
+# ---------------------------------------------------------------------------
+
+def load_manifest() -> dict:
+    if MANIFEST_FILE.exists():
+        try:
+            with open(MANIFEST_FILE, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                return manifest
+        except (OSError, ValueError):
+            pass
+    return {"version": MANIFEST_VERSION, "imports": {}}
+
+
+def save_manifest(manifest: dict):
+    MANIFEST_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = MANIFEST_FILE.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    tmp.replace(MANIFEST_FILE)
+
+
+def manifest_scope(supabase_url: str, file_path: Path) -> str:
+    return f"{supabase_url}|{Path(file_path).name}"
+
+
+# ---------------------------------------------------------------------------
+# Planning
+# ---------------------------------------------------------------------------
+
+@dataclass
+class DeltaPlan:
+    upsert: list[dict] = field(default_factory=list)           # new or changed project payloads
+    project_hashes: dict[tuple, str] = field(default_factory=dict)
+    known_ids: dict[tuple, str] = field(default_factory=dict)  # (name, commune) → id from the manifest
+    replace: set[tuple] = field(default_factory=set)           # projects with unknown typology rows
+    typology_inserts: list[dict] = field(default_factory=list)  # rows with "id" and "_hash" preassigned
+    typology_deletes: list[str] = field(default_factory=list)
+    snapshot_upserts: list[dict] = field(default_factory=list)  # rows with "_hash" preassigned
+    unchanged_projects: int = 0
+    unchanged_typologies: int = 0
+    unchanged_snapshots: int = 0
+
+
+def plan_delta(payloads: list[dict], typologies: list[dict], state: dict, snapshots: list[dict] = ()) -> DeltaPlan:
+    """
+    Diff cleaned project payloads and typology rows against a manifest scope.
+
+    payloads are what insert_projects would send (None values already dropped),
+    so a hash change means the upsert would actually change something.
+    """
+    plan = DeltaPlan()
+    for p in payloads:
+        key = (p["name"], p["commune"])
+        h = content_hash(p)
+        plan.project_hashes[key] = h
+        entry = state.get(project_key(*key))
+        if entry:
+            plan.known_ids[key] = entry["id"]
+            if entry["hash"] == h:
+                plan.unchanged_projects += 1
+                continue
+        else:
+            plan.replace.add(key)
+        plan.upsert.append(p)
+
+    by_project = defaultdict(list)
+    for t in typologies:
+        by_project[(t["_project_name"], t["_project_commune"])].append(t)
+
+    for key, rows in by_project.items():
+        if key in plan.replace:
+            for t in rows:
+                plan.typology_inserts.append({**t, "id": str(uuid.uuid4()), "_hash": row_hash(t)})
+            continue
+        entry = state.get(project_key(*key), {})
+        old = entry.get("typologies", {})
+        new = defaultdict(list)
+        for t in rows:
+            new[row_hash(t)].append(t)
+        for h, same in new.items():
+            kept = min(len(same), len(old.get(h, [])))
+            plan.unchanged_typologies += kept
+            for t in same[kept:]:
+                plan.typology_inserts.append({**t, "id": str(uuid.uuid4()), "_hash": h})
+        for h, ids in old.items():
+            plan.typology_deletes.extend(ids[len(new.get(h, [])):])
+
+    # Known projects that lost all their typology rows
+    for p in payloads:
+        key = (p["name"], p["commune"])
+        if key not in by_project and key not in plan.replace:
+            for ids in state.get(project_key(*key), {}).get("typologies", {}).values():
+                plan.typology_deletes.extend(ids)
+
+    for snap in snapshots:
+        h = row_hash(snap)
+        old = state.get(project_key(snap["_project_name"], snap["_project_commune"]), {}).get("snapshots", {})
+        if old.get(snap["recorded_at"]) == h:
+            plan.unchanged_snapshots += 1
+        else:
+            plan.snapshot_upserts.append({**snap, "_hash": h})
+    return plan
+
+
+def updated_state(state: dict, plan: DeltaPlan, project_ids: dict[tuple, str],
+                  failed_projects: set[tuple], inserted: list[dict], deleted: set[str],
+                  snapshots: list[dict] = ()) -> dict:
+    """
+    Manifest scope after applying a plan.
+
+    Projects whose upsert failed keep their previous hash so they are retried
+    next run; typology ids and snapshot hashes only enter (or leave) the
+    manifest once their write went through.
+    """
+    new_state = {k: {**v, "typologies": {h: list(ids) for h, ids in v.get("typologies", {}).items()},
+                     "snapshots": dict(v.get("snapshots", {}))}
+                 for k, v in state.items()}
+
+    for key, h in plan.project_hashes.items():
+        pid = project_ids.get(key)
+        if pid is None or key in failed_projects:
+            continue
+        entry = new_state.setdefault(project_key(*key), {"typologies": {}, "snapshots": {}})
+        entry["id"], entry["hash"] = pid, h
+        if key in plan.replace:
+            entry["typologies"] = {}
+
+    for key_str, entry in new_state.items():
+        for h, ids in list(entry["typologies"].items()):
+            ids = [i for i in ids if i not in deleted]
+            if ids:
+                entry["typologies"][h] = ids
+            else:
+                del entry["typologies"][h]
+
+    for t in inserted:
+        key_str = project_key(t["_project_name"], t["_project_commune"])
+        if key_str in new_state:
+            new_state[key_str]["typologies"].setdefault(t["_hash"], []).append(t["id"])
+    for snap in snapshots:
+        key_str = project_key(snap["_project_name"], snap["_project_commune"])
+        if key_str in new_state:
+            new_state[key_str]["snapshots"][snap["recorded_at"]] = snap["_hash"]
+    return new_state
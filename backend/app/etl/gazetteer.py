@@ -0,0 +1,217 @@
+"""
+Offline gazetteer: commune centroids and known street points, no network.
+
+The gazetteer file (data/gazetteer_cl.csv) has one row per place:
+
+    level,region,commune,street,number,lat,lon
+    commune,RM,PROVIDENCIA,,,-33.4314,-70.6093
+    street,RM,PROVIDENCIA,avenida providencia,1234,-33.4260,-70.6160
+
+The bundled file only has commune rows, so on a fresh database the
+gazetteer is a commune-centroid fallback; the street tier starts answering
+once street rows are built from the database with --from-db.
+
+Gazetteer.load() indexes it in memory once per process: communes by folded
+name, streets by (commune, canonical street) with their numbers sorted.
+GeocodingService asks it before and after the network providers:
+
+    locate()   street-level match: the exact number when known (precision
+               "address"), else interpolated between the nearest known
+               numbers or the street's median point ("street");
+    centroid() the commune centroid ("commune"), the last resort when the
+               providers find nothing (or the only answer with --offline).
+
+Street rows come from projects geocoded at address precision (a provider
+or the source data), never from centroids or interpolated points, so
+locate() cannot return an approximation as an "address" hit. Rebuild them
+with:
+
+    python -m app.etl.gazetteer --from-db     # rewrite street rows from address-precision projects
+    python -m app.etl.gazetteer               # counts per level
+"""
+from __future__ import annotations
+
+import bisect
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import pandas as pd
+
+from app.etl.addresses import canonical_region, fold, parse_address
+
+GAZETTEER_FILE = Path(__file__).parent.parent.parent / "data" / "gazetteer_cl.csv"
+COLUMNS = ["level", "region", "commune", "street", "number", "lat", "lon"]
+
+# Precision levels, best first
+PRECISION_ADDRESS = "address"
+PRECISION_STREET = "street"
+PRECISION_COMMUNE = "commune"
+PRECISIONS = (PRECISION_ADDRESS, PRECISION_STREET, PRECISION_COMMUNE)
+
+
+class Geocode(NamedTuple):
+    lat: float
+    lon: float
+    precision: str = PRECISION_ADDRESS
+
+
+@dataclass
+class _Street:
+    numbers: list[int] = field(default_factory=list)
+    points: list[tuple[float, float]] = field(default_factory=list)  # same order as numbers
+    median: tuple[float, float] = (0.0, 0.0)
+
+
+class Gazetteer:
+    """In-memory index of the gazetteer file."""
+
+    def __init__(self, rows: pd.DataFrame):
+        self.communes: dict[str, tuple[float, float]] = {}
+        self.communes_by_region: dict[tuple[str, str], tuple[float, float]] = {}
+        self.streets: dict[tuple[str, str], _Street] = {}
+
+        rows = rows.dropna(subset=["lat", "lon"])
+        for r in rows[rows["level"] == "commune"].itertuples(index=False):
+            point = (float(r.lat), float(r.lon))
+            self.communes.setdefault(fold(r.commune), point)
+            self.communes_by_region[(fold(r.commune), canonical_region(r.region))] = point
+
+        streets = rows[rows["level"] == "street"]
+        for (commune, street), group in streets.groupby([streets["commune"].map(fold), "street"], sort=False):
+            entry = _Street(median=(float(group["lat"].median()), float(group["lon"].median())))
+            numbered = group.dropna(subset=["number"]).sort_values("number")
+            entry.numbers = numbered["number"].astype(int).tolist()
+            entry.points = list(zip(numbered["lat"].astype(float), numbered["lon"].astype(float)))
+            self.streets[(commune, street)] = entry
+
+    @classmethod
+    def load(cls, path: Path = GAZETTEER_FILE) -> "Gazetteer":
+        return cls(read_gazetteer(path))
+
+    def __len__(self) -> int:
+        return len(self.communes) + len(self.streets)
+
+    def locate(self, address: str, commune: str, region: str = "") -> Optional[Geocode]:
+        """Street-level match for an address, or None when its street is not in the gazetteer."""
+        street, number = parse_address(address or "", commune or "")
+        entry = self.streets.get((fold(commune), street)) if street else None
+        if entry is None:
+            return None
+        if number is None or not entry.numbers:
+            return Geocode(*entry.median, PRECISION_STREET)
+
+        n = int(number)
+        i = bisect.bisect_left(entry.numbers, n)
+        if i < len(entry.numbers) and entry.numbers[i] == n:
+            return Geocode(*entry.points[i], PRECISION_ADDRESS)
+        if i == 0 or i == len(entry.numbers):
+            # Outside the known range: nearest known number
+            return Geocode(*entry.points[min(i, len(entry.numbers) - 1)], PRECISION_STREET)
+        (lo_n, hi_n), (lo, hi) = entry.numbers[i - 1:i + 1], entry.points[i - 1:i + 1]
+        t = (n - lo_n) / (hi_n - lo_n)
+        return Geocode(round(lo[0] + t * (hi[0] - lo[0]), 7), round(lo[1] + t * (hi[1] - lo[1]), 7), PRECISION_STREET)
+
+    def centroid(self, commune: str, region: str = "") -> Optional[Geocode]:
+        """Centroid of the commune (disambiguated by region when given), or None."""
+        key = fold(commune)
+        point = self.communes_by_region.get((key, canonical_region(region))) or self.communes.get(key)
+        return Geocode(*point, PRECISION_COMMUNE) if point else None
+
+
+def read_gazetteer(path: Path = GAZETTEER_FILE) -> pd.DataFrame:
+    if not Path(path).exists():
+        return pd.DataFrame(columns=COLUMNS)
+    return pd.read_csv(path, comment="#", dtype={"region": str, "commune": str, "street": str},
+                       keep_default_na=False, na_values={"number": [""], "lat": [""], "lon": [""]})
+
+
+@lru_cache(maxsize=None)
+def load_gazetteer(path: Path = GAZETTEER_FILE) -> Gazetteer:
+    """The gazetteer at `path`, loaded once per process."""
+    return Gazetteer.load(path)
+
+
+# ----------------------------------------------------------------------------
+# Building street rows from geocoded projects
+# ----------------------------------------------------------------------------
+
+def street_rows(projects: list[dict]) -> pd.DataFrame:
+    """
+    Street rows from projects with address and coordinates at address
+    precision: one per (commune, street, number), at the median of the
+    projects there. A missing geocode_precision counts as "address"
+    (coordinates from the source data or written before the column existed).
+    """
+    records = []
+    for p in projects:
+        if p.get("latitude") is None or p.get("longitude") is None or not p.get("address"):
+            continue
+        if (p.get("geocode_precision") or PRECISION_ADDRESS) != PRECISION_ADDRESS:
+            continue  # centroid or interpolated point
+        street, number = parse_address(p["address"], p.get("commune") or "")
+        if not street:
+            continue
+        records.append(("street", p.get("region") or "", (p.get("commune") or "").strip().upper(), street,
+                        int(number) if number else None, float(p["latitude"]), float(p["longitude"])))
+    frame = pd.DataFrame(records, columns=COLUMNS).astype({"number": "Int64"})
+    keys = ["level", "region", "commune", "street", "number"]
+    return frame.groupby(keys, dropna=False, sort=True)[["lat", "lon"]].median().round(7).reset_index()
+
+
+def write_gazetteer(streets: pd.DataFrame, path: Path = GAZETTEER_FILE):
+    """Replace the street rows of the gazetteer file, keeping its header comments and commune rows."""
+    path = Path(path)
+    header = []
+    if path.exists():
+        with open(path, encoding="utf-8") as f:
+            header = [line for line in f if line.startswith("#")]
+    current = read_gazetteer(path)
+    communes = current[current["level"] == "commune"]
+    rows = pd.concat([communes[COLUMNS].astype(object), streets[COLUMNS].astype(object)], ignore_index=True)
+    rows = rows.astype({"number": "Int64", "lat": float, "lon": float})
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.writelines(header)
+        rows.to_csv(f, index=False)
+    load_gazetteer.cache_clear()
+
+
+def fetch_geocoded_projects(supabase, page_size: int = 1000) -> list[dict]:
+    """Projects with coordinates at address precision, paged (PostgREST caps rows per response)."""
+    projects, start = [], 0
+    while True:
+        page = (supabase.table("projects").select("address, commune, region, latitude, longitude, geocode_precision")
+                .range(start, start + page_size - 1).execute().data)
+        projects.extend(p for p in page if p.get("latitude") is not None
+                        and (p.get("geocode_precision") or PRECISION_ADDRESS) == PRECISION_ADDRESS)
+        if len(page) < page_size:
+            return projects
+        start += page_size
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Gazetteer offline de comunas y calles")
+    parser.add_argument("--from-db", action="store_true",
+                        help="Reconstruir las filas de calles desde los proyectos con coordenadas exactas")
+    parser.add_argument("--file", type=Path, default=GAZETTEER_FILE, help="Archivo del gazetteer")
+    args = parser.parse_args()
+
+    if args.from_db:
+        from app.etl.geocode_projects import get_supabase_client
+
+        projects = fetch_geocoded_projects(get_supabase_client())
+        streets = street_rows(projects)
+        write_gazetteer(streets, args.file)
+        print(f"✅ {len(streets):,} puntos de calle desde {len(projects):,} proyectos → {args.file}")
+
+    rows = read_gazetteer(args.file)
+    gazetteer = Gazetteer(rows)
+    print(f"📍 Gazetteer {args.file.name}: {len(gazetteer.communes):,} comunas, "
+          f"{len(gazetteer.streets):,} calles ({int((rows['level'] == 'street').sum()):,} puntos)")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,31 @@ Este script usa múltiples servicios de geocoding para completar
 las coordenadas faltantes en la base de datos.
 
 Servicios:
+0. Gazetteer local (data/gazetteer_cl.csv) - Sin red: calles conocidas
+   (el archivo incluido solo trae comunas; las calles se generan con
+   python -m app.etl.gazetteer --from-db)
 1. Nominatim (OpenStreetMap) - Gratuito, sin API key
 2. Google Maps - Fallback (requiere API key)
+3. Centroide de la comuna (gazetteer) - Último recurso
+
+Cada resultado lleva su precisión (address, street, commune), guardada en
+projects.geocode_precision, y la fecha del intento en projects.geocoded_at.
+Primero se procesan los proyectos sin coordenadas; los que quedaron en el
+centroide de su comuna se vuelven a buscar cuando su último intento tiene más
+de RETRY_AFTER_DAYS días, por si un proveedor ya encuentra la dirección. Las
+coordenadas que escribe un importador limpian geocode_precision (trigger
+clear_geocode_precision), así que un reintento nunca las reemplaza.
+
+Los proyectos se agrupan por dirección canónica (addresses: abreviaturas
+expandidas, sin tildes, número extraído) y cada dirección se geocodifica una
+sola vez. Las direcciones se geocodifican concurrentemente
+(geocoding_scheduler): cada proveedor tiene su propio token bucket
+(Nominatim: 1 request/s), y los cache hits no esperan al limitador.
+
+Las coordenadas se escriben en la BD mientras se geocodifica, en lotes (una
+llamada a la función update_project_coordinates por lote). Si la corrida se
+interrumpe, los resultados ya obtenidos quedan en la BD o en el cache, y la
+siguiente corrida los escribe sin volver a consultar a los proveedores.
 
 Uso:
     # Preview: ver cuántos proyectos necesitan geocoding
@@ -20,16 +43,20 @@ Uso:
     
     # Geocoding completo (todos los proyectos)
     python -m app.etl.geocode_projects
+    
+    # Sin red: solo gazetteer (calles conocidas y centroides comunales)
+    python -m app.etl.geocode_projects --offline --limit 100
 """
 
 import os
+import queue
 import sys
+import threading
 import time
-import json
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from dotenv import load_dotenv
 from typing import Optional, Tuple
-import hashlib
 
 load_dotenv(Path(__file__).parent.parent.parent / ".env")
 
@@ -37,10 +64,17 @@ from geopy.geocoders import Nominatim, GoogleV3
 from geopy.exc import GeocoderTimedOut, GeocoderServiceError
 from supabase import create_client, Client
 
+from app.etl.addresses import canonical_address
+from app.etl.gazetteer import PRECISION_ADDRESS, PRECISION_COMMUNE, PRECISIONS, Gazetteer, Geocode, load_gazetteer
+from app.etl.geocoding_cache import CACHE_FILE, GeocodingCache, make_key
+from app.etl.geocoding_scheduler import PROVIDER_LIMITS, GeocodingScheduler, RateLimit, make_buckets
+from app.etl.writer import BatchWriter
+
 # Configuration
-CACHE_FILE = Path(__file__).parent.parent.parent / "data" / "geocoding_cache.json"
-DELAY_BETWEEN_REQUESTS = 1.5  # Seconds (Nominatim requires 1 second minimum)
-BATCH_SIZE = 50  # Update DB every N geocoded projects
+BATCH_SIZE = 200  # Update DB every N geocoded projects...
+FLUSH_SECONDS = 2.0  # ...or this long after the first pending one
+UPDATE_FUNCTION = "update_project_coordinates"  # supabase/migrations/20260212000000_update_project_coordinates.sql
+RETRY_AFTER_DAYS = 30  # retry commune-centroid projects at most this often (20260214000000_geocode_retry.sql)
 
 def get_supabase_client() -> Client:
     """Initialize Supabase client."""
@@ -52,104 +86,100 @@ def get_supabase_client() -> Client:
     
     return create_client(url, key)
 
-class GeocodingCache:
-    """Simple file-based cache for geocoding results."""
-    
-    def __init__(self, cache_file: Path):
-        self.cache_file = cache_file
-        self.cache = self._load_cache()
-    
-    def _load_cache(self) -> dict:
-        """Load cache from file."""
-        if self.cache_file.exists():
-            try:
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return {}
-        return {}
-    
-    def _save_cache(self):
-        """Save cache to file."""
-        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(self.cache_file, 'w', encoding='utf-8') as f:
-            json.dump(self.cache, f, ensure_ascii=False, indent=2)
-    
-    def _make_key(self, address: str, commune: str, region: str) -> str:
-        """Create cache key from address components."""
-        key_str = f"{address}|{commune}|{region}".lower().strip()
-        return hashlib.md5(key_str.encode()).hexdigest()
-    
-    def get(self, address: str, commune: str, region: str) -> Optional[Tuple[float, float]]:
-        """Get cached coordinates."""
-        key = self._make_key(address, commune, region)
-        result = self.cache.get(key)
-        if result:
-            return (result['lat'], result['lon'])
-        return None
-    
-    def set(self, address: str, commune: str, region: str, lat: float, lon: float):
-        """Cache coordinates."""
-        key = self._make_key(address, commune, region)
-        self.cache[key] = {'lat': lat, 'lon': lon}
-        self._save_cache()
-
 class GeocodingService:
     """Multi-provider geocoding service with fallback."""
     
-    def __init__(self, cache: GeocodingCache):
+    def __init__(self, cache: GeocodingCache, nominatim=None, google=None,
+                 limits: dict[str, RateLimit] = PROVIDER_LIMITS, gazetteer: Gazetteer | None = None,
+                 offline: bool = False):
+        """
+        nominatim / google: geopy-like geocoders to use instead of the real ones (e.g. LocalGeocoder).
+        gazetteer: offline tier (default: the bundled data/gazetteer_cl.csv); offline skips the providers.
+        """
         self.cache = cache
+        self.gazetteer = gazetteer if gazetteer is not None else load_gazetteer()
+        self.offline = offline
         
         # Initialize Nominatim (free, no API key needed)
-        self.nominatim = Nominatim(
+        self.nominatim = nominatim or Nominatim(
             user_agent="mercado-inmobiliario-chile/1.0",
             timeout=10
         )
         
         # Initialize Google Maps (if API key available)
         google_api_key = os.getenv("GOOGLE_MAPS_API_KEY")
-        self.google = GoogleV3(api_key=google_api_key) if google_api_key else None
+        self.google = google or (GoogleV3(api_key=google_api_key) if google_api_key else None)
+        
+        # Rate limiting: one token bucket per provider, shared with GeocodingScheduler
+        self.limits = limits
+        self.buckets = make_buckets(limits)
         
         self.stats = {
             'cache_hits': 0,
+            'deduplicated': 0,
+            'gazetteer': 0,
             'nominatim_success': 0,
             'google_success': 0,
+            'commune_centroid': 0,
             'failures': 0
         }
     
-    def geocode(self, address: str, commune: str, region: str) -> Optional[Tuple[float, float]]:
+    def providers(self):
+        """(name, geocode(full_address)) pairs in fallback order; callers apply the rate limits."""
+        if self.offline:
+            return []
+        providers = [('nominatim', self._geocode_nominatim)]
+        if self.google:
+            providers.append(('google', self._geocode_google))
+        return providers
+    
+    def geocode(self, address: str, commune: str, region: str) -> Optional[Geocode]:
         """
         Geocode an address using multiple providers.
         
         Returns:
-            Tuple of (latitude, longitude) or None if not found
+            Geocode (latitude, longitude, precision) or None if not found
         """
-        # Check cache first
-        cached = self.cache.get(address, commune, region)
-        if cached:
-            self.stats['cache_hits'] += 1
-            return cached
+        # Check cache and local gazetteer first
+        local = self.locate_offline(address, commune, region)
+        if local:
+            return local
         
         # Build full address for Chile
         full_address = self._build_address(address, commune, region)
         
-        # Try Nominatim first (free)
-        coords = self._geocode_nominatim(full_address)
-        if coords:
-            self.stats['nominatim_success'] += 1
-            self.cache.set(address, commune, region, coords[0], coords[1])
-            return coords
-        
-        # Try Google Maps as fallback
-        if self.google:
-            coords = self._geocode_google(full_address)
+        # Try Nominatim first (free), then Google Maps as fallback
+        for name, geocode in self.providers():
+            self.buckets[name].wait()  # Rate limiting
+            coords = geocode(full_address)
             if coords:
-                self.stats['google_success'] += 1
+                self.stats[f'{name}_success'] += 1
                 self.cache.set(address, commune, region, coords[0], coords[1])
-                return coords
+                return Geocode(*coords)
         
-        self.stats['failures'] += 1
-        return None
+        return self.fallback(address, commune, region)
+    
+    def locate_offline(self, address: str, commune: str, region: str) -> Optional[Geocode]:
+        """Cache, then street-level gazetteer match; None when a provider has to be asked."""
+        cached = self.cache.get(address, commune, region)
+        if cached:
+            self.stats['cache_hits'] += 1
+            return Geocode(*cached)
+        
+        local = self.gazetteer.locate(address, commune, region)
+        if local:
+            self.stats['gazetteer'] += 1
+        return local
+    
+    def fallback(self, address: str, commune: str, region: str) -> Optional[Geocode]:
+        """
+        Commune centroid when no provider found the address. Not cached, and
+        stored with precision 'commune', which get_projects_without_coords
+        selects again after RETRY_AFTER_DAYS: a later run retries the address.
+        """
+        centroid = self.gazetteer.centroid(commune, region)
+        self.stats['commune_centroid' if centroid else 'failures'] += 1
+        return centroid
     
     def _build_address(self, address: str, commune: str, region: str) -> str:
         """Build full address string for geocoding."""
@@ -172,8 +202,6 @@ class GeocodingService:
     def _geocode_nominatim(self, address: str) -> Optional[Tuple[float, float]]:
         """Geocode using Nominatim (OpenStreetMap)."""
         try:
-            time.sleep(DELAY_BETWEEN_REQUESTS)  # Rate limiting
-            
             location = self.nominatim.geocode(
                 address,
                 country_codes='cl',  # Limit to Chile
@@ -193,8 +221,6 @@ class GeocodingService:
     def _geocode_google(self, address: str) -> Optional[Tuple[float, float]]:
         """Geocode using Google Maps."""
         try:
-            time.sleep(0.1)  # Small delay
-            
             location = self.google.geocode(
                 address,
                 components={'country': 'CL'}
@@ -216,28 +242,170 @@ class GeocodingService:
         
         print(f"\n📊 Estadísticas de Geocoding:")
         print(f"  ✅ Cache hits: {self.stats['cache_hits']}")
-        print(f"  ✅ Nominatim: {self.stats['nominatim_success']}")
-        if self.google:
+        if self.stats['deduplicated']:
+            print(f"  ♻️  Direcciones repetidas: {self.stats['deduplicated']}")
+        print(f"  📍 Gazetteer (calle): {self.stats['gazetteer']}")
+        if not self.offline:
+            print(f"  ✅ Nominatim: {self.stats['nominatim_success']}")
+        if self.google and not self.offline:
             print(f"  ✅ Google Maps: {self.stats['google_success']}")
+        print(f"  🏙️  Centroide comunal: {self.stats['commune_centroid']}")
         print(f"  ❌ Fallos: {self.stats['failures']}")
         
         success_rate = ((total - self.stats['failures']) / total * 100) if total > 0 else 0
         print(f"  📈 Tasa de éxito: {success_rate:.1f}%")
 
-def get_projects_without_coords(supabase: Client, limit: Optional[int] = None):
-    """Get projects that don't have coordinates."""
-    query = supabase.table('projects').select('id, name, address, commune, region, latitude, longitude')
-    
-    # Filter for projects without coordinates
-    query = query.is_('latitude', 'null')
-    
-    if limit:
-        query = query.limit(limit)
-    
-    result = query.execute()
-    return result.data
+class CoordinateWriter:
+    """
+    Write geocoded coordinates back in the background while geocoding goes on.
+
+    put() only queues the row; a writer thread sends queued rows every
+    BATCH_SIZE rows or FLUSH_SECONDS through the update_project_coordinates
+    RPC (one request per batch, failing batches bisected by BatchWriter).
+    Without that function in the database it falls back to one update per
+    project (coordinates, geocode_precision and geocoded_at, each column only
+    while it exists). Both paths only write projects that still need
+    geocoding, so source coordinates stored meanwhile by an importer are kept.
+    close() writes whatever is still queued, so call it in a `finally` or use
+    the writer as a context manager.
+    """
+
+    _CLOSE = object()
+
+    def __init__(self, supabase: Client, batch_size: int = BATCH_SIZE, flush_seconds: float = FLUSH_SECONDS):
+        self.supabase = supabase
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.writer = BatchWriter(supabase, 'projects', batch_size=self.batch_size, concurrency=1, retries=2)
+        self.use_rpc = None  # unknown until the first batch
+        self.optional_columns = ['geocode_precision', 'geocoded_at']  # per-project updates, until missing
+        self.written = 0
+        self.failed = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="coordinate-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, project_id, lat: float, lon: float, precision: str = PRECISION_ADDRESS):
+        self._queue.put({'id': project_id, 'latitude': lat, 'longitude': lon, 'geocode_precision': precision})
+
+    def close(self):
+        self._queue.put(self._CLOSE)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _run(self):
+        batch, deadline, closing = [], 0.0, False
+        while not closing:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()) if batch else None)
+            except queue.Empty:
+                item = None
+            if item is self._CLOSE:
+                closing = True
+            elif item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_seconds
+                batch.append(item)
+            if batch and (closing or item is None or len(batch) >= self.batch_size):
+                self._write(batch)
+                batch = []
+
+    def _write(self, batch: list[dict]):
+        if self.use_rpc is None:
+            # First batch as a single call, to find out whether the migration is applied
+            try:
+                self.supabase.rpc(UPDATE_FUNCTION, {'coords': batch}).execute()
+                self.use_rpc = True
+                self.written += len(batch)
+                print(f"  💾 Actualizados {len(batch)} proyectos en BD")
+                return
+            except Exception as e:
+                missing = "PGRST202" in str(e) or "Could not find the function" in str(e)
+                if missing:
+                    print(f"  ⚠️  {UPDATE_FUNCTION} no disponible en la BD; actualizando proyecto por proyecto")
+                self.use_rpc = not missing
+        
+        if self.use_rpc:
+            report = self.writer.rpc(UPDATE_FUNCTION, 'coords', batch)
+            self.written += report.written
+            self.failed += report.failed
+            print(f"  💾 Actualizados {report.written} proyectos en BD")
+            for error in report.errors[:3]:
+                print(f"  ⚠️  Error actualizando BD: {error}")
+            return
+        
+        written = 0
+        geocoded_at = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        for update in batch:
+            try:
+                while True:
+                    values = {'latitude': update['latitude'], 'longitude': update['longitude'],
+                              'geocode_precision': update['geocode_precision'], 'geocoded_at': geocoded_at}
+                    values = {k: v for k, v in values.items()
+                              if k in ('latitude', 'longitude') or k in self.optional_columns}
+                    query = self.supabase.table('projects').update(values).eq('id', update['id'])
+                    # Same guard as the RPC: only projects that still need geocoding
+                    if 'geocode_precision' in self.optional_columns:
+                        query = query.or_(f'latitude.is.null,geocode_precision.eq.{PRECISION_COMMUNE}')
+                    else:
+                        query = query.is_('latitude', 'null')
+                    try:
+                        query.execute()
+                        break
+                    except Exception as e:
+                        missing = next((c for c in self.optional_columns if c in str(e)), None)
+                        if missing is None:
+                            raise
+                        # Migration 20260213000000_geocode_precision / 20260214000000_geocode_retry not applied
+                        print(f"  ⚠️  projects.{missing} no existe en la BD; se escribe sin esa columna")
+                        self.optional_columns.remove(missing)
+                written += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"  ⚠️  Error actualizando BD: {e}")
+        self.written += written
+        print(f"  💾 Actualizados {written} proyectos en BD")
 
-def geocode_projects(dry_run: bool = True, limit: Optional[int] = None, preview_only: bool = False):
+
+def get_projects_without_coords(supabase: Client, limit: Optional[int] = None,
+                                retry_after_days: int = RETRY_AFTER_DAYS):
+    """
+    Get projects without coordinates first, then (within `limit`) projects
+    at their commune centroid whose last attempt is older than retry_after_days.
+    """
+    columns = 'id, name, address, commune, region, latitude, longitude'
+    
+    def fetch(query, count: Optional[int]):
+        if count:
+            query = query.limit(count)
+        return query.execute().data
+    
+    projects = fetch(supabase.table('projects').select(columns).is_('latitude', 'null'), limit)
+    if limit and len(projects) >= limit:
+        return projects
+    
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=retry_after_days)).strftime('%Y-%m-%dT%H:%M:%SZ')
+    try:
+        retries = fetch(supabase.table('projects').select(columns + ', geocode_precision, geocoded_at')
+                        .eq('geocode_precision', PRECISION_COMMUNE)
+                        .or_(f'geocoded_at.is.null,geocoded_at.lt.{cutoff}'),
+                        limit - len(projects) if limit else None)
+    except Exception as e:
+        if 'geocode_precision' not in str(e) and 'geocoded_at' not in str(e):
+            raise
+        # Migrations 20260213000000_geocode_precision / 20260214000000_geocode_retry not applied:
+        # without the trigger a retry could overwrite source coordinates, so don't retry
+        print("  ⚠️  Migraciones de geocode_precision/geocoded_at no aplicadas; solo proyectos sin coordenadas")
+        return projects
+    return projects + retries
+
+def geocode_projects(dry_run: bool = True, limit: Optional[int] = None, preview_only: bool = False,
+                     offline: bool = False):
     """Main geocoding function."""
     print("🗺️  Geocoding de Proyectos sin Coordenadas")
     print(f"{'='*80}\n")
@@ -248,7 +416,9 @@ def geocode_projects(dry_run: bool = True, limit: Optional[int] = None, preview_
     print(f"📊 Buscando proyectos sin coordenadas...")
     projects = get_projects_without_coords(supabase, limit=limit)
     
-    print(f"✅ Encontrados: {len(projects):,} proyectos sin coordenadas")
+    retries = sum(1 for p in projects if p.get('latitude') is not None)
+    print(f"✅ Encontrados: {len(projects):,} proyectos sin coordenadas"
+          + (f" ({retries:,} con centroide comunal, se reintentan)" if retries else ""))
     
     if preview_only:
         print(f"\n📋 Muestra de proyectos:")
@@ -260,81 +430,83 @@ def geocode_projects(dry_run: bool = True, limit: Optional[int] = None, preview_
         print("\n✅ Todos los proyectos ya tienen coordenadas!")
         return
     
-    # Initialize geocoding service
-    cache = GeocodingCache(CACHE_FILE)
-    geocoder = GeocodingService(cache)
-    
+    # Initialize geocoding service (results are appended to the cache log in batches)
+    with GeocodingCache(CACHE_FILE) as cache:
+        _geocode_all(projects, GeocodingService(cache, offline=offline), supabase, dry_run, limit)
+
+
+def _geocode_all(projects: list, geocoder: "GeocodingService", supabase: Client, dry_run: bool,
+                 limit: Optional[int]):
+    """
+    Group the projects by canonical address, geocode each address once
+    (concurrently, GeocodingScheduler) and write the coordinates of every
+    project in the group back as results come in (CoordinateWriter, unless
+    dry_run). On interruption the rows already queued are still written.
+    """
     print(f"\n🔄 Iniciando geocoding...")
     if dry_run:
         print(f"⚠️  Modo DRY RUN - No se actualizará la base de datos\n")
     
     geocoded_count = 0
     failed_count = 0
-    updates_batch = []
+    by_precision = dict.fromkeys(PRECISIONS, 0)
     
+    # Group by canonical address; skip projects without address info
+    groups: dict[str, list] = {}
+    raw_keys = set()
     for idx, project in enumerate(projects, 1):
-        project_id = project['id']
-        name = project['name']
-        address = project.get('address', '')
-        commune = project.get('commune', '')
-        region = project.get('region', 'RM')
-        
-        # Skip if no address info
-        if not address and not commune:
-            print(f"  ⚠️  [{idx}/{len(projects)}] {name[:40]:40s} - Sin dirección")
+        if not project.get('address') and not project.get('commune'):
+            print(f"  ⚠️  [{idx}/{len(projects)}] {project['name'][:40]:40s} - Sin dirección")
             failed_count += 1
             continue
-        
-        # Geocode
-        coords = geocoder.geocode(address or '', commune or '', region or '')
-        
-        if coords:
-            lat, lon = coords
-            print(f"  ✅ [{idx}/{len(projects)}] {name[:40]:40s} → ({lat:.6f}, {lon:.6f})")
-            
-            geocoded_count += 1
+        item = (project.get('address') or '', project.get('commune') or '', project.get('region', 'RM') or '')
+        groups.setdefault(canonical_address(*item), []).append((idx, project, item))
+        raw_keys.add(make_key(*item))
+    
+    grouped = sum(len(group) for group in groups.values())
+    saved = grouped - len(groups)
+    print(f"  🧭 {grouped:,} proyectos con dirección → {len(groups):,} direcciones distintas "
+          f"({saved:,} llamadas a proveedores ahorradas, {len(raw_keys) - len(groups):,} por normalización)")
+    groups = list(groups.values())
+    
+    def on_result(i: int, coords: Optional[Geocode]):
+        nonlocal geocoded_count, failed_count
+        for idx, project, _ in groups[i]:
+            name = project['name']
             
-            if not dry_run:
-                updates_batch.append({
-                    'id': project_id,
-                    'latitude': lat,
-                    'longitude': lon
-                })
+            if coords:
+                lat, lon, precision = coords
+                tag = "" if precision == PRECISION_ADDRESS else f" [{precision}]"
+                print(f"  ✅ [{idx}/{len(projects)}] {name[:40]:40s} → ({lat:.6f}, {lon:.6f}){tag}")
                 
-                # Update in batches
-                if len(updates_batch) >= BATCH_SIZE:
-                    try:
-                        for update in updates_batch:
-                            supabase.table('projects').update({
-                                'latitude': update['latitude'],
-                                'longitude': update['longitude']
-                            }).eq('id', update['id']).execute()
-                        print(f"  💾 Actualizados {len(updates_batch)} proyectos en BD")
-                        updates_batch = []
-                    except Exception as e:
-                        print(f"  ⚠️  Error actualizando BD: {e}")
-        else:
-            print(f"  ❌ [{idx}/{len(projects)}] {name[:40]:40s} - No encontrado")
-            failed_count += 1
-    
-    # Update remaining batch
-    if not dry_run and updates_batch:
-        try:
-            for update in updates_batch:
-                supabase.table('projects').update({
-                    'latitude': update['latitude'],
-                    'longitude': update['longitude']
-                }).eq('id', update['id']).execute()
-            print(f"  💾 Actualizados {len(updates_batch)} proyectos en BD")
-        except Exception as e:
-            print(f"  ⚠️  Error actualizando BD: {e}")
+                geocoded_count += 1
+                by_precision[precision] += 1
+                
+                # Written even when a retried centroid is unchanged: it stamps geocoded_at
+                if writer:
+                    writer.put(project['id'], lat, lon, precision)
+            else:
+                print(f"  ❌ [{idx}/{len(projects)}] {name[:40]:40s} - No encontrado")
+                failed_count += 1
+    
+    # Each address is geocoded as spelled in the first project of its group
+    writer = None if dry_run else CoordinateWriter(supabase)
+    try:
+        GeocodingScheduler(geocoder).run([group[0][2] for group in groups], on_result)
+    finally:
+        if writer:
+            writer.close()
     
     # Print summary
     print(f"\n{'='*80}")
     print(f"📊 RESUMEN")
     print(f"{'='*80}")
-    print(f"✅ Geocodificados: {geocoded_count:,}")
+    print(f"✅ Geocodificados: {geocoded_count:,} "
+          f"({', '.join(f'{level}: {n:,}' for level, n in by_precision.items())})")
     print(f"❌ Fallidos: {failed_count:,}")
+    print(f"🔁 Llamadas a proveedores ahorradas por agrupación: {saved:,}")
+    if writer:
+        print(f"💾 Escritos en BD: {writer.written:,} ({writer.failed:,} con error)")
     
     geocoder.print_stats()
     
@@ -349,6 +521,8 @@ if __name__ == "__main__":
     parser.add_argument("--dry-run", action="store_true", help="Modo dry-run (no actualizar BD)")
     parser.add_argument("--preview", action="store_true", help="Solo mostrar proyectos sin coordenadas")
     parser.add_argument("--limit", type=int, help="Limitar número de proyectos a procesar")
+    parser.add_argument("--offline", action="store_true",
+                        help="Solo gazetteer local (calles conocidas y centroides comunales), sin proveedores de red")
     
     args = parser.parse_args()
     
@@ -358,5 +532,6 @@ if __name__ == "__main__":
     geocode_projects(
         dry_run=dry_run,
         limit=args.limit,
-        preview_only=args.preview
+        preview_only=args.preview,
+        offline=args.offline
     )
@@ -0,0 +1,203 @@
+"""
+Geocoding cache: an append-only JSON-lines log with write-behind flushes.
+
+Every result is one line, {"k": key, "lat": ..., "lon": ...}. set() only
+updates the in-memory dict and queues the line; queued lines are appended
+in one write every FLUSH_EVERY results or FLUSH_SECONDS, and on flush() /
+close() / leaving a `with` block. A lookup never rewrites the file.
+
+Loading reads the log top to bottom, later lines winning. A crash can leave
+at most a torn last line, which is skipped. When superseded lines outnumber
+live entries the log is compacted: the live entries go to a temp file that
+is fsynced and renamed over the log, so an interrupted compaction leaves
+either the old log or the new one.
+
+The log (data/geocoding_cache.jsonl) is local to each checkout and not
+tracked. The tracked snapshot, data/geocoding_cache.json (pretty-printed,
+key → {"lat", "lon"}), is read before the log on every load; entries the
+log lacks (a first load, or entries a teammate committed) are appended to
+it, so the log always holds the union and local results win. The snapshot
+is rewritten from the live entries on every compaction, which close() runs
+when the session added results. Committing it shares the cache.
+
+Entries are keyed by the canonical address (addresses.canonical_address),
+so spellings of the same address share one entry. Older entries were keyed
+by the raw lowercased text (make_key); get() still finds them and copies
+the hit to the canonical key.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+from app.etl.addresses import canonical_address
+
+CACHE_FILE = Path(__file__).parent.parent.parent / "data" / "geocoding_cache.jsonl"
+SNAPSHOT_FILE = Path(__file__).parent.parent.parent / "data" / "geocoding_cache.json"
+FLUSH_EVERY = 100  # queued results per append
+FLUSH_SECONDS = 5.0  # ...or at most this long after the oldest queued one
+COMPACT_MIN_LINES = 1_000
+
+
+def make_key(address: str, commune: str, region: str) -> str:
+    """Former cache key from address components (md5 of the lowercased 'address|commune|region')."""
+    key_str = f"{address}|{commune}|{region}".lower().strip()
+    return hashlib.md5(key_str.encode()).hexdigest()
+
+
+def canonical_key(address: str, commune: str, region: str) -> str:
+    """Cache key: md5 of the canonical address."""
+    return hashlib.md5(canonical_address(address, commune, region).encode()).hexdigest()
+
+
+class GeocodingCache:
+    """Append-only, write-behind cache of geocoded coordinates."""
+
+    def __init__(self, cache_file: Path = CACHE_FILE, snapshot_file: Path | None = SNAPSHOT_FILE,
+                 flush_every: int = FLUSH_EVERY, flush_seconds: float = FLUSH_SECONDS):
+        self.cache_file = Path(cache_file)
+        self.snapshot_file = Path(snapshot_file) if snapshot_file else None
+        self.flush_every = max(1, flush_every)
+        self.flush_seconds = flush_seconds
+        self.cache: dict[str, dict] = {}
+        self._pending: list[str] = []
+        self._pending_since = 0.0
+        self._lines = 0  # lines in the log, superseded ones included
+        self._torn = False  # log ends mid-line: the next append starts a new one
+        self._added = 0  # results set since the last compaction
+        self._lock = threading.Lock()
+        self._load()
+
+    # Loading
+    def _load(self):
+        snapshot = self._read_snapshot()
+        if self.cache_file.exists():
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    self._torn = not line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                        self.cache[entry["k"]] = {"lat": entry["lat"], "lon": entry["lon"]}
+                    except (ValueError, KeyError, TypeError):
+                        continue  # torn write from an interrupted run
+                    self._lines += 1
+        missing = {k: v for k, v in snapshot.items() if k not in self.cache}
+        if missing:
+            # Snapshot entries the log lacks: append them so the next
+            # compaction (which rewrites the snapshot) keeps them
+            self.cache.update(missing)
+            self._pending = [json.dumps({"k": k, **v}, ensure_ascii=False) for k, v in missing.items()]
+            self.flush()
+            print(f"  🗂️  Cache de geocoding: {len(missing):,} entradas de "
+                  f"{self.snapshot_file.name} añadidas a {self.cache_file.name}")
+        if self._lines >= COMPACT_MIN_LINES and self._lines > 2 * len(self.cache):
+            self.compact()
+
+    def _read_snapshot(self) -> dict[str, dict]:
+        if self.snapshot_file is None or not self.snapshot_file.exists():
+            return {}
+        try:
+            with open(self.snapshot_file, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(snapshot, dict):
+            return {}
+        return {k: {"lat": v["lat"], "lon": v["lon"]} for k, v in snapshot.items()
+                if isinstance(v, dict) and "lat" in v and "lon" in v}
+
+    # Lookups
+    def _make_key(self, address: str, commune: str, region: str) -> str:
+        return canonical_key(address, commune, region)
+
+    def get(self, address: str, commune: str, region: str) -> Optional[Tuple[float, float]]:
+        """Get cached coordinates (canonical key first, then the former raw key)."""
+        result = self.cache.get(self._make_key(address, commune, region))
+        if result:
+            return (result['lat'], result['lon'])
+        result = self.cache.get(make_key(address, commune, region))
+        if result:
+            self.set(address, commune, region, result['lat'], result['lon'])
+            return (result['lat'], result['lon'])
+        return None
+
+    def set(self, address: str, commune: str, region: str, lat: float, lon: float):
+        """Cache coordinates; written to disk with the next flush."""
+        key = self._make_key(address, commune, region)
+        value = {'lat': lat, 'lon': lon}
+        with self._lock:
+            if self.cache.get(key) == value:
+                return
+            self.cache[key] = value
+            self._added += 1
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            self._pending.append(json.dumps({"k": key, **value}, ensure_ascii=False))
+            due = (len(self._pending) >= self.flush_every
+                   or time.monotonic() - self._pending_since >= self.flush_seconds)
+        if due:
+            self.flush()
+
+    def __len__(self) -> int:
+        return len(self.cache)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.cache
+
+    # Persistence
+    def flush(self):
+        """Append the queued results in one write (fsynced)."""
+        with self._lock:
+            if not self._pending:
+                return
+            lines, self._pending = self._pending, []
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.cache_file, "a", encoding="utf-8") as f:
+                f.write(("\n" if self._torn else "") + "\n".join(lines) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._torn = False
+            self._lines += len(lines)
+
+    def compact(self):
+        """
+        Rewrite the log with one line per live entry, and the tracked
+        snapshot with the same entries (temp files + atomic renames).
+        """
+        with self._lock:
+            self._pending = []
+            lines = "".join(json.dumps({"k": key, **value}, ensure_ascii=False) + "\n"
+                            for key, value in self.cache.items())
+            _replace(self.cache_file, lines)
+            if self.snapshot_file is not None:
+                _replace(self.snapshot_file, json.dumps(self.cache, indent=2))
+            self._lines = len(self.cache)
+            self._torn = False
+            self._added = 0
+
+    def close(self):
+        """Flush, then compact when this session added results, refreshing the tracked snapshot."""
+        self.flush()
+        if self._added and self.snapshot_file is not None:
+            self.compact()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _replace(path: Path, text: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
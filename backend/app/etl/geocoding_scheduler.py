@@ -0,0 +1,159 @@
+"""
+Concurrent geocoding with a token bucket per provider.
+
+GeocodingScheduler runs many lookups on one asyncio loop. For every address:
+
+1. the cache and the offline gazetteer answer at once (no limiter involved);
+2. an address already being looked up joins that lookup instead of
+   starting another one;
+3. otherwise the providers are tried in order. Each provider call takes
+   a slot of the provider's concurrency limit, then runs in a worker thread
+   that waits for a token from the provider's bucket and makes the
+   (blocking) geopy call;
+4. when no provider finds it, the commune centroid (GeocodingService.fallback).
+
+Nominatim's usage policy allows one request per second, so its bucket holds
+a single token refilled every second and one request at a time; Google runs
+several requests in parallel. Waiting on Nominatim never delays cache hits,
+other addresses' Google calls or duplicated addresses.
+
+TokenBucket.reserve() books a token and returns how long to wait for it;
+the bucket is thread-safe, so GeocodingService.geocode (one call at a time)
+and the scheduler's worker threads share the same limit.
+
+local_geocoder.LocalGeocoder stands in for geopy's geocoders in tests and
+benchmarks.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+
+from app.etl.gazetteer import Geocode
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    rate: float  # requests per second
+    burst: int = 1  # tokens that can accumulate while idle
+    concurrency: int = 1  # requests in flight at once
+
+
+PROVIDER_LIMITS = {
+    "nominatim": RateLimit(rate=1.0, burst=1, concurrency=1),  # OSM usage policy: max 1 request/s
+    "google": RateLimit(rate=40.0, burst=10, concurrency=8),
+}
+CONCURRENCY = 64  # addresses in progress at once
+
+
+class TokenBucket:
+    """Thread-safe token bucket; reserve() books a token, possibly in the future."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token and return the seconds to wait before using it (0 if available now)."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def wait(self):
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+
+def make_buckets(limits: dict[str, RateLimit] = PROVIDER_LIMITS) -> dict[str, TokenBucket]:
+    return {name: TokenBucket(limit.rate, limit.burst) for name, limit in limits.items()}
+
+
+class GeocodingScheduler:
+    """
+    Geocode many addresses concurrently through a GeocodingService: its
+    cache, its providers (service.providers()) and its stats, with the
+    service's token buckets shared so sync and async calls respect one limit.
+    """
+
+    def __init__(self, service, limits: dict[str, RateLimit] | None = None, concurrency: int = CONCURRENCY):
+        self.service = service
+        self.limits = limits or service.limits
+        self.concurrency = max(1, concurrency)
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._slots: dict[str, asyncio.Semaphore] = {}
+
+    async def geocode(self, address: str, commune: str, region: str):
+        """Geocode (lat, lon, precision) or None, like GeocodingService.geocode."""
+        service = self.service
+        local = service.locate_offline(address, commune, region)
+        if local:
+            return local
+
+        key = service.cache._make_key(address, commune, region)
+        if key in self._inflight:
+            service.stats['deduplicated'] += 1
+            return await asyncio.shield(self._inflight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            coords = await self._lookup(service._build_address(address, commune, region))
+            if coords:
+                service.cache.set(address, commune, region, coords[0], coords[1])
+                coords = Geocode(*coords)
+            else:
+                coords = service.fallback(address, commune, region)
+            future.set_result(coords)
+            return coords
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _lookup(self, full_address: str):
+        for name, geocode in self.service.providers():
+            limit = self.limits[name]
+            slots = self._slots.setdefault(name, asyncio.Semaphore(limit.concurrency))
+            async with slots:
+                coords = await asyncio.to_thread(self._limited, name, geocode, full_address)
+            if coords:
+                self.service.stats[f'{name}_success'] += 1
+                return coords
+        return None
+
+    def _limited(self, name: str, geocode, full_address: str):
+        # Waiting for the token in the worker thread, right before the request,
+        # keeps thread dispatch delays out of the spacing between requests.
+        self.service.buckets[name].wait()
+        return geocode(full_address)
+
+    async def geocode_many(self, items: list[tuple[str, str, str]], on_result=None) -> list:
+        """
+        Geocode (address, commune, region) items, at most `concurrency` in
+        progress; on_result(index, coords) is called as each one finishes.
+        Results come back in input order.
+        """
+        gate = asyncio.Semaphore(self.concurrency)
+
+        async def one(i, item):
+            async with gate:
+                coords = await self.geocode(*item)
+            if on_result:
+                on_result(i, coords)
+            return coords
+
+        return await asyncio.gather(*(one(i, item) for i, item in enumerate(items)))
+
+    def run(self, items: list[tuple[str, str, str]], on_result=None) -> list:
+        """geocode_many from synchronous code."""
+        return asyncio.run(self.geocode_many(items, on_result))
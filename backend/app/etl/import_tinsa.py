@@ -16,6 +16,12 @@ Uso:
 
     # Migración real
     python -m app.etl.import_tinsa --migrate
+
+    # Migración real con COPY directo a Postgres (SUPABASE_DB_URL)
+    python -m app.etl.import_tinsa --migrate --postgres
+
+    # Tiempo, CPU y memoria por etapa (JSON en data/profiles/)
+    python -m app.etl.import_tinsa --profile
 """
 
 import os
@@ -29,7 +35,11 @@ from datetime import datetime
 # Load environment variables
 load_dotenv(Path(__file__).parent.parent.parent / ".env")
 
-from supabase import create_client, Client
+from app.etl.coordinates import format_repair_summary, normalize_coordinates
+from app.etl.pipeline import FrameSource, Pipeline, get_supabase_client
+from app.etl.postgres import get_postgres_client, make_sink
+from app.etl.profiling import profiling
+from app.etl.staging import read_staged, write_staged
 
 # Configuration
 DATA_DIR = Path(__file__).parent.parent.parent / "data"
@@ -38,16 +48,8 @@ FILES = {
     "rm": DATA_DIR / "tinsa_rm.csv"
 }
 BATCH_SIZE = 50  # Smaller batches for safety
-
-def get_supabase_client() -> Client:
-    """Initialize Supabase client."""
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_KEY")
-    
-    if not url or not key:
-        raise ValueError("SUPABASE_URL y SUPABASE_KEY deben estar en .env")
-    
-    return create_client(url, key)
+UPLOAD_CONCURRENCY = 4
+STAGING_KEY = "import_tinsa|read_csv"
 
 def clean_numeric(value):
     """Clean numeric values with commas."""
@@ -61,66 +63,43 @@ def clean_numeric(value):
     except:
         return None
 
-def clean_coordinates(lat, lon):
+def parse_coordinate_series(values: pd.Series) -> pd.Series:
     """
-    Clean and validate coordinates.
+    Parse a LATITUD/LONGITUD column.
     TINSA uses different formats:
     - Sometimes comma as decimal: -33,4565
     - Sometimes comma as thousand separator: -7,014,442
     """
-    try:
-        if pd.isna(lat) or pd.isna(lon):
-            return None, None
-        
-        lat_str = str(lat).strip()
-        lon_str = str(lon).strip()
-        
-        # Count commas to determine format
-        lat_commas = lat_str.count(',')
-        lon_commas = lon_str.count(',')
-        
-        # If multiple commas, it's a thousand separator (remove them)
-        if lat_commas > 1:
-            lat_str = lat_str.replace(',', '')
-        # If one comma, it's likely a decimal separator (replace with dot)
-        elif lat_commas == 1:
-            lat_str = lat_str.replace(',', '.')
-        
-        if lon_commas > 1:
-            lon_str = lon_str.replace(',', '')
-        elif lon_commas == 1:
-            lon_str = lon_str.replace(',', '.')
-        
-        lat_clean = float(lat_str)
-        lon_clean = float(lon_str)
-        
-        # Adjust if values are too large (missing decimal point)
-        # Example: -7014442 should be around -7 to -20 (Northern Chile)
-        if abs(lat_clean) > 100:
-            # Determine how many digits to divide by
-            lat_clean = lat_clean / (10 ** (len(str(int(abs(lat_clean)))) - 2))
-        
-        if abs(lon_clean) > 100:
-            lon_clean = lon_clean / (10 ** (len(str(int(abs(lon_clean)))) - 2))
-        
-        # Validate ranges for Chile
-        # Latitudes: -17 to -56 (north to south)
-        # Longitudes: -66 to -75 (east to west)
-        if -56 <= lat_clean <= -17 and -75 <= lon_clean <= -66:
-            return round(lat_clean, 6), round(lon_clean, 6)
-        
-        # If still invalid, return None
-        return None, None
-    except Exception as e:
+    s = values.astype(str).str.strip()
+    commas = s.str.count(",")
+    # If one comma, it's likely a decimal separator; if several, thousand separators
+    s = s.where(commas != 1, s.str.replace(",", ".", regex=False))
+    s = s.where(commas <= 1, s.str.replace(",", "", regex=False))
+    return pd.to_numeric(s, errors="coerce")
+
+def clean_coordinates(lat, lon):
+    """
+    Clean and validate one coordinate pair (scaling/swap rules in
+    app.etl.coordinates). migrate_file repairs whole columns at once.
+    """
+    lat_clean, lon_clean, _ = normalize_coordinates(
+        parse_coordinate_series(pd.Series([lat], dtype=object)),
+        parse_coordinate_series(pd.Series([lon], dtype=object)),
+    )
+    if np.isnan(lat_clean[0]):
         return None, None
+    return float(lat_clean[0]), float(lon_clean[0])
 
-def map_tinsa_to_supabase(row, source_file="norte_sur") -> dict:
+def map_tinsa_to_supabase(row, source_file="norte_sur", coords=None) -> dict:
     """
     Transform TINSA row to Supabase schema.
+    coords: (lat, lon) already repaired for this row, if available.
     """
     try:
         # Clean coordinates
-        lat, lon = clean_coordinates(row.get('LATITUD'), row.get('LONGITUD'))
+        if coords is None:
+            coords = clean_coordinates(row.get('LATITUD'), row.get('LONGITUD'))
+        lat, lon = coords
         
         # Calculate units
         stock_inicial = int(row.get('STOCK INICIAL', 0)) if pd.notna(row.get('STOCK INICIAL')) else 0
@@ -194,6 +173,174 @@ def map_tinsa_to_supabase(row, source_file="norte_sur") -> dict:
         print(f"  ⚠️  Error transformando fila: {e}")
         return None
 
+# ---------------------------------------------------------------------------
+# Vectorized transform (same output as map_tinsa_to_supabase + merge, by column)
+# ---------------------------------------------------------------------------
+
+PROJECT_FIELDS = [
+    "name", "developer", "commune", "region", "address", "latitude", "longitude",
+    "total_units", "sold_units", "available_units",
+    "avg_price_uf", "avg_price_m2_uf", "min_price_uf", "max_price_uf",
+    "sales_speed_monthly", "months_to_sell_out",
+    "project_status", "property_type", "category", "total_floors",
+]
+MAX_FIELDS = ("sold_units", "available_units")  # merged with max; the rest keep the first non-null
+
+_FAILED = object()
+
+
+def _attempt(fn, value):
+    try:
+        return fn(value)
+    except Exception:
+        return _FAILED
+
+
+def _int_or_zero(value):
+    return int(value) if pd.notna(value) else 0
+
+
+def _int_or_none(value):
+    return int(value) if pd.notna(value) else None
+
+
+def _text_or_none(value):
+    return str(value).strip() if pd.notna(value) else None
+
+
+def _text(value):
+    return str(value).strip()
+
+
+def _map_column(df: pd.DataFrame, column: str, fn, missing=None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    fn(value) for every row of df[column] (fn(missing) if the column is absent),
+    evaluated once per distinct value. Returns (object array, failed mask).
+    """
+    n = len(df)
+    if column not in df.columns:
+        value = _attempt(fn, missing)
+        return np.full(n, value, dtype=object), np.full(n, value is _FAILED)
+
+    values = df[column].to_numpy()
+    codes, uniques = pd.factorize(values)
+    lookup = np.empty(len(uniques) + 1, dtype=object)
+    lookup[:-1] = [_attempt(fn, v) for v in uniques.tolist()]
+    # factorize folds None and NaN into one code, but str() tells them apart
+    na = codes == -1
+    na_values = pd.unique(values[na]) if na.any() else []
+    if len(na_values) == 1:
+        lookup[-1] = _attempt(fn, na_values[0])
+    out = lookup[codes]
+    if len(na_values) > 1:
+        out[na] = [_attempt(fn, v) for v in values[na]]
+    failed = np.fromiter((v is _FAILED for v in out), dtype=bool, count=n) if len(na_values) > 1 \
+        else np.fromiter((v is _FAILED for v in lookup), dtype=bool, count=len(lookup))[codes]
+    return out, failed
+
+
+def build_projects_frame(df: pd.DataFrame, lats: list, lons: list) -> tuple[pd.DataFrame, int]:
+    """
+    map_tinsa_to_supabase() for every row at once.
+
+    Returns (frame, failed): one object-dtype row per input row that has a
+    name and a commune, columns in PROJECT_FIELDS order, and the number of
+    rows whose integer fields could not be parsed (those are skipped, as the
+    row-wise version does).
+    """
+    n = len(df)
+    stock, stock_failed = _map_column(df, "STOCK INICIAL", _int_or_zero)
+    sold, sold_failed = _map_column(df, "UNIDADES VENDIDAS", _int_or_zero)
+    available, available_failed = _map_column(df, "OFERTA DISPONIBLE", _int_or_zero)
+    floors, floors_failed = _map_column(df, "NRO. PISOS", _int_or_none)
+    failed = stock_failed | sold_failed | available_failed | floors_failed
+    for values in (stock, sold, available):
+        values[failed] = 0
+
+    # Units: available falls back to stock - sold, total to sold + available
+    refill = (available == 0) & (stock > 0)
+    available = np.where(refill, np.maximum(0, stock - sold), available)
+    total = np.where(stock > 0, stock, sold + available)
+
+    def numeric(column):
+        return _map_column(df, column, clean_numeric)[0]
+
+    speed_actual = numeric("UNIDADES/MES (A)")
+    speed_projected = numeric("UNIDADES/MES (P)")
+    has_actual = np.fromiter(map(bool, speed_actual), dtype=bool, count=n)
+
+    street = pd.Series(_map_column(df, "DIRECCION", _text, "")[0], dtype=object)
+    number = pd.Series(_map_column(df, "NUMERO", _text, "")[0], dtype=object)
+    address = np.where(number == "", street, street + " " + number)
+    address = np.where(street == "", None, address)
+
+    columns = {
+        "name": _map_column(df, "PROYECTO", _text, "Sin nombre")[0],
+        "developer": _map_column(df, "DESARROLLADOR", _text_or_none)[0],
+        "commune": _map_column(df, "COMUNA_INCOIN", _text_or_none)[0],
+        "region": _map_column(df, "REGION", _text, "RM")[0],
+        "address": address,
+        "latitude": np.array(lats, dtype=object),
+        "longitude": np.array(lons, dtype=object),
+        "total_units": total,
+        "sold_units": sold,
+        "available_units": available,
+        "avg_price_uf": numeric("PRECIO PROMEDIO"),
+        "avg_price_m2_uf": numeric("UF/M² PROMEDIO"),
+        "min_price_uf": numeric("PRECIO MINIMO UF"),
+        "max_price_uf": numeric("PRECIO MAXIMO UF"),
+        "sales_speed_monthly": np.where(has_actual, speed_actual, speed_projected),
+        "months_to_sell_out": numeric("MESES PARA AGOTAR STOCK (A)"),
+        "project_status": _map_column(df, "ESTADO PROYECTO", _text_or_none)[0],
+        "property_type": _map_column(df, "TIPO DE PROPIEDAD", _text, "DEPARTAMENTO")[0],
+        "category": _map_column(df, "TIPO CATEGORIA", _text_or_none)[0],
+        "total_floors": floors,
+    }
+    keep = (~failed
+            & np.fromiter(map(bool, columns["name"]), dtype=bool, count=n)
+            & np.fromiter(map(bool, columns["commune"]), dtype=bool, count=n))
+    frame = pd.DataFrame({field: np.asarray(columns[field], dtype=object)[keep] for field in PROJECT_FIELDS})
+    return frame, int(failed.sum())
+
+
+def deduplicate_projects(frame: pd.DataFrame) -> list[dict]:
+    """
+    One payload per (name, commune), in order of first appearance: sold and
+    available units take the group maximum, every other field its first
+    non-null value in row order.
+    """
+    groups = frame.groupby(["name", "commune"], sort=False).ngroup().to_numpy()
+    n_groups = int(groups.max()) + 1 if len(groups) else 0
+
+    merged = {}
+    for field in PROJECT_FIELDS:
+        values = frame[field].to_numpy()
+        if field in MAX_FIELDS:
+            try:
+                units = pd.Series(np.array(values.tolist(), dtype=np.int64))
+            except OverflowError:  # beyond int64: compare the Python ints
+                units = pd.Series(values, dtype=object)
+            merged[field] = np.array(units.groupby(groups).max().tolist(), dtype=object)
+            continue
+        rows = np.flatnonzero(np.not_equal(values, None))
+        present, first = np.unique(groups[rows], return_index=True)
+        out = np.full(n_groups, None, dtype=object)
+        out[present] = values[rows[first]]
+        merged[field] = out
+
+    return [dict(zip(PROJECT_FIELDS, values)) for values in zip(*(merged[f].tolist() for f in PROJECT_FIELDS))]
+
+
+def read_source(filepath: Path) -> pd.DataFrame:
+    """Full CSV read, staged in data/staging/ so later runs skip parsing."""
+    df = read_staged(filepath, STAGING_KEY)
+    if df is not None:
+        print(f"⚡ Usando staging ({len(df):,} filas, sin parsear CSV)")
+        return df
+    df = pd.read_csv(filepath, low_memory=False)
+    write_staged(filepath, STAGING_KEY, df)
+    return df
+
 def preview_file(filepath: Path, limit: int = 10):
     """Preview CSV file."""
     if not filepath.exists():
@@ -213,7 +360,7 @@ def preview_file(filepath: Path, limit: int = 10):
         print(df.head(3)[['PROYECTO', 'COMUNA_INCOIN', 'PRECIO PROMEDIO', 'STOCK INICIAL']].to_string())
         
         # Get total count
-        df_full = pd.read_csv(filepath, low_memory=False)
+        df_full = read_source(filepath)
         print(f"\n✅ Total de filas en archivo: {len(df_full):,}")
         
         return df
@@ -221,8 +368,39 @@ def preview_file(filepath: Path, limit: int = 10):
         print(f"❌ Error al leer archivo: {e}")
         return None
 
-def migrate_file(filepath: Path, dry_run: bool = True):
-    """Migrate a single CSV file."""
+def transform_projects(df: pd.DataFrame) -> list[dict]:
+    """Pipeline transform: whole file → one deduplicated payload per (name, commune)."""
+    print(f"✅ Cargadas {len(df):,} filas")
+    
+    # Transform data
+    print(f"\n🔄 Transformando datos...")
+    # Repair all coordinates at once
+    no_coords = pd.Series(np.nan, index=df.index)
+    lats, lons, repairs = normalize_coordinates(
+        parse_coordinate_series(df['LATITUD'] if 'LATITUD' in df.columns else no_coords),
+        parse_coordinate_series(df['LONGITUD'] if 'LONGITUD' in df.columns else no_coords),
+    )
+    lats = [None if v != v else v for v in lats.tolist()]
+    lons = [None if v != v else v for v in lons.tolist()]
+    print(f"📍 Coordenadas: {format_repair_summary(repairs)}")
+    
+    projects, failed = build_projects_frame(df, lats, lons)
+    skipped = len(df) - len(projects)
+    
+    print(f"✅ Transformados {len(projects):,} proyectos")
+    if failed > 0:
+        print(f"⚠️  Error transformando {failed:,} filas (unidades o pisos no numéricos)")
+    if skipped > 0:
+        print(f"⚠️  Omitidas {skipped:,} filas (falta nombre o comuna)")
+    
+    # Deduplicate projects (TINSA has multiple rows per project)
+    print(f"\n🔄 Deduplicando proyectos...")
+    projects_unique = deduplicate_projects(projects)
+    print(f"✅ Proyectos únicos: {len(projects_unique):,} (de {len(projects):,} filas)")
+    return projects_unique
+
+def migrate_file(filepath: Path, dry_run: bool = True, supabase=None):
+    """Migrate a single CSV file (supabase may be a Supabase client or a postgres.PostgresClient)."""
     if not filepath.exists():
         print(f"❌ Archivo no encontrado: {filepath}")
         return 0, 0
@@ -232,94 +410,34 @@ def migrate_file(filepath: Path, dry_run: bool = True):
     print(f"{'='*80}\n")
     
     try:
-        # Read CSV
         print(f"📖 Leyendo archivo...")
-        df = pd.read_csv(filepath, low_memory=False)
-        print(f"✅ Cargadas {len(df):,} filas")
-        
-        # Transform data
-        print(f"\n🔄 Transformando datos...")
-        projects = []
-        skipped = 0
-        
-        for idx, row in df.iterrows():
-            project = map_tinsa_to_supabase(row, source_file=filepath.stem)
-            
-            if project and project.get('name') and project.get('commune'):
-                projects.append(project)
-            else:
-                skipped += 1
-            
-            # Progress indicator
-            if (idx + 1) % 10000 == 0:
-                print(f"  Procesadas {idx + 1:,} filas...")
-        
-        print(f"✅ Transformados {len(projects):,} proyectos")
-        if skipped > 0:
-            print(f"⚠️  Omitidas {skipped:,} filas (falta nombre o comuna)")
-        
-        # Deduplicate projects (TINSA has multiple rows per project)
-        print(f"\n🔄 Deduplicando proyectos...")
-        projects_dict = {}
-        
-        for project in projects:
-            key = (project['name'], project['commune'])
-            
-            if key not in projects_dict:
-                projects_dict[key] = project
-            else:
-                # Merge data: keep most recent/complete values
-                existing = projects_dict[key]
-                
-                # Update with non-null values
-                for field, value in project.items():
-                    if value is not None and (existing.get(field) is None or field in ['sold_units', 'available_units']):
-                        # For units, take the maximum (most recent data)
-                        if field in ['sold_units', 'available_units', 'total_units']:
-                            existing[field] = max(existing.get(field, 0) or 0, value or 0)
-                        else:
-                            existing[field] = value
-        
-        projects_unique = list(projects_dict.values())
-        print(f"✅ Proyectos únicos: {len(projects_unique):,} (de {len(projects):,} filas)")
+        sink = None
+        if not dry_run:
+            print(f"\n💾 Se insertará en Supabase")
+            sink = make_sink(supabase or get_supabase_client(), "projects", on_conflict="name,commune",
+                             batch_size=BATCH_SIZE, concurrency=UPLOAD_CONCURRENCY)
+        report = Pipeline(
+            FrameSource(lambda: read_source(filepath), filepath.name),
+            transform_projects,
+            sink,
+            name=f"{filepath.name} → projects",
+        ).run()
         
         if dry_run:
             print(f"\n⚠️  Modo DRY RUN - No se insertarán datos")
             print(f"\n📊 Muestra de datos transformados:")
-            if projects_unique:
-                sample = projects_unique[0]
-                for key, value in list(sample.items())[:10]:
+            if report.sample:
+                for key, value in list(report.sample.items())[:10]:
                     print(f"  {key}: {value}")
-            return len(projects_unique), 0
+            return report.stages["transform"].rows_out, 0
         
-        # Insert in batches
-        print(f"\n💾 Insertando en Supabase...")
-        supabase = get_supabase_client()
-        inserted_count = 0
-        errors = 0
+        print(f"\n✅ Completado: {report.write.written:,} proyectos insertados")
+        if report.write.failed > 0:
+            print(f"⚠️  Errores: {report.write.failed} proyectos rechazados")
+            for error in report.write.errors[:3]:
+                print(f"  {error[:100]}")
         
-        for i in range(0, len(projects_unique), BATCH_SIZE):
-            batch = projects_unique[i:i + BATCH_SIZE]
-            try:
-                supabase.table("projects").upsert(
-                    batch,
-                    on_conflict="name,commune"
-                ).execute()
-                inserted_count += len(batch)
-                
-                # Progress
-                if inserted_count % 500 == 0 or inserted_count == len(projects_unique):
-                    print(f"  ✅ Insertados {inserted_count:,}/{len(projects_unique):,} proyectos...")
-                    
-            except Exception as e:
-                errors += 1
-                print(f"  ⚠️  Error en batch {i//BATCH_SIZE + 1}: {str(e)[:100]}")
-        
-        print(f"\n✅ Completado: {inserted_count:,} proyectos insertados")
-        if errors > 0:
-            print(f"⚠️  Errores: {errors} batches")
-        
-        return inserted_count, errors
+        return report.write.written, report.write.failed
         
     except Exception as e:
         print(f"❌ Error durante la migración: {e}")
@@ -327,8 +445,8 @@ def migrate_file(filepath: Path, dry_run: bool = True):
         traceback.print_exc()
         return 0, 1
 
-def main(preview_only=False, dry_run=True):
-    """Main migration function."""
+def main(preview_only=False, dry_run=True, postgres=False, profile=None):
+    """Main migration function (profile: None, or a report path, "" for the default one)."""
     print("🚀 Importación de Datos TINSA → Supabase")
     print(f"{'='*80}\n")
     
@@ -337,15 +455,18 @@ def main(preview_only=False, dry_run=True):
             preview_file(filepath, limit=10)
         return
     
+    supabase = get_postgres_client() if postgres and not dry_run else None
     total_inserted = 0
     total_errors = 0
     
     # Process each file
-    for name, filepath in FILES.items():
-        if filepath.exists():
-            inserted, errors = migrate_file(filepath, dry_run=dry_run)
-            total_inserted += inserted
-            total_errors += errors
+    with profiling("import_tinsa", Path(profile) if profile else None, enabled=profile is not None,
+                   migrate=not dry_run, postgres=postgres):
+        for name, filepath in FILES.items():
+            if filepath.exists():
+                inserted, errors = migrate_file(filepath, dry_run=dry_run, supabase=supabase)
+                total_inserted += inserted
+                total_errors += errors
     
     # Summary
     print(f"\n{'='*80}")
@@ -365,7 +486,11 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Importar datos TINSA a Supabase")
     parser.add_argument("--migrate", action="store_true", help="Ejecutar migración real")
     parser.add_argument("--preview", action="store_true", help="Solo mostrar preview")
+    parser.add_argument("--postgres", action="store_true",
+                        help="Escribir directo en Postgres (COPY + INSERT ... ON CONFLICT) vía SUPABASE_DB_URL")
+    parser.add_argument("--profile", nargs="?", const="", default=None, metavar="RUTA",
+                        help="Medir tiempo, CPU y memoria por etapa; guarda un JSON (por defecto en data/profiles/)")
     
     args = parser.parse_args()
     
-    main(preview_only=args.preview, dry_run=not args.migrate)
+    main(preview_only=args.preview, dry_run=not args.migrate, postgres=args.postgres, profile=args.profile)
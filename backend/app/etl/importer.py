@@ -1,60 +1,78 @@
 import pandas as pd
-from app.db import get_supabase_client
-import json
+from app.etl.pipeline import ColumnMapping, CsvSource, ExcelSource, Pipeline, get_supabase_client
+from app.etl.postgres import make_sink
 
 class TinsaImporter:
-    def __init__(self, file_path: str):
+    CHUNK_ROWS = 10_000  # rows per chunk streamed from Excel/CSV
+
+    # TODO: Map actual TINSA columns to our DB schema
+    # projects field → (source column, kind, default); see pipeline.ColumnMapping
+    COLUMN_MAP = {
+        "name": ("nombre_proyecto", "value", "Sin Nombre"),
+        "commune": ("comuna", "value", "Desconocida"),
+        "region": ("region", "value", "RM"),
+        # Placeholder for geospatial logic
+        # "location": ...
+    }
+
+    def __init__(self, file_path: str, supabase=None):
         self.file_path = file_path
-        self.supabase = get_supabase_client()
+        self.supabase = supabase or get_supabase_client()
+        self.mapping = ColumnMapping(self.COLUMN_MAP, dedupe=("name", "commune"))
 
-    def load_data(self):
+    def source(self):
         """
-        Loads data from Excel/CSV and returns a DataFrame.
+        Pipeline source for the input file (Excel or CSV), streamed in
+        CHUNK_ROWS chunks; .xlsx is read with openpyxl in read-only mode.
         """
-        print(f"Loading data from {self.file_path}...")
         if self.file_path.endswith('.xlsx'):
-            df = pd.read_excel(self.file_path)
+            return ExcelSource(self.file_path, chunk_rows=self.CHUNK_ROWS)
         elif self.file_path.endswith('.csv'):
-            df = pd.read_csv(self.file_path)
+            return CsvSource(self.file_path, chunk_rows=self.CHUNK_ROWS)
         else:
             raise ValueError("Unsupported file format")
-        
+
+    @staticmethod
+    def clean_columns(df: pd.DataFrame) -> pd.DataFrame:
         # Basic cleaning
         df.columns = [c.lower().replace(' ', '_') for c in df.columns]
         return df
 
+    def load_data(self):
+        """
+        Loads data from Excel/CSV and returns a DataFrame.
+        """
+        print(f"Loading data from {self.file_path}...")
+        return self.clean_columns(pd.concat(list(self.source()), ignore_index=True))
+
+    def transform(self, df: pd.DataFrame) -> list:
+        """
+        Maps a chunk of the source file to 'projects' table rows.
+        """
+        return self.mapping(self.clean_columns(df))
+
     def transform_project(self, row):
         """
         Maps a row from the source file to the 'projects' table schema.
         """
-        # TODO: Map actual TINSA columns to our DB schema
-        return {
-            "name": row.get("nombre_proyecto", "Sin Nombre"),
-            "commune": row.get("comuna", "Desconocida"),
-            "region": row.get("region", "RM"),
-            # Placeholder for geospatial logic
-            # "location": ... 
-        }
+        return self.mapping(pd.DataFrame([row]))[0]
 
-    def run(self):
+    def run(self, dry_run: bool = False):
         """
         Main execution method.
         """
-        df = self.load_data()
-        print(f"Loaded {len(df)} rows.")
-
-        projects_to_insert = []
-        
-        for _, row in df.iterrows():
-            project_data = self.transform_project(row)
-            projects_to_insert.append(project_data)
-
-        # Bulk insert (Upsert)
-        if projects_to_insert:
-            response = self.supabase.table("projects").upsert(
-                projects_to_insert, on_conflict="name,commune"
-            ).execute()
-            print(f"Inserted/Updated projects. Response: {response}")
+        report = Pipeline(
+            self.source(),
+            self.transform,
+            None if dry_run else make_sink(self.supabase, "projects", on_conflict="name,commune"),
+            name=f"{self.file_path} → projects",
+        ).run()
+        extract = report.stages["extract"]
+        print(f"Loaded {extract.rows_in} rows in {report.chunks} chunks "
+              f"({extract.seconds:.1f}s reading, {extract.rows_per_sec:,.0f} rows/s).")
+        if not dry_run:
+            print(f"Inserted/Updated projects: {report.write.summary()}")
+        return report
 
 if __name__ == "__main__":
     # Example usage
@@ -0,0 +1,125 @@
+"""
+In-process stand-in for the google-cloud-bigquery client used by the ETL.
+
+Serves one in-memory table through the calls bigquery_to_supabase makes:
+
+    client.get_table("project.dataset.table")            # .schema, .num_rows
+    client.list_rows(table_ref, max_results=n).to_dataframe()
+    client.query(sql).result(page_size=n).to_arrow_iterable()
+
+Queries understand the SQL the ETL generates: SELECT * or a list of
+backquoted columns, an optional WHERE of comparisons joined by AND/OR,
+and an optional LIMIT. Results come back as pyarrow RecordBatches of at
+most page_size rows, the way the real RowIterator pages through a query
+result. `latency` adds a delay per page (and per query) so benchmarks see
+extraction overlap with uploads. Every SQL string received is kept in
+`queries`; `total_bytes_processed` is billed like an unpartitioned table:
+the full size of the selected columns, whatever the WHERE.
+
+Requires pyarrow.
+"""
+from __future__ import annotations
+
+import re
+import time
+from dataclasses import dataclass
+
+import pandas as pd
+import pyarrow as pa
+
+_ARROW_TYPES = {
+    "int64": "INTEGER",
+    "double": "FLOAT",
+    "bool": "BOOLEAN",
+    "string": "STRING",
+    "large_string": "STRING",
+}
+
+
+@dataclass
+class LocalField:
+    name: str
+    field_type: str
+
+
+@dataclass
+class LocalTable:
+    schema: list[LocalField]
+    num_rows: int
+
+
+class LocalBigQuery:
+    def __init__(self, data: pa.Table | pd.DataFrame, latency: float = 0.0):
+        self.data = data if isinstance(data, pa.Table) else pa.Table.from_pandas(data, preserve_index=False)
+        self.latency = latency
+        self.queries: list[str] = []
+
+    def get_table(self, table_ref: str) -> LocalTable:
+        schema = [LocalField(f.name, _ARROW_TYPES.get(str(f.type), str(f.type).upper())) for f in self.data.schema]
+        return LocalTable(schema=schema, num_rows=self.data.num_rows)
+
+    def list_rows(self, table_ref, max_results: int | None = None) -> "LocalRowIterator":
+        table = self.data if max_results is None else self.data.slice(0, max_results)
+        return LocalRowIterator(self, table, None)
+
+    def query(self, sql: str) -> "LocalQueryJob":
+        self.queries.append(sql)
+        if self.latency:
+            time.sleep(self.latency)
+        match = re.match(
+            r"\s*SELECT\s+(?P<columns>.+?)\s+FROM\s+`[^`]+`"
+            r"(?:\s+WHERE\s+(?P<where>.+?))?(?:\s+LIMIT\s+(?P<limit>\d+))?\s*$",
+            sql, re.IGNORECASE | re.DOTALL,
+        )
+        if not match:
+            raise ValueError(f"SQL no soportado por LocalBigQuery: {sql}")
+        columns = match.group("columns").strip()
+        table = self.data
+        if columns != "*":
+            table = table.select([c.strip().strip("`") for c in columns.split(",")])
+        bytes_processed = table.nbytes
+        if match.group("where"):
+            df = self.data.to_pandas()
+            table = pa.Table.from_pandas(df[df.eval(_pandas_expression(match.group("where")))][table.column_names],
+                                         preserve_index=False)
+        if match.group("limit"):
+            table = table.slice(0, int(match.group("limit")))
+        return LocalQueryJob(self, table, bytes_processed)
+
+
+def _pandas_expression(where: str) -> str:
+    """Translate a generated WHERE clause to a DataFrame.eval() expression."""
+    expression = re.sub(r"(?<![<>!=])=(?!=)", "==", where)
+    expression = re.sub(r"\bAND\b", "and", expression, flags=re.IGNORECASE)
+    return re.sub(r"\bOR\b", "or", expression, flags=re.IGNORECASE)
+
+
+class LocalQueryJob:
+    def __init__(self, client: LocalBigQuery, table: pa.Table, total_bytes_processed: int = 0):
+        self.client = client
+        self.table = table
+        self.total_bytes_processed = total_bytes_processed
+
+    def result(self, page_size: int | None = None) -> "LocalRowIterator":
+        return LocalRowIterator(self.client, self.table, page_size)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return self.table.to_pandas()
+
+
+class LocalRowIterator:
+    def __init__(self, client: LocalBigQuery, table: pa.Table, page_size: int | None):
+        self.client = client
+        self.table = table
+        self.page_size = page_size or max(1, table.num_rows)
+        self.total_rows = table.num_rows
+
+    def to_arrow_iterable(self):
+        for offset in range(0, self.table.num_rows, self.page_size):
+            if self.client.latency:
+                time.sleep(self.client.latency)
+            for batch in self.table.slice(offset, self.page_size).to_batches():
+                yield batch
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return self.table.to_pandas()
@@ -0,0 +1,188 @@
+"""
+In-process stand-in for a psycopg (v3) connection, backed by SQLite.
+
+Implements the subset postgres.CopyWriter uses:
+
+    with conn.cursor() as cur:
+        cur.execute(sql, params)                 # %s placeholders
+        with cur.copy("COPY t (a, b) FROM STDIN") as copy:
+            copy.write_row(row)
+        cur.fetchall(); cur.description
+    conn.commit(); conn.rollback()
+
+Tables are created from the Supabase migrations (supabase/migrations/*.sql):
+columns, primary keys and UNIQUE constraints, so ON CONFLICT (name, commune)
+resolves against the same key as production. The statements CopyWriter
+emits (CREATE TEMP TABLE ... AS SELECT ... WHERE false, UPDATE ... FROM,
+INSERT ... SELECT ... WHERE true ON CONFLICT ... RETURNING *) run unchanged
+on SQLite 3.33+; only COPY is emulated, with executemany. uuid primary keys
+get random hex ids.
+
+`latency` adds a fixed round-trip delay per statement and per COPY, to
+compare against LocalSupabase in benchmarks. Every statement is kept in
+`statements`.
+"""
+from __future__ import annotations
+
+import re
+import sqlite3
+import time
+from pathlib import Path
+
+MIGRATIONS_DIR = Path(__file__).parent.parent.parent.parent / "supabase" / "migrations"
+
+_CREATE = re.compile(r"create\s+table\s+(?:if\s+not\s+exists\s+)?(?:public\.)?(\w+)\s*\((.*?)\n\);", re.I | re.S)
+_ADD_COLUMN = re.compile(r"alter\s+table\s+(?:public\.)?(\w+)\s+add\s+column\s+(?:if\s+not\s+exists\s+)?(\w+)\s+(\w+)",
+                         re.I)
+_COPY = re.compile(r"\s*COPY\s+(\S+)\s*\((.*?)\)\s+FROM\s+STDIN\s*$", re.I | re.S)
+_AFFINITY = {"integer": "INTEGER", "bigint": "INTEGER", "smallint": "INTEGER", "numeric": "REAL", "real": "REAL",
+             "boolean": "INTEGER", "text": "TEXT", "date": "TEXT", "uuid": "TEXT"}
+_UUID_DEFAULT = "(lower(hex(randomblob(16))))"
+
+
+def _split_items(body: str) -> list[str]:
+    """Top-level comma-separated items of a CREATE TABLE body (comments removed)."""
+    body = re.sub(r"--[^\n]*", "", body)
+    items, depth, current = [], 0, ""
+    for char in body:
+        if char == "," and depth == 0:
+            items.append(current.strip())
+            current = ""
+            continue
+        depth += (char == "(") - (char == ")")
+        current += char
+    items.append(current.strip())
+    return [i for i in items if i]
+
+
+def migration_schema(migrations_dir: Path = MIGRATIONS_DIR) -> dict[str, dict]:
+    """{table: {"columns": {name: sql type}, "primary": [...], "unique": [[...], ...]}} from the migrations."""
+    tables: dict[str, dict] = {}
+    for path in sorted(Path(migrations_dir).glob("*.sql")):
+        sql = path.read_text(encoding="utf-8")
+        for name, body in _CREATE.findall(sql):
+            table = tables.setdefault(name, {"columns": {}, "primary": [], "unique": []})
+            for item in _split_items(body):
+                words = item.split()
+                head = words[0].lower()
+                constraint = re.search(r"(primary\s+key|unique)\s*\(([^)]*)\)", item, re.I)
+                if head in ("constraint", "primary", "unique", "foreign", "check"):
+                    if constraint:
+                        cols = [c.strip() for c in constraint.group(2).split(",")]
+                        table["primary" if constraint.group(1).lower().startswith("primary") else "unique"].append(cols)
+                    continue
+                table["columns"][words[0]] = words[1].split("(")[0].lower() if len(words) > 1 else ""
+                if re.search(r"\bprimary\s+key\b", item, re.I):
+                    table["primary"].append([words[0]])
+                elif re.search(r"\bunique\b", item, re.I):
+                    table["unique"].append([words[0]])
+        for name, column, sql_type in _ADD_COLUMN.findall(sql):
+            table = tables.setdefault(name, {"columns": {}, "primary": [], "unique": []})
+            table["columns"].setdefault(column, sql_type.lower())
+    return tables
+
+
+def _create_statement(name: str, table: dict) -> str:
+    primary = table["primary"][0] if table["primary"] else []
+    parts = []
+    for column, sql_type in table["columns"].items():
+        part = f'"{column}" {_AFFINITY.get(sql_type, "")}'.rstrip()
+        if primary == [column]:
+            part += " PRIMARY KEY"
+            if sql_type == "uuid":
+                part += f" DEFAULT {_UUID_DEFAULT}"
+        parts.append(part)
+    if len(primary) > 1:
+        parts.append(f"PRIMARY KEY ({', '.join(primary)})")
+    for cols in table["unique"]:
+        parts.append(f"UNIQUE ({', '.join(cols)})")
+    return f'CREATE TABLE "{name}" ({", ".join(parts)})'
+
+
+class LocalPostgres:
+    def __init__(self, latency: float = 0.0, schema: dict[str, dict] | None = None):
+        self.latency = latency
+        self.statements: list[str] = []
+        # Autocommit at the sqlite3 level; transactions are opened explicitly so
+        # DDL (the temp staging table) rolls back together with the data
+        self.db = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+        for name, table in (schema or migration_schema()).items():
+            self.db.execute(_create_statement(name, table))
+
+    def cursor(self) -> "LocalCursor":
+        return LocalCursor(self)
+
+    def commit(self):
+        if self.db.in_transaction:
+            self.db.execute("COMMIT")
+
+    def rollback(self):
+        if self.db.in_transaction:
+            self.db.execute("ROLLBACK")
+
+    def close(self):
+        self.db.close()
+
+    def rows(self, table: str) -> list[dict]:
+        cur = self.db.execute(f'SELECT * FROM "{table}"')
+        names = [d[0] for d in cur.description]
+        return [dict(zip(names, values)) for values in cur.fetchall()]
+
+    def _round_trip(self, sql: str):
+        self.statements.append(sql)
+        if not self.db.in_transaction:
+            self.db.execute("BEGIN")
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class LocalCursor:
+    def __init__(self, conn: LocalPostgres):
+        self.conn = conn
+        self.cursor = conn.db.cursor()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cursor.close()
+
+    @property
+    def description(self):
+        return self.cursor.description
+
+    def execute(self, sql: str, params=None) -> "LocalCursor":
+        self.conn._round_trip(sql)
+        self.cursor.execute(sql.replace("%s", "?"), tuple(params or ()))
+        return self
+
+    def fetchall(self) -> list[tuple]:
+        return self.cursor.fetchall()
+
+    def copy(self, sql: str) -> "LocalCopy":
+        match = _COPY.match(sql)
+        if not match:
+            raise ValueError(f"COPY no soportado por LocalPostgres: {sql}")
+        self.conn._round_trip(sql)
+        return LocalCopy(self.cursor, match.group(1), [c.strip() for c in match.group(2).split(",")])
+
+
+class LocalCopy:
+    def __init__(self, cursor, table: str, columns: list[str]):
+        self.cursor = cursor
+        self.table = table
+        self.columns = columns
+        self.rows: list[tuple] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None and self.rows:
+            self.cursor.executemany(
+                f"INSERT INTO {self.table} ({', '.join(self.columns)}) VALUES ({', '.join(['?'] * len(self.columns))})",
+                self.rows,
+            )
+
+    def write_row(self, row):
+        self.rows.append(tuple(row))
@@ -0,0 +1,232 @@
+"""
+In-process stand-in for the Supabase table API used by the ETL scripts.
+
+Supports the chains the importers call:
+
+    client.table("projects").upsert(rows, on_conflict="name,commune").execute()
+    client.table("project_typologies").insert(rows).execute()
+    client.table("project_typologies").delete().in_("project_id", ids).execute()
+    client.table("projects").update({...}).eq("id", pid).execute()
+    client.table("projects").select("*").eq("commune", "SANTIAGO").execute()
+    client.table("projects").select("*").range(0, 999).execute()
+    client.table("projects").select("*").eq("geocode_precision", "commune").or_("geocoded_at.is.null,geocoded_at.lt.2026-01-01").execute()
+    client.rpc("update_project_coordinates", {"coords": rows}).execute()
+
+Rows live in memory, one list per table. `latency` adds a fixed round-trip
+delay per request (time.sleep, so threads overlap like real HTTP calls) and
+`reject` makes a whole request fail when any of its rows matches, the way a
+Postgres statement aborts on one bad row. Meant for benchmarks and dry runs
+of the upload path without network access. rpc() runs the Python
+counterparts (FUNCTIONS) of the SQL functions the ETL calls; pass
+`functions` to replace them, e.g. {} to emulate a database without the
+migration. Updates of projects coordinates also run the counterpart of the
+clear_geocode_precision trigger.
+"""
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+
+class LocalSupabaseError(Exception):
+    pass
+
+
+@dataclass
+class LocalResponse:
+    data: list[dict]
+    count: int | None = None
+
+
+def _update_project_coordinates(client: "LocalSupabase", coords: list[dict]) -> int:
+    """supabase/migrations/20260214000000_geocode_retry.sql"""
+    client._request("projects", coords)
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    with client._lock:
+        projects = {r.get("id"): r for r in client.tables.get("projects", [])}
+        updated = 0
+        for c in coords:
+            row = projects.get(c["id"])
+            if row is not None and (row.get("latitude") is None or row.get("geocode_precision") == "commune"):
+                row.update(latitude=c["latitude"], longitude=c["longitude"], geocoded_at=now)
+                if c.get("geocode_precision") is not None:
+                    row["geocode_precision"] = c["geocode_precision"]
+                updated += 1
+    return updated
+
+
+def _update_row(table: str, row: dict, values: dict):
+    """row.update(values), plus the clear_geocode_precision trigger on projects."""
+    point = (row.get("latitude"), row.get("longitude"))
+    stamp = row.get("geocoded_at")
+    row.update(values)
+    if (table == "projects" and (row.get("latitude"), row.get("longitude")) != point
+            and row.get("geocoded_at") == stamp and row.get("geocode_precision") is not None):
+        row["geocode_precision"] = None
+
+
+FUNCTIONS = {
+    "update_project_coordinates": _update_project_coordinates,
+}
+
+
+class LocalSupabase:
+    def __init__(self, latency: float = 0.0, reject=None, functions: dict | None = None):
+        self.latency = latency
+        self.reject = reject  # callable(table, row) -> bool
+        self.functions = FUNCTIONS if functions is None else functions
+        self.tables: dict[str, list[dict]] = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def table(self, name: str) -> "_LocalQuery":
+        return _LocalQuery(self, name)
+
+    def rpc(self, name: str, params: dict | None = None) -> "_LocalRpc":
+        return _LocalRpc(self, name, params or {})
+
+    def rows(self, name: str) -> list[dict]:
+        return self.tables.get(name, [])
+
+    def _request(self, table: str, payload: list[dict]):
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.reject:
+            for row in payload:
+                if self.reject(table, row):
+                    raise LocalSupabaseError(f"{table}: fila rechazada {row}")
+
+
+class _LocalQuery:
+    def __init__(self, client: LocalSupabase, table: str):
+        self.client = client
+        self.table = table
+        self.op = "select"
+        self.payload: list[dict] = []
+        self.values: dict = {}
+        self.on_conflict: tuple[str, ...] = ()
+        self.filters: list = []
+        self.window: slice = slice(None)
+
+    # Operations
+    def select(self, columns: str = "*", count=None) -> "_LocalQuery":
+        self.op = "select"
+        return self
+
+    def insert(self, rows) -> "_LocalQuery":
+        self.op = "insert"
+        self.payload = [dict(r) for r in (rows if isinstance(rows, list) else [rows])]
+        return self
+
+    def upsert(self, rows, on_conflict: str | None = None) -> "_LocalQuery":
+        self.op = "upsert"
+        self.payload = [dict(r) for r in (rows if isinstance(rows, list) else [rows])]
+        self.on_conflict = tuple(on_conflict.split(",")) if on_conflict else ("id",)
+        return self
+
+    def update(self, values: dict) -> "_LocalQuery":
+        self.op = "update"
+        self.values = dict(values)
+        return self
+
+    def delete(self) -> "_LocalQuery":
+        self.op = "delete"
+        return self
+
+    def limit(self, count: int) -> "_LocalQuery":
+        self.window = slice(count)
+        return self
+
+    def range(self, start: int, end: int) -> "_LocalQuery":
+        self.window = slice(start, end + 1)
+        return self
+
+    # Filters
+    def eq(self, column: str, value) -> "_LocalQuery":
+        self.filters.append(lambda r: r.get(column) == value)
+        return self
+
+    def in_(self, column: str, values) -> "_LocalQuery":
+        values = set(values)
+        self.filters.append(lambda r: r.get(column) in values)
+        return self
+
+    def is_(self, column: str, value) -> "_LocalQuery":
+        expected = None if value in (None, "null") else value
+        self.filters.append(lambda r: r.get(column) is expected)
+        return self
+
+    def or_(self, filters: str) -> "_LocalQuery":
+        """PostgREST or=(...): comma-separated 'column.eq.value' / 'column.lt.value' / 'column.is.null' conditions."""
+        conditions = []
+        for condition in filters.split(","):
+            column, op, value = condition.strip().split(".", 2)
+            if op == "is":
+                expected = None if value == "null" else {"true": True, "false": False}[value]
+                conditions.append(lambda r, c=column, v=expected: r.get(c) is v)
+            elif op == "eq":
+                conditions.append(lambda r, c=column, v=value: r.get(c) is not None and str(r.get(c)) == v)
+            elif op == "lt":
+                conditions.append(lambda r, c=column, v=value: r.get(c) is not None and str(r.get(c)) < v)
+            else:
+                raise ValueError(f"Operador no soportado por LocalSupabase.or_: {op}")
+        self.filters.append(lambda r: any(condition(r) for condition in conditions))
+        return self
+
+    def _matches(self, row: dict) -> bool:
+        return all(f(row) for f in self.filters)
+
+    def execute(self) -> LocalResponse:
+        client = self.client
+        client._request(self.table, self.payload or ([self.values] if self.values else []))
+        with client._lock:
+            rows = client.tables.setdefault(self.table, [])
+            if self.op == "select":
+                return LocalResponse([dict(r) for r in rows if self._matches(r)][self.window])
+            if self.op == "insert":
+                for row in self.payload:
+                    row.setdefault("id", str(uuid.uuid4()))
+                rows.extend(self.payload)
+                return LocalResponse([dict(r) for r in self.payload])
+            if self.op == "upsert":
+                index = {tuple(r.get(k) for k in self.on_conflict): r for r in rows}
+                out = []
+                for row in self.payload:
+                    existing = index.get(tuple(row.get(k) for k in self.on_conflict))
+                    if existing is None:
+                        existing = {"id": str(uuid.uuid4())}
+                        rows.append(existing)
+                        index[tuple(row.get(k) for k in self.on_conflict)] = existing
+                    _update_row(self.table, existing, row)
+                    out.append(dict(existing))
+                return LocalResponse(out)
+            if self.op == "update":
+                out = []
+                for row in rows:
+                    if self._matches(row):
+                        _update_row(self.table, row, self.values)
+                        out.append(dict(row))
+                return LocalResponse(out)
+            kept = [r for r in rows if not self._matches(r)]
+            deleted = [dict(r) for r in rows if self._matches(r)]
+            rows[:] = kept
+            return LocalResponse(deleted)
+
+
+class _LocalRpc:
+    def __init__(self, client: LocalSupabase, name: str, params: dict):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    def execute(self) -> LocalResponse:
+        function = self.client.functions.get(self.name)
+        if function is None:
+            self.client._request(self.name, [])
+            raise LocalSupabaseError(f"Could not find the function public.{self.name}")
+        return LocalResponse(function(self.client, **self.params))
@@ -1,8 +1,19 @@
 
+"""
+Mock projects for local development and load tests.
+
+Uso:
+    python -m app.etl.mock_data                     # 50 proyectos, uno por uno
+    python -m app.etl.mock_data --bulk 100000       # Carga masiva con tipologías e historial
+    python -m app.etl.mock_data --bulk 100000 --seed 7 --postgres
+"""
 import os
 import random
-import uuid
-from datetime import datetime, timedelta
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
 from faker import Faker
 from dotenv import load_dotenv
 
@@ -15,6 +26,10 @@ load_dotenv(dotenv_path=dotenv_path)
 
 from supabase import create_client, Client
 
+from app.etl.postgres import get_postgres_client, make_writer
+from app.etl.typologies import indoor_surface, typology_rooms
+from app.etl.writer import WriteReport
+
 fake = Faker('es_CL')
 
 def get_supabase_client() -> Client:
@@ -112,6 +127,7 @@ def generate_mock_projects(n=50):
     print(f"Successfully inserted {len(inserted_projects)} projects.")
         
     # Now generate typologies for each project
+    rooms = typology_rooms(pd.Series(PROJECT_TYPOLOGIES, index=PROJECT_TYPOLOGIES))
     typologies_batch = []
     for p in inserted_projects:
         p_id = p['id']
@@ -120,8 +136,8 @@ def generate_mock_projects(n=50):
         chosen_types = random.sample(PROJECT_TYPOLOGIES, k=num_types)
         
         for t_name in chosen_types:
-            beds = int(t_name[0])
-            baths = int(t_name[3])
+            beds = int(rooms.at[t_name, "bedrooms"])
+            baths = int(rooms.at[t_name, "bathrooms"])
             surface = round(random.uniform(30, 140), 2)
             price_uf = round(surface * p['avg_price_m2_uf'] * random.uniform(0.9, 1.1), 2)
             
@@ -148,5 +164,204 @@ def generate_mock_projects(n=50):
         except Exception as e:
             print(f"Error inserting typologies: {e}")
 
+
+# ---------------------------------------------------------------------------
+# Bulk seeding (load tests)
+# ---------------------------------------------------------------------------
+
+SEED_BATCH_SIZE = 500
+SEED_CONCURRENCY = 8
+SEED_HISTORY_PERIODS = 6  # semesters of project_metrics_history per project
+NAME_POOL = 400  # Faker first names drawn once per run, combined with street suffixes
+
+
+def _history_periods(count: int, as_of: date) -> list[tuple[int, str, str]]:
+    """(year, '1P'/'2P', recorded_at) for the `count` semesters before as_of, oldest first."""
+    year, half = (as_of.year, 1) if as_of.month > 6 else (as_of.year - 1, 2)
+    periods = []
+    for _ in range(count):
+        periods.append((year, f"{half}P", f"{year}-{1 if half == 1 else 7:02d}-01"))
+        year, half = (year, 1) if half == 2 else (year - 1, 2)
+    return periods[::-1]
+
+
+def _unique_names(names: pd.Series, communes: pd.Series) -> pd.Series:
+    """Number repeated (name, commune) pairs ('Edificio Ana Norte 2', ...) so the upsert never folds two projects."""
+    repeat = names.groupby([names, communes]).cumcount()
+    return names.where(repeat == 0, names + " " + (repeat + 1).astype(str))
+
+
+def build_mock_frames(n: int, seed: int = 0, periods: int = SEED_HISTORY_PERIODS,
+                      as_of: date | None = None) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Projects, typologies and metric-history rows for n mock projects, built
+    column by column with numpy. Same seed and as_of (default: today) → same
+    rows. Typology and history frames carry the project's (name, commune)
+    instead of its id, which only exists once the projects are written.
+    """
+    rng = np.random.default_rng(seed)
+    as_of = as_of or date.today()
+    names_fake = Faker('es_CL')
+    names_fake.seed_instance(seed)
+    first_names = np.array([names_fake.first_name() for _ in range(NAME_POOL)], dtype=object)
+    suffixes = np.array(sorted({names_fake.street_suffix() for _ in range(NAME_POOL)}), dtype=object)
+    streets = np.array([names_fake.street_name() for _ in range(NAME_POOL)], dtype=object)
+
+    commune = rng.integers(0, len(COMMUNES_DATA), n)
+    c_name, region, c_lat, c_lon = (np.array([c[i] for c in COMMUNES_DATA], dtype=object) for i in range(4))
+    # Jitter location slightly around commune center
+    lat = np.round(c_lat[commune].astype(float) + (rng.random(n) - 0.5) * 0.04, 6)
+    lon = np.round(c_lon[commune].astype(float) + (rng.random(n) - 0.5) * 0.04, 6)
+
+    total_units = rng.integers(50, 401, n)
+    sold_units = (total_units * rng.uniform(0.1, 0.95, n)).astype(int)
+    available_units = total_units - sold_units
+    sales_speed = np.round(rng.uniform(2.0, 15.0, n), 2)
+    mao = np.round(available_units / np.maximum(1, sales_speed), 1)
+    today = np.datetime64(as_of, "D")
+
+    names = pd.Series("Edificio " + first_names[rng.integers(0, NAME_POOL, n)] + " "
+                      + suffixes[rng.integers(0, len(suffixes), n)])
+    projects = pd.DataFrame({
+        "name": _unique_names(names, pd.Series(c_name[commune])),
+        "developer": np.array(DEVELOPERS, dtype=object)[rng.integers(0, len(DEVELOPERS), n)],
+        "commune": c_name[commune],
+        "region": region[commune],
+        "address": streets[rng.integers(0, NAME_POOL, n)] + " " + rng.integers(1, 9999, n).astype(str),
+        "location": [f"POINT({x} {y})" for x, y in zip(lon, lat)],  # PostGIS format
+        "latitude": lat,
+        "longitude": lon,
+        "project_status": np.array(STATUSES, dtype=object)[rng.integers(0, len(STATUSES), n)],
+        "property_type": "Departamento",
+        "category": np.array(CATEGORIES, dtype=object)[rng.integers(0, len(CATEGORIES), n)],
+        "total_floors": rng.integers(5, 31, n),
+        "total_apartments": total_units,
+        "total_units": total_units,
+        "sold_units": sold_units,
+        "available_units": available_units,
+        "sales_speed_monthly": sales_speed,
+        "months_to_sell_out": mao,
+        "min_price_uf": rng.integers(2500, 4001, n),
+        "max_price_uf": rng.integers(8000, 15001, n),
+        "avg_price_uf": rng.integers(4500, 9001, n),
+        "avg_price_m2_uf": np.round(rng.uniform(60.0, 120.0, n), 2),
+        "delivery_date": (today + rng.integers(-100, 801, n)).astype(str),
+        "construction_start_date": (today - rng.integers(200, 601, n)).astype(str),
+    })
+
+    # 2-4 distinct typologies per project: the first k of a random order of PROJECT_TYPOLOGIES
+    per_project = rng.integers(2, 5, n)
+    order = np.argsort(rng.random((n, len(PROJECT_TYPOLOGIES))), axis=1)
+    keep = np.arange(len(PROJECT_TYPOLOGIES)) < per_project[:, None]
+    owner = np.repeat(np.arange(n), per_project)
+    code = np.array(PROJECT_TYPOLOGIES, dtype=object)[order[keep]]
+    m = len(owner)
+    rooms = typology_rooms(pd.Series(code))
+    surface = np.round(rng.uniform(30, 140, m), 2)
+    terrace = np.round(surface * 0.15, 2)
+    price_uf = np.round(surface * projects["avg_price_m2_uf"].to_numpy()[owner] * rng.uniform(0.9, 1.1, m), 2)
+    typologies = pd.DataFrame({
+        "_project_name": projects["name"].to_numpy()[owner],
+        "_project_commune": projects["commune"].to_numpy()[owner],
+        "name": code,
+        "bedrooms": rooms["bedrooms"].to_numpy(dtype=int),
+        "bathrooms": rooms["bathrooms"].to_numpy(dtype=int),
+        "surface_total": surface,
+        "surface_indoor": indoor_surface(pd.Series(surface), pd.Series(terrace)),
+        "surface_terrace": terrace,
+        "current_price_uf": price_uf,
+        "price_per_m2_uf": np.round(price_uf / surface, 2),
+        "stock": rng.integers(1, 21, m),
+        "total_units": rng.integers(20, 51, m),
+    })
+
+    # One snapshot per project and semester; sales accumulate towards sold_units
+    semesters = _history_periods(periods, as_of)
+    owner = np.repeat(np.arange(n), len(semesters))
+    step = np.tile(np.arange(1, len(semesters) + 1), n)
+    sold = (sold_units[owner] * step / len(semesters)).astype(int)
+    stock = total_units[owner] - sold
+    speed = np.round(sales_speed[owner] * rng.uniform(0.7, 1.3, len(owner)), 2)
+    price = np.round(projects["avg_price_uf"].to_numpy()[owner] * (0.9 + 0.1 * step / len(semesters)), 2)
+    history = pd.DataFrame({
+        "_project_name": projects["name"].to_numpy()[owner],
+        "_project_commune": projects["commune"].to_numpy()[owner],
+        "recorded_at": [semesters[i - 1][2] for i in step],
+        "year": [semesters[i - 1][0] for i in step],
+        "period": [semesters[i - 1][1] for i in step],
+        "stock": stock,
+        "sold_accumulated": sold,
+        "sales_monthly": np.round(speed).astype(int),
+        "sales_speed_monthly": speed,
+        "price_avg_uf": price,
+        "price_avg_m2": np.round(projects["avg_price_m2_uf"].to_numpy()[owner], 2),
+        "months_to_sell_out": np.round(stock / np.maximum(1, speed), 1),
+        "total_units": total_units[owner],
+        "min_price_uf": projects["min_price_uf"].to_numpy()[owner],
+        "max_price_uf": projects["max_price_uf"].to_numpy()[owner],
+    })
+    return projects, typologies, history
+
+
+def _with_project_ids(frame: pd.DataFrame, project_ids: dict) -> list[dict]:
+    """Rows of a typology/history frame with project_id resolved; rows whose project failed are dropped."""
+    ids = pd.Series(list(zip(frame["_project_name"], frame["_project_commune"]))).map(project_ids)
+    rows = frame.drop(columns=["_project_name", "_project_commune"])
+    rows.insert(0, "project_id", ids.to_numpy())
+    return rows[ids.notna().to_numpy()].to_dict("records")
+
+
+def seed_mock_projects(n: int = 100_000, seed: int = 0, supabase=None, periods: int = SEED_HISTORY_PERIODS,
+                       batch_size: int = SEED_BATCH_SIZE, concurrency: int = SEED_CONCURRENCY,
+                       as_of: date | None = None) -> dict[str, WriteReport]:
+    """
+    Bulk-seed n mock projects with their typologies and metric history, for
+    load tests. Rows are generated up front (build_mock_frames) and written
+    with concurrent batched upserts: projects on (name, commune), history on
+    (project_id, recorded_at). Re-running with the same seed updates the
+    same projects; their typologies are replaced.
+    """
+    supabase = supabase or get_supabase_client()
+    start = time.perf_counter()
+    projects, typologies, history = build_mock_frames(n, seed, periods, as_of)
+    print(f"Generated {len(projects):,} projects, {len(typologies):,} typologies and "
+          f"{len(history):,} history rows in {time.perf_counter() - start:.1f}s (seed {seed})")
+
+    reports = {}
+    writer = make_writer(supabase, "projects", batch_size, concurrency)
+    reports["projects"] = writer.upsert(projects.to_dict("records"), on_conflict="name,commune")
+    project_ids = {(p["name"], p["commune"]): p["id"] for p in reports["projects"].data}
+    print(f"  {reports['projects'].summary()}")
+
+    writer = make_writer(supabase, "project_typologies", batch_size, concurrency)
+    writer.delete_in("project_id", list(project_ids.values()))
+    reports["project_typologies"] = writer.insert(_with_project_ids(typologies, project_ids))
+    print(f"  {reports['project_typologies'].summary()}")
+
+    writer = make_writer(supabase, "project_metrics_history", batch_size, concurrency)
+    reports["project_metrics_history"] = writer.upsert(_with_project_ids(history, project_ids),
+                                                       on_conflict="project_id,recorded_at")
+    print(f"  {reports['project_metrics_history'].summary()}")
+    print(f"Seeded {len(project_ids):,} projects in {time.perf_counter() - start:.1f}s")
+    return reports
+
+
 if __name__ == "__main__":
-    generate_mock_projects(50)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generar proyectos de prueba en Supabase")
+    parser.add_argument("--bulk", type=int, default=None, metavar="N",
+                        help="Carga masiva de N proyectos con tipologías e historial (upserts por lotes)")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla (misma semilla → mismos datos)")
+    parser.add_argument("--periods", type=int, default=SEED_HISTORY_PERIODS, help="Semestres de historial por proyecto")
+    parser.add_argument("--batch-size", type=int, default=SEED_BATCH_SIZE, help="Filas por request")
+    parser.add_argument("--concurrency", type=int, default=SEED_CONCURRENCY, help="Requests simultáneos")
+    parser.add_argument("--postgres", action="store_true",
+                        help="Escribir directo en Postgres (COPY + INSERT ... ON CONFLICT) vía SUPABASE_DB_URL")
+    args = parser.parse_args()
+
+    if args.bulk:
+        client = get_postgres_client() if args.postgres else None
+        seed_mock_projects(args.bulk, args.seed, client, args.periods, args.batch_size, args.concurrency)
+    else:
+        generate_mock_projects(50)
@@ -0,0 +1,247 @@
+"""
+Chilean-locale parsing helpers for TINSA exports.
+
+Scalar helpers parse one cell at a time (dot=thousands, comma=decimal).
+The *_series variants parse a whole pandas Series in one vectorized pass and
+return exactly what the scalar helper would return for every cell, with
+missing values as NaN / <NA> instead of None. TINSA columns repeat the same
+few values across typologies and periods, so each column is factorized first
+and only its distinct values go through the string cleaning.
+
+parse_columns() applies a declarative column-type map to a DataFrame:
+
+    {"field": (("SOURCE COL", "FALLBACK COL"), "int"), ...}
+
+The first source column present in the frame wins, the same way
+row.get(a, row.get(b)) behaves on a pandas row.
+"""
+from __future__ import annotations
+
+import functools
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+NULL_TOKENS = ("-", "", "nan", "None", "NaN")
+PERCENT_NULL_TOKENS = ("-", "", "nan")
+TEXT_NULL_TOKENS = ("nan", "none", "")
+
+MONTHS_ES = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4,
+    "mayo": 5, "junio": 6, "julio": 7, "agosto": 8,
+    "septiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12,
+}
+
+
+# ---------------------------------------------------------------------------
+# Scalar helpers
+# ---------------------------------------------------------------------------
+
+def parse_chilean_number(value) -> float | None:
+    """Parse a number in Chilean format: 4.250,0 → 4250.0"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    s = str(value).strip()
+    if s in NULL_TOKENS:
+        return None
+    # Remove dots (thousands), replace comma with period (decimal)
+    s = s.replace(".", "").replace(",", ".")
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+
+def parse_chilean_int(value) -> int | None:
+    n = parse_chilean_number(value)
+    if n is None:
+        return None
+    return int(round(n))
+
+
+def parse_percentage(value) -> float | None:
+    """Parse '5%' or '0%' → 5.0 or 0.0"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    s = str(value).strip().replace("%", "").replace(",", ".")
+    if s in PERCENT_NULL_TOKENS:
+        return None
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+
+def parse_boolean(value) -> bool | None:
+    """Parse 'SI'/'NO'/'-' → True/False/None"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    s = str(value).strip().upper()
+    if s == "SI":
+        return True
+    if s == "NO":
+        return False
+    return None
+
+
+def parse_date(value) -> str | None:
+    """Try to parse various date formats from TINSA."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    s = str(value).strip()
+    if s in ("-", "", "nan"):
+        return None
+
+    # Try "01-07-2015" format
+    for fmt in ("%d-%m-%Y", "%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(s, fmt).date().isoformat()
+        except ValueError:
+            continue
+
+    # Try "diciembre-2017", "marzo-2024" etc.
+    s_lower = s.lower()
+    for month_name, month_num in MONTHS_ES.items():
+        if month_name in s_lower:
+            year_match = re.search(r"(\d{4})", s)
+            if year_match:
+                year = int(year_match.group(1))
+                return f"{year}-{month_num:02d}-01"
+
+    return None
+
+
+def clean_text(value) -> str | None:
+    """str(value).strip(), with 'nan'/'none'/'' collapsed to None."""
+    s = str(value).strip()
+    return None if s.lower() in TEXT_NULL_TOKENS else s
+
+
+# ---------------------------------------------------------------------------
+# Vectorized helpers
+# ---------------------------------------------------------------------------
+
+def _on_distinct(parse):
+    """Run a column parser over the distinct values only and broadcast back."""
+    @functools.wraps(parse)
+    def wrapper(series: pd.Series) -> pd.Series:
+        codes, uniques = pd.factorize(series, use_na_sentinel=False)
+        parsed = parse(pd.Series(uniques, dtype=object))
+        return pd.Series(parsed.array.take(codes), index=series.index, name=series.name)
+    return wrapper
+
+
+def _as_text(series: pd.Series) -> pd.Series:
+    """str(value).strip() over a column (missing cells become 'nan'/'None')."""
+    return series.astype(str).str.strip()
+
+
+def _to_float(cleaned: pd.Series) -> pd.Series:
+    """
+    float() over a column of cleaned strings.
+
+    pd.to_numeric handles the common case in C; the few cells it rejects
+    but Python's float() accepts ("1_000", "infinity", ...) go through
+    float() once per distinct value so results match the scalar path.
+    """
+    values = pd.to_numeric(cleaned, errors="coerce").astype("float64")
+    retry = values.isna() & cleaned.notna()
+    if retry.any():
+        def _float_or_nan(s: str) -> float:
+            try:
+                return float(s)
+            except ValueError:
+                return np.nan
+        leftovers = cleaned[retry]
+        lookup = {s: _float_or_nan(s) for s in leftovers.unique()}
+        values[retry] = leftovers.map(lookup).astype("float64")
+    return values
+
+
+@_on_distinct
+def parse_chilean_number_series(series: pd.Series) -> pd.Series:
+    """Vectorized parse_chilean_number: float64 Series, NaN where None."""
+    s = _as_text(series)
+    s = s.where(~s.isin(NULL_TOKENS))
+    s = s.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    return _to_float(s)
+
+
+@_on_distinct
+def parse_chilean_int_series(series: pd.Series) -> pd.Series:
+    """Vectorized parse_chilean_int: nullable Int64 Series (round half to even)."""
+    values = parse_chilean_number_series(series)
+    values = values.where(np.isfinite(values))
+    return np.round(values).astype("Int64")
+
+
+@_on_distinct
+def parse_percentage_series(series: pd.Series) -> pd.Series:
+    """Vectorized parse_percentage: float64 Series, NaN where None."""
+    s = _as_text(series)
+    s = s.str.replace("%", "", regex=False).str.replace(",", ".", regex=False)
+    s = s.where(~s.isin(PERCENT_NULL_TOKENS))
+    return _to_float(s)
+
+
+@_on_distinct
+def parse_boolean_series(series: pd.Series) -> pd.Series:
+    """Vectorized parse_boolean: nullable boolean Series."""
+    s = _as_text(series).str.upper()
+    out = pd.Series(pd.NA, index=series.index, dtype="boolean")
+    out[s == "SI"] = True
+    out[s == "NO"] = False
+    return out
+
+
+@_on_distinct
+def parse_date_series(series: pd.Series) -> pd.Series:
+    """Vectorized parse_date: ISO date strings (the format zoo stays scalar)."""
+    return pd.Series([parse_date(v) for v in series], index=series.index, dtype=object)
+
+
+@_on_distinct
+def clean_text_series(series: pd.Series) -> pd.Series:
+    """Vectorized clean_text: object Series of stripped strings or None."""
+    s = _as_text(series)
+    return s.where(~s.str.lower().isin(TEXT_NULL_TOKENS), None).astype(object)
+
+
+SCALAR_PARSERS = {
+    "number": parse_chilean_number,
+    "int": parse_chilean_int,
+    "percent": parse_percentage,
+    "bool": parse_boolean,
+    "date": parse_date,
+    "text": clean_text,
+}
+
+SERIES_PARSERS = {
+    "number": parse_chilean_number_series,
+    "int": parse_chilean_int_series,
+    "percent": parse_percentage_series,
+    "bool": parse_boolean_series,
+    "date": parse_date_series,
+    "text": clean_text_series,
+}
+
+
+def parse_columns(df: pd.DataFrame, column_types: dict) -> pd.DataFrame:
+    """
+    Parse the columns described by a column-type map into a typed DataFrame.
+
+    column_types maps an output field to (source columns, kind), where kind is
+    one of SERIES_PARSERS. Fields whose source columns are all absent come
+    back as all-missing, like a row.get() miss on the scalar path.
+    """
+    typed = {}
+    for field, (sources, kind) in column_types.items():
+        source = next((c for c in sources if c in df.columns), None)
+        if source is None:
+            column = pd.Series([None] * len(df), index=df.index, dtype=object)
+        else:
+            column = df[source]
+        typed[field] = SERIES_PARSERS[kind](column)
+    return pd.DataFrame(typed, index=df.index)
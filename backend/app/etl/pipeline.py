@@ -0,0 +1,450 @@
+"""
+Shared ETL pipeline: source → transform → sink.
+
+Every importer reads DataFrame chunks from a source, maps them column-wise
+to payload dicts and writes those through a batching sink:
+
+    Pipeline(
+        source=CsvSource(path, chunk_rows=50_000),
+        transform=ColumnMapping(FIELDS, required=("name", "commune"), dedupe=("name", "commune")),
+        sink=SupabaseSink(get_supabase_client(), "projects", on_conflict="name,commune"),
+    ).run()
+
+Sources (CsvSource, ExcelSource, ParquetSource, BigQuerySource, FrameSource)
+yield DataFrames; with `prefetch` the next chunk is read on a background
+thread while the current one is transformed and written. A transform is any
+callable DataFrame → list[dict]; ColumnMapping covers the declarative case.
+SupabaseSink wraps BatchWriter (batching, concurrency, retries and
+bisection of rejected batches); without a sink the run is a dry run.
+
+run() returns a PipelineReport with wall time and rows in/out per stage
+(extract, transform, load) and the combined WriteReport. Under an active
+profiling.profiling() block the same stages are also recorded there as
+read, transform and upload.
+"""
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+from app.etl import profiling
+from app.etl.writer import BATCH_SIZE, CONCURRENCY, BatchWriter, WriteReport
+
+
+def get_supabase_client():
+    """Supabase client from SUPABASE_URL / SUPABASE_KEY (backend/.env)."""
+    from supabase import create_client
+
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_KEY")
+    if not url or not key:
+        raise ValueError("SUPABASE_URL y SUPABASE_KEY deben estar en backend/.env")
+    return create_client(url, key)
+
+
+# ---------------------------------------------------------------------------
+# Sources
+# ---------------------------------------------------------------------------
+
+class CsvSource:
+    """CSV file, whole or in chunks of chunk_rows; extra kwargs go to pd.read_csv."""
+
+    def __init__(self, path: Path, chunk_rows: int | None = None, **read_csv):
+        self.path = Path(path)
+        self.chunk_rows = chunk_rows
+        self.read_csv = read_csv
+
+    def __iter__(self):
+        if self.chunk_rows:
+            with pd.read_csv(self.path, chunksize=self.chunk_rows, **self.read_csv) as reader:
+                yield from reader
+        else:
+            yield pd.read_csv(self.path, **self.read_csv)
+
+    def describe(self) -> str:
+        return f"CSV {self.path.name}"
+
+
+class ExcelSource:
+    """
+    One worksheet of an .xlsx file.
+
+    With chunk_rows the sheet is streamed with openpyxl in read-only mode
+    (rows are parsed as the XML is read, never the whole sheet at once) and
+    yielded as DataFrames of chunk_rows rows. Each chunk goes through the same
+    cell conversion and TextParser type inference as pd.read_excel, so chunks
+    concatenate to what read_excel returns (types are inferred per chunk, as
+    with CsvSource). Without it the sheet is read whole with pd.read_excel;
+    extra keyword arguments only apply to that mode.
+    """
+
+    def __init__(self, path: Path, sheet_name=0, chunk_rows: int | None = None, **read_excel):
+        self.path = Path(path)
+        self.sheet_name = sheet_name
+        self.chunk_rows = chunk_rows
+        self.read_excel = read_excel
+
+    def __iter__(self):
+        if not self.chunk_rows:
+            yield pd.read_excel(self.path, sheet_name=self.sheet_name, **self.read_excel)
+            return
+
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(self.path, read_only=True, data_only=True)
+        try:
+            sheet = (workbook.worksheets[self.sheet_name] if isinstance(self.sheet_name, int)
+                     else workbook[self.sheet_name])
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            header = [_excel_cell(v) for v in header]
+            chunk, blank = [], []
+            for row in rows:
+                if all(v is None for v in row):
+                    blank.append([""] * len(row))  # kept only if data follows, like pd.read_excel
+                    continue
+                chunk.extend(blank)
+                blank = []
+                chunk.append([_excel_cell(v) for v in row])
+                if len(chunk) >= self.chunk_rows:
+                    yield self._frame(header, chunk)
+                    chunk = []
+            if chunk:
+                yield self._frame(header, chunk)
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def _frame(header: list, rows: list[list]) -> pd.DataFrame:
+        width = len(header)
+        rows = [r[:width] + [""] * (width - len(r)) for r in rows]
+        return TextParser([header] + rows, header=0, skip_blank_lines=False).read()
+
+    def describe(self) -> str:
+        return f"Excel {self.path.name}"
+
+
+def _excel_cell(value):
+    """openpyxl cell value as pd.read_excel hands it to TextParser."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class ParquetSource:
+    """Parquet file read in record batches of batch_rows (requires pyarrow)."""
+
+    def __init__(self, path: Path, batch_rows: int = 65_536, columns: list[str] | None = None):
+        self.path = Path(path)
+        self.batch_rows = batch_rows
+        self.columns = columns
+
+    def __iter__(self):
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(self.path)
+        for batch in parquet.iter_batches(batch_size=self.batch_rows, columns=self.columns):
+            yield batch.to_pandas()
+
+    def describe(self) -> str:
+        return f"Parquet {self.path.name}"
+
+
+class BigQuerySource:
+    """Query result paged as Arrow record batches (google-cloud-bigquery or LocalBigQuery)."""
+
+    def __init__(self, client, query: str, page_size: int = 10_000):
+        self.client = client
+        self.query = query
+        self.page_size = page_size
+
+    def __iter__(self):
+        for batch in iter_arrow_batches(self.client, self.query, self.page_size):
+            yield batch.to_pandas()
+
+    def describe(self) -> str:
+        return "BigQuery"
+
+
+class FrameSource:
+    """A DataFrame, or a callable returning one (e.g. a staged read), as a single chunk."""
+
+    def __init__(self, frame, label: str = "DataFrame"):
+        self.frame = frame
+        self.label = label
+
+    def __iter__(self):
+        yield self.frame() if callable(self.frame) else self.frame
+
+    def describe(self) -> str:
+        return self.label
+
+
+def iter_arrow_batches(client, query: str, page_size: int = 10_000):
+    """Arrow record batches of a BigQuery query result, fetched page by page."""
+    job = client.query(query)
+    rows = job.result(page_size=page_size)
+    scanned = getattr(job, "total_bytes_processed", None)
+    if scanned is not None:
+        print(f"  BigQuery: {rows.total_rows:,} filas, {scanned / 1e6:,.1f} MB escaneados")
+    yield from rows.to_arrow_iterable()
+
+
+def prefetched(chunks, depth: int = 2):
+    """
+    Iterate `chunks` from a background thread, at most `depth` chunks ahead,
+    so the next one is read while the caller transforms and writes.
+    """
+    buffer = queue.Queue(maxsize=max(1, depth))
+    done = object()
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for chunk in chunks:
+                if not put(chunk):
+                    return
+            put(done)
+        except BaseException as e:  # re-raised on the consumer side
+            put(e)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        thread.join(timeout=1)
+
+
+# ---------------------------------------------------------------------------
+# Transform
+# ---------------------------------------------------------------------------
+
+class ColumnMapping:
+    """
+    Declarative column-wise mapping of a chunk to payload dicts.
+
+    fields: payload field → (source column or tuple of candidates, kind, default).
+    The first candidate present in the chunk is used; when none is, every row
+    gets the default. A callable default is called with the row's index label
+    (e.g. lambda idx: f"Proyecto {idx}"). Kinds:
+      - "value": as is, null → None
+      - "text":  str(value), null → default
+      - "int":   numeric (unparseable → null), truncated, null → default
+      - "float": numeric (unparseable → null), null → default
+    required: fields that must be truthy for a row to be kept.
+    skip_invalid: drop rows with a value that is present but not numeric in
+    an "int"/"float" field, as the row-by-row importers did when the cast
+    raised, instead of writing the default over the stored value.
+    dedupe: fields identifying a payload; repeats within a chunk keep the
+    last row (the row a sequence of upserts would leave behind).
+    """
+
+    def __init__(self, fields: dict[str, tuple], required: tuple[str, ...] = (), dedupe: tuple[str, ...] = (),
+                 skip_invalid: bool = False):
+        self.fields = fields
+        self.required = required
+        self.dedupe = dedupe
+        self.skip_invalid = skip_invalid
+
+    def source_columns(self) -> list[str]:
+        columns = []
+        for candidates, _, _ in self.fields.values():
+            for column in (candidates,) if isinstance(candidates, str) else candidates:
+                if column not in columns:
+                    columns.append(column)
+        return columns
+
+    def _column(self, df: pd.DataFrame, candidates, kind: str, default, invalid: np.ndarray) -> list:
+        candidates = (candidates,) if isinstance(candidates, str) else candidates
+        column = next((c for c in candidates if c in df.columns), None)
+        if callable(default):
+            defaults = [default(idx) for idx in df.index]
+        else:
+            defaults = [default] * len(df)
+        if column is None:
+            return defaults
+        values = df[column]
+        if kind in ("int", "float"):
+            numbers = pd.to_numeric(values, errors="coerce").astype("float64")
+            invalid |= (values.notna() & numbers.isna()).to_numpy()
+            if kind == "int":
+                return [int(v) if np.isfinite(v) else d for v, d in zip(numbers.tolist(), defaults)]
+            return [v if v == v else d for v, d in zip(numbers.tolist(), defaults)]
+        if kind == "text":
+            return [v if present else d for v, present, d in
+                    zip(values.astype(str).tolist(), values.notna().tolist(), defaults)]
+        return values.astype(object).where(values.notna(), None).tolist()
+
+    def __call__(self, df: pd.DataFrame) -> list[dict]:
+        invalid = np.zeros(len(df), dtype=bool)
+        columns = {f: self._column(df, candidates, kind, default, invalid)
+                   for f, (candidates, kind, default) in self.fields.items()}
+        keep = ~invalid if self.skip_invalid else np.ones(len(df), dtype=bool)
+        for f in self.required:
+            keep &= np.fromiter(map(bool, columns[f]), dtype=bool, count=len(df))
+        if self.dedupe:
+            keys = pd.DataFrame({f: columns[f] for f in self.dedupe})[keep]
+            keep[np.flatnonzero(keep)[keys.duplicated(keep="last").to_numpy()]] = False
+        names = list(columns)
+        return [dict(zip(names, values)) for values, kept in zip(zip(*columns.values()), keep.tolist()) if kept]
+
+
+# ---------------------------------------------------------------------------
+# Sink
+# ---------------------------------------------------------------------------
+
+class SupabaseSink:
+    """Upserts (on_conflict) or inserts into one table through BatchWriter."""
+
+    def __init__(self, supabase, table: str, on_conflict: str | None = None, batch_size: int = BATCH_SIZE,
+                 concurrency: int = CONCURRENCY, retries: int = 2):
+        self.table = table
+        self.on_conflict = on_conflict
+        self.writer = BatchWriter(supabase, table, batch_size=batch_size, concurrency=concurrency, retries=retries)
+
+    def write(self, rows: list[dict]) -> WriteReport:
+        if self.on_conflict:
+            return self.writer.upsert(rows, on_conflict=self.on_conflict)
+        return self.writer.insert(rows)
+
+
+# ---------------------------------------------------------------------------
+# Engine
+# ---------------------------------------------------------------------------
+
+@dataclass
+class StageStats:
+    name: str
+    seconds: float = 0.0
+    rows_in: int = 0
+    rows_out: int = 0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows_in / self.seconds if self.seconds > 0 else 0.0
+
+
+@dataclass
+class PipelineReport:
+    name: str
+    stages: dict[str, StageStats] = field(default_factory=dict)
+    write: WriteReport | None = None
+    chunks: int = 0
+    elapsed: float = 0.0
+    sample: dict | None = None  # first transformed row, for dry runs
+
+    def summary(self) -> list[str]:
+        lines = [f"{self.name}: {self.chunks} bloques en {self.elapsed:.2f}s"]
+        for stage in self.stages.values():
+            lines.append(f"  {stage.name:<10} {stage.seconds:8.2f}s  {stage.rows_in:>10,} → {stage.rows_out:>10,} filas"
+                         f"  ({stage.rows_per_sec:,.0f} filas/s)")
+        return lines
+
+
+class Pipeline:
+    """
+    Run source → transform → sink chunk by chunk.
+
+    `extract` time is what the loop waits for the next chunk (with prefetch,
+    reading overlapping the other stages does not count); `load` rows_out are
+    the rows the sink accepted. sink=None is a dry run.
+    """
+
+    def __init__(self, source, transform, sink: SupabaseSink | None = None, name: str = "pipeline",
+                 prefetch: int = 0, verbose: bool = True):
+        self.source = source
+        self.transform = transform
+        self.sink = sink
+        self.name = name
+        self.prefetch = prefetch
+        self.verbose = verbose
+
+    def run(self) -> PipelineReport:
+        report = PipelineReport(name=self.name)
+        extract, transform, load = (report.stages.setdefault(n, StageStats(n)) for n in ("extract", "transform", "load"))
+        if self.sink is not None:
+            report.write = WriteReport(table=self.sink.table)
+
+        chunks = prefetched(iter(self.source), self.prefetch) if self.prefetch else iter(self.source)
+        start = time.perf_counter()
+        while True:
+            t = time.perf_counter()
+            with profiling.stage("read") as profile:
+                chunk = next(chunks, None)
+                profile.rows += 0 if chunk is None else len(chunk)
+            extract.seconds += time.perf_counter() - t
+            if chunk is None:
+                break
+            report.chunks += 1
+            extract.rows_in += len(chunk)
+            extract.rows_out += len(chunk)
+
+            t = time.perf_counter()
+            with profiling.stage("transform") as profile:
+                rows = self.transform(chunk)
+                profile.rows += len(chunk)
+            transform.seconds += time.perf_counter() - t
+            transform.rows_in += len(chunk)
+            transform.rows_out += len(rows)
+            if report.sample is None and rows:
+                report.sample = rows[0]
+
+            if self.sink is None:
+                continue
+            t = time.perf_counter()
+            with profiling.stage("upload") as profile:
+                written = self.sink.write(rows)
+                profile.rows += len(rows)
+            load.seconds += time.perf_counter() - t
+            load.rows_in += len(rows)
+            load.rows_out += written.written
+            _merge_write_report(report.write, written)
+            if self.verbose:
+                print(f"  ✅ {extract.rows_in:,} filas leídas, {load.rows_out:,} enviadas a {self.sink.table}...")
+
+        report.elapsed = time.perf_counter() - start
+        if report.write is not None:
+            report.write.elapsed = load.seconds
+        if self.verbose:
+            for line in report.summary():
+                print(f"  {line}")
+        return report
+
+
+def _merge_write_report(total: WriteReport, part: WriteReport):
+    total.rows += part.rows
+    total.written += part.written
+    total.failed += part.failed
+    total.requests += part.requests
+    total.errors.extend(part.errors)
+    total.rejected.extend(part.rejected)
+    total.batch_times.extend(part.batch_times)
@@ -0,0 +1,270 @@
+"""
+Direct-Postgres bulk loads (COPY + merge), an alternative to the REST sink.
+
+The Supabase REST path sends 50–100-row JSON batches, one HTTP request
+each. For full reloads CopyWriter talks to the database itself: every call
+stages its rows with one COPY into a temporary table and merges them with
+INSERT ... ON CONFLICT,
+
+    CREATE TEMP TABLE _stage_projects AS SELECT <cols>, '' AS _omitted FROM projects WHERE false;
+    COPY _stage_projects (<cols>, _omitted) FROM STDIN;
+    INSERT INTO projects (<cols>) SELECT <cols> FROM _stage_projects WHERE true
+        ON CONFLICT (name, commune) DO UPDATE SET <col> = EXCLUDED.<col>, ...
+        RETURNING *;
+
+inside one transaction, whatever the number of rows. Payloads may leave
+keys out, as insert_projects does for None values: each staged row lists
+the columns it did not send in _omitted, and before the INSERT one
+UPDATE ... FROM copies the stored values of exactly those columns into the
+staged row. A missing key thus keeps the stored value as with the REST
+upsert (on insert it is NULL), while an explicit None clears it.
+Duplicate conflict keys are dropped before the COPY, keeping the last row,
+since ON CONFLICT cannot touch a row twice per statement. Plain inserts
+(on_conflict=None) COPY straight into the table, one COPY per payload
+shape.
+
+CopyWriter exposes the BatchWriter methods (upsert / insert / delete_in,
+each returning a WriteReport with the returned rows in `data`), and
+PostgresSink the SupabaseSink one, so the importers can take either. A
+failing load is rolled back and bisected like a rejected REST batch: each
+half is loaded in its own transaction, down to the single rows the
+database rejects, which end up in `rejected`.
+
+Needs psycopg (v3) and SUPABASE_DB_URL (the project's Postgres connection
+string); local_postgres.LocalPostgres is an in-process stand-in for tests
+and benchmarks.
+"""
+from __future__ import annotations
+
+import decimal
+import os
+import time
+import uuid
+from collections import defaultdict
+
+from app.etl.profiling import record_writes
+from app.etl.writer import BATCH_SIZE, CONCURRENCY, BatchWriter, WriteReport
+
+try:
+    import psycopg
+except ImportError:  # the REST sink still works without it
+    psycopg = None
+
+DELETE_BATCH_SIZE = 1_000  # values per DELETE ... IN (...)
+
+
+def get_postgres_client(dsn: str | None = None) -> "PostgresClient":
+    """PostgresClient on SUPABASE_DB_URL (backend/.env) or an explicit DSN."""
+    if psycopg is None:
+        raise ImportError("psycopg no está instalado. Instala con: pip install 'psycopg[binary]'")
+    dsn = dsn or os.getenv("SUPABASE_DB_URL")
+    if not dsn:
+        raise ValueError("SUPABASE_DB_URL debe estar en backend/.env para usar --postgres")
+    return PostgresClient(psycopg.connect(dsn))
+
+
+class PostgresClient:
+    """
+    A Postgres connection handed to the importers in place of the Supabase
+    client; writer() and sink() give the COPY-based equivalents of
+    BatchWriter and SupabaseSink.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def writer(self, table: str, batch_size: int = BATCH_SIZE, concurrency: int = CONCURRENCY) -> "CopyWriter":
+        return CopyWriter(self.conn, table)
+
+    def sink(self, table: str, on_conflict: str | None = None) -> "PostgresSink":
+        return PostgresSink(self.conn, table, on_conflict=on_conflict)
+
+    def close(self):
+        self.conn.close()
+
+
+def make_writer(client, table: str, batch_size: int = BATCH_SIZE, concurrency: int = CONCURRENCY):
+    """CopyWriter for a PostgresClient, BatchWriter for a Supabase client."""
+    if isinstance(client, PostgresClient):
+        return client.writer(table, batch_size, concurrency)
+    return BatchWriter(client, table, batch_size, concurrency)
+
+
+def make_sink(client, table: str, on_conflict: str | None = None, batch_size: int = BATCH_SIZE,
+              concurrency: int = CONCURRENCY):
+    """PostgresSink for a PostgresClient, SupabaseSink for a Supabase client."""
+    from app.etl.pipeline import SupabaseSink
+
+    if isinstance(client, PostgresClient):
+        return client.sink(table, on_conflict=on_conflict)
+    return SupabaseSink(client, table, on_conflict=on_conflict, batch_size=batch_size, concurrency=concurrency)
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _copy_value(value):
+    if hasattr(value, "item") and not isinstance(value, (str, bytes)):  # numpy scalar
+        return value.item()
+    return value
+
+
+def _json_value(value):
+    """Returned column as PostgREST would serialize it (uuid → str, numeric → float)."""
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    return value
+
+
+class CopyWriter:
+    """COPY + INSERT ... ON CONFLICT writes to one table over a single connection."""
+
+    def __init__(self, conn, table: str):
+        self.conn = conn
+        self.table = table
+
+    def upsert(self, rows: list[dict], on_conflict: str | None = None,
+               batches: list[list[dict]] | None = None) -> WriteReport:
+        if batches is not None:
+            rows = [row for batch in batches for row in batch]
+        keys = [k.strip() for k in on_conflict.split(",")] if on_conflict else []
+        return self._write(rows, keys)
+
+    def insert(self, rows: list[dict], batches: list[list[dict]] | None = None) -> WriteReport:
+        if batches is not None:
+            rows = [row for batch in batches for row in batch]
+        return self._write(rows, [])
+
+    def delete_in(self, column: str, values: list) -> WriteReport:
+        """DELETE ... WHERE column IN (values), in one transaction."""
+        report = WriteReport(table=self.table, rows=len(values))
+        start = time.perf_counter()
+        try:
+            with self.conn.cursor() as cur:
+                for i in range(0, len(values), DELETE_BATCH_SIZE):
+                    part = [_copy_value(v) for v in values[i:i + DELETE_BATCH_SIZE]]
+                    cur.execute(f"DELETE FROM {_quote(self.table)} WHERE {_quote(column)} IN "
+                                f"({', '.join(['%s'] * len(part))})", part)
+                    report.requests += 1
+            self.conn.commit()
+            report.written = len(values)
+        except Exception as e:
+            self.conn.rollback()
+            report.failed = len(values)
+            report.errors.append(str(e)[:200])
+            report.rejected.extend(values)
+        report.elapsed = time.perf_counter() - start
+        report.batch_times.append((report.elapsed, len(values)))
+        record_writes(report)
+        return report
+
+    def _write(self, rows: list[dict], keys: list[str]) -> WriteReport:
+        if keys:
+            # Last row wins per conflict key, as with sequential REST batches
+            latest = {}
+            for row in rows:
+                latest[tuple(row.get(k) for k in keys)] = row
+            rows = list(latest.values())
+        report = WriteReport(table=self.table, rows=len(rows))
+        start = time.perf_counter()
+        # Bisect failing loads: every part is loaded (and rolled back) on its own
+        pending = [rows] if rows else []
+        while pending:
+            part = pending.pop()
+            part_start = time.perf_counter()
+            try:
+                with self.conn.cursor() as cur:
+                    data = self._merge(cur, part, keys, report) if keys else self._insert(cur, part, report)
+                self.conn.commit()
+                report.written += len(part)
+                report.data.extend(data)
+            except Exception as e:
+                self.conn.rollback()
+                if len(part) == 1:
+                    report.failed += 1
+                    report.errors.append(str(e)[:200])
+                    report.rejected.append(part[0])
+                else:
+                    mid = len(part) // 2
+                    pending.extend([part[mid:], part[:mid]])
+            report.batch_times.append((time.perf_counter() - part_start, len(part)))
+        report.elapsed = time.perf_counter() - start
+        record_writes(report)
+        return report
+
+    def _insert(self, cur, rows: list[dict], report: WriteReport) -> list[dict]:
+        """COPY rows straight into the table, one COPY per payload shape."""
+        shapes = defaultdict(list)
+        for row in rows:
+            shapes[tuple(row)].append(row)
+        for columns, group in shapes.items():
+            self._copy(cur, _quote(self.table), list(columns), group)
+            report.requests += 1
+        return []
+
+    @staticmethod
+    def _copy(cur, target: str, columns: list[str], rows: list[dict], tag: str | None = None,
+              tags: list | None = None):
+        """COPY rows into target (NULL for keys a row lacks); with tag, tags[i] goes in that column."""
+        column_list = ", ".join(_quote(c) for c in columns + ([tag] if tag else []))
+        with cur.copy(f"COPY {target} ({column_list}) FROM STDIN") as copy:
+            for i, row in enumerate(rows):
+                values = [_copy_value(row.get(c)) for c in columns]
+                if tag:
+                    values.append(tags[i])
+                copy.write_row(values)
+
+    def _merge(self, cur, rows: list[dict], keys: list[str], report: WriteReport) -> list[dict]:
+        """COPY all rows into one staging table, fill the keys they omit from the table, then INSERT ... ON CONFLICT."""
+        table = _quote(self.table)
+        stage = _quote(f"_stage_{self.table}")
+        union = list(dict.fromkeys(c for row in rows for c in row))
+        column_list = ", ".join(_quote(c) for c in union)
+        # ",2,5,": positions in `union` of the keys a row did not send ('' when it sent all)
+        omitted = [",".join(str(i) for i, c in enumerate(union) if c not in row) for row in rows]
+        omitted = [f",{o}," if o else "" for o in omitted]
+        cur.execute(f"CREATE TEMP TABLE {stage} AS SELECT {column_list}, '' AS _omitted FROM {table} WHERE false")
+        self._copy(cur, stage, union, rows, tag="_omitted", tags=omitted)
+        report.requests += 2
+
+        updates = [c for c in union if c not in keys]
+        sparse = [i for i, c in enumerate(union) if c in updates and any(c not in row for row in rows)]
+        if sparse:
+            # Keys missing from the payload keep the stored value
+            cur.execute(
+                f"UPDATE {stage} SET " + ", ".join(
+                    f"{_quote(union[i])} = CASE WHEN {stage}._omitted LIKE %s "
+                    f"THEN t.{_quote(union[i])} ELSE {stage}.{_quote(union[i])} END" for i in sparse)
+                + f" FROM {table} AS t WHERE {stage}._omitted <> '' AND "
+                + " AND ".join(f"t.{_quote(k)} = {stage}.{_quote(k)}" for k in keys),
+                [f"%,{i},%" for i in sparse],
+            )
+            report.requests += 1
+
+        conflict = ", ".join(_quote(k) for k in keys)
+        action = ("DO UPDATE SET " + ", ".join(f"{_quote(c)} = EXCLUDED.{_quote(c)}" for c in updates)
+                  if updates else "DO NOTHING")
+        cur.execute(f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {stage} WHERE true "
+                    f"ON CONFLICT ({conflict}) {action} RETURNING *")
+        names = [d[0] for d in cur.description]
+        returned = [{n: _json_value(v) for n, v in zip(names, values)} for values in cur.fetchall()]
+        report.requests += 1
+        cur.execute(f"DROP TABLE {stage}")
+        return returned
+
+
+class PostgresSink:
+    """Pipeline sink writing through CopyWriter (upsert on on_conflict, else insert)."""
+
+    def __init__(self, conn, table: str, on_conflict: str | None = None):
+        self.table = table
+        self.on_conflict = on_conflict
+        self.writer = CopyWriter(conn, table)
+
+    def write(self, rows: list[dict]) -> WriteReport:
+        if self.on_conflict:
+            return self.writer.upsert(rows, on_conflict=self.on_conflict)
+        return self.writer.insert(rows)
@@ -0,0 +1,290 @@
+"""
+Per-stage timing for the importers (--profile).
+
+An ImportProfiler records, for every named stage (read, sniff, transform,
+typologies, upload, ...), wall time, CPU time, rows processed and the
+process's peak RSS, plus the slowest batches of every table written. The
+result is printed as a table and saved as JSON, so import speed can be
+compared run to run:
+
+    with profiling("tinsa_importer tinsa_rm.csv", path):
+        with stage("read") as s:
+            df = read_tinsa_csv(path)
+            s.rows += len(df)
+
+Stages are instrumented in place with the module-level stage() and
+record_writes() hooks, which do nothing unless a profiler is active, so
+the import code does not have to pass a profiler around. Stages nest:
+"sniff" runs inside "read", "typologies" inside "transform"; each entry
+reports its total time and self_wall_s, the time not spent in child stages.
+A stage entered several times (one call per chunk) accumulates.
+
+CPU time is process-wide (all threads). Peak RSS is the process high-water
+mark at the end of the stage (rss_growth_mb: how much the stage raised it);
+it needs the `resource` module, so it is null on Windows. Work done in
+worker processes (tinsa_importer --all) only shows up as the wall time the
+main process spends waiting for it, and in children_cpu_s.
+"""
+from __future__ import annotations
+
+import functools
+import json
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROFILES_DIR = Path(__file__).parent.parent.parent / "data" / "profiles"
+SLOWEST_BATCHES = 5
+
+
+def peak_rss_mb() -> float | None:
+    """Process peak resident set size in MB (ru_maxrss is KB on Linux, bytes on macOS)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def children_cpu_s() -> float:
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+@dataclass
+class StageProfile:
+    name: str
+    parent: str | None = None
+    calls: int = 0
+    wall_s: float = 0.0
+    child_wall_s: float = 0.0
+    cpu_s: float = 0.0
+    rows: int = 0
+    peak_rss_mb: float | None = None
+    rss_growth_mb: float = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.wall_s if self.wall_s > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "parent": self.parent,
+            "calls": self.calls,
+            "wall_s": round(self.wall_s, 4),
+            "self_wall_s": round(self.wall_s - self.child_wall_s, 4),
+            "cpu_s": round(self.cpu_s, 4),
+            "rows": self.rows,
+            "rows_per_sec": round(self.rows_per_sec, 1),
+            "peak_rss_mb": None if self.peak_rss_mb is None else round(self.peak_rss_mb, 1),
+            "rss_growth_mb": round(self.rss_growth_mb, 1),
+        }
+
+
+@dataclass
+class TableWrites:
+    rows: int = 0
+    written: int = 0
+    failed: int = 0
+    requests: int = 0
+    seconds: float = 0.0
+    batch_times: list[tuple[float, int]] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "written": self.written,
+            "failed": self.failed,
+            "requests": self.requests,
+            "seconds": round(self.seconds, 4),
+            "rows_per_sec": round(self.written / self.seconds, 1) if self.seconds > 0 else 0.0,
+            "slowest_batches": [{"seconds": round(t, 4), "rows": n}
+                                for t, n in sorted(self.batch_times, reverse=True)[:SLOWEST_BATCHES]],
+        }
+
+
+class ImportProfiler:
+    def __init__(self, name: str, meta: dict | None = None):
+        self.name = name
+        self.meta = meta or {}
+        self.stages: dict[str, StageProfile] = {}
+        self.writes: dict[str, TableWrites] = {}
+        self._stack: list[StageProfile] = []
+        self._started_at = datetime.now()
+        self._start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._children_cpu_start = children_cpu_s()
+        self.elapsed = 0.0
+        self.cpu_s = 0.0
+
+    @contextmanager
+    def stage(self, name: str):
+        parent = self._stack[-1] if self._stack else None
+        if parent is not None and parent.name == name:
+            # Re-entered from inside itself (a profiled function calling another): time and count once
+            yield _NullStage()
+            return
+        profile = self.stages.setdefault(name, StageProfile(name, parent.name if parent else None))
+        self._stack.append(profile)
+        rss_before = peak_rss_mb()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield profile
+        finally:
+            wall = time.perf_counter() - wall
+            profile.calls += 1
+            profile.wall_s += wall
+            profile.cpu_s += time.process_time() - cpu
+            profile.peak_rss_mb = peak_rss_mb()
+            if rss_before is not None:
+                profile.rss_growth_mb += profile.peak_rss_mb - rss_before
+            self._stack.pop()
+            if parent is not None:
+                parent.child_wall_s += wall
+
+    def record_writes(self, report):
+        """Add a writer.WriteReport (row counts, request count, batch times) to its table's totals."""
+        table = self.writes.setdefault(report.table, TableWrites())
+        table.rows += report.rows
+        table.written += report.written
+        table.failed += report.failed
+        table.requests += report.requests
+        table.seconds += report.elapsed
+        table.batch_times.extend(report.batch_times)
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self._start
+        self.cpu_s = time.process_time() - self._cpu_start
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "started_at": self._started_at.isoformat(timespec="seconds"),
+            **self.meta,
+            "wall_s": round(self.elapsed, 4),
+            "cpu_s": round(self.cpu_s, 4),
+            "children_cpu_s": round(children_cpu_s() - self._children_cpu_start, 4),
+            "peak_rss_mb": None if peak_rss_mb() is None else round(peak_rss_mb(), 1),
+            "stages": [s.as_dict() for s in self.stages.values()],
+            "writes": {table: w.as_dict() for table, w in self.writes.items()},
+        }
+
+    def write_json(self, path: Path | None = None) -> Path:
+        if path is None:
+            stem = "".join(c if c.isalnum() or c in "-_." else "_" for c in self.name)
+            path = PROFILES_DIR / f"{stem}-{self._started_at:%Y%m%d-%H%M%S}.json"
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.as_dict(), f, ensure_ascii=False, indent=2)
+        return path
+
+    def summary_lines(self) -> list[str]:
+        lines = [f"{'Etapa':<22} {'Llamadas':>8} {'Wall s':>9} {'Propio s':>9} {'CPU s':>9} "
+                 f"{'Filas':>11} {'Filas/s':>11} {'Pico RSS MB':>12}"]
+        for s in self.stages.values():
+            name = ("  " if s.parent else "") + s.name
+            rss = "-" if s.peak_rss_mb is None else f"{s.peak_rss_mb:,.0f}"
+            lines.append(f"{name:<22} {s.calls:>8} {s.wall_s:>9.2f} {s.wall_s - s.child_wall_s:>9.2f} "
+                         f"{s.cpu_s:>9.2f} {s.rows:>11,} {s.rows_per_sec:>11,.0f} {rss:>12}")
+        lines.append(f"{'Total':<22} {'':>8} {self.elapsed:>9.2f} {'':>9} {self.cpu_s:>9.2f}")
+        for table, w in self.writes.items():
+            slowest = ", ".join(f"{t * 1000:.0f} ms ({n} filas)" for t, n in sorted(w.batch_times, reverse=True)[:3])
+            lines.append(f"{table}: {w.written:,}/{w.rows:,} filas, {w.requests} requests; más lentos: {slowest}")
+        return lines
+
+
+# ---------------------------------------------------------------------------
+# Module-level hooks
+# ---------------------------------------------------------------------------
+
+_active: ImportProfiler | None = None
+
+
+class _NullStage:
+    rows = 0
+
+
+@contextmanager
+def stage(name: str):
+    """Time `name` on the active profiler; a no-op (yielding a dummy stage) when none is active."""
+    if _active is None:
+        yield _NullStage()
+        return
+    with _active.stage(name) as profile:
+        yield profile
+
+
+def record_writes(report):
+    if _active is not None:
+        _active.record_writes(report)
+
+
+def profiled(name: str):
+    """
+    Decorator: run the function inside stage(name). Rows counted are those
+    of a DataFrame first argument or, failing that, of a DataFrame result.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return fn(*args, **kwargs)
+            with _active.stage(name) as profile:
+                result = fn(*args, **kwargs)
+                if args and hasattr(args[0], "columns"):
+                    profile.rows += len(args[0])
+                elif hasattr(result, "columns"):
+                    profile.rows += len(result)
+                return result
+        return wrapper
+    return decorate
+
+
+def profiled_chunks(chunks, name: str = "read"):
+    """Yield from chunks, timing each fetch as stage(name) and counting its rows."""
+    chunks = iter(chunks)
+    while True:
+        with stage(name) as profile:
+            chunk = next(chunks, None)
+            if chunk is not None:
+                profile.rows += len(chunk)
+        if chunk is None:
+            return
+        yield chunk
+
+
+@contextmanager
+def profiling(name: str, path: Path | None = None, enabled: bool = True, **meta):
+    """
+    Activate an ImportProfiler for the block; on exit print its summary and
+    write the JSON report (to path, or data/profiles/<name>-<timestamp>.json).
+    With enabled=False the block just runs.
+    """
+    global _active
+    if not enabled:
+        yield None
+        return
+    profiler = ImportProfiler(name, meta)
+    previous, _active = _active, profiler
+    try:
+        yield profiler
+    finally:
+        _active = previous
+        profiler.finish()
+        print(f"\n{'='*70}")
+        print(f"  PERFIL: {name}")
+        print(f"{'='*70}")
+        for line in profiler.summary_lines():
+            print(f"  {line}")
+        print(f"\n  📊 Perfil guardado en {profiler.write_json(path)}")
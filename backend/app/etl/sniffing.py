@@ -0,0 +1,138 @@
+"""
+CSV format sniffing for TINSA exports.
+
+Picks encoding and separator from the first few KB of a file (BOM, UTF-8
+validity, header/row delimiter counts) instead of fully parsing the file
+once per encoding × separator guess. Decisions are cached per file
+fingerprint (size + hash of the sampled bytes) in data/csv_format_cache.json,
+so later runs on the same file skip sniffing entirely.
+
+sniff_csv_format() returns None when the sample is ambiguous; callers then
+fall back to their trial-and-error loop and remember the winner with
+remember_csv_format().
+"""
+from __future__ import annotations
+
+import codecs
+import csv
+import hashlib
+import io
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+SAMPLE_BYTES = 64 * 1024
+MIN_COLUMNS = 6
+CACHE_FILE = Path(__file__).parent.parent.parent / "data" / "csv_format_cache.json"
+
+
+@dataclass(frozen=True)
+class CsvFormat:
+    encoding: str
+    sep: str
+    source: str  # "sniff" or "cache"
+
+
+_memory_cache: dict[str, dict] = {}
+
+
+def _read_sample(file_path: Path) -> tuple[bytes, bool]:
+    """First SAMPLE_BYTES of the file and whether that is the whole file."""
+    with open(file_path, "rb") as f:
+        sample = f.read(SAMPLE_BYTES + 1)
+    return sample[:SAMPLE_BYTES], len(sample) <= SAMPLE_BYTES
+
+
+def file_fingerprint(file_path: Path, sample: bytes | None = None) -> str:
+    """Size + SHA-1 of the first SAMPLE_BYTES: cheap, and stable across copies."""
+    if sample is None:
+        sample, _ = _read_sample(file_path)
+    digest = hashlib.sha1(sample).hexdigest()
+    return f"{Path(file_path).stat().st_size}:{digest}"
+
+
+def _load_cache() -> dict:
+    if not _memory_cache and CACHE_FILE.exists():
+        try:
+            with open(CACHE_FILE, "r", encoding="utf-8") as f:
+                _memory_cache.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+    return _memory_cache
+
+
+def _save_cache():
+    # Worker processes (import_files_parallel) save concurrently: each writes
+    # its own temp file and renames it over the cache, so readers never see
+    # a half-written file.
+    tmp = CACHE_FILE.with_name(f"{CACHE_FILE.name}.{os.getpid()}.tmp")
+    try:
+        CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(_memory_cache, f, indent=2)
+        os.replace(tmp, CACHE_FILE)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+
+
+def remember_csv_format(file_path: Path, encoding: str, sep: str):
+    """Cache the (encoding, separator) that successfully parsed file_path."""
+    _load_cache()[file_fingerprint(file_path)] = {"encoding": encoding, "sep": sep}
+    _save_cache()
+
+
+def forget_csv_format(file_path: Path):
+    """Drop a cached decision (e.g. when it failed to parse the full file)."""
+    if _load_cache().pop(file_fingerprint(file_path), None) is not None:
+        _save_cache()
+
+
+def _sniff_encoding(sample: bytes, complete: bool) -> str:
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    try:
+        # final=False tolerates a multi-byte character cut by the sample end
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=complete)
+        return "utf-8"
+    except UnicodeDecodeError:
+        # latin-1, not cp1252: it is what the trial loop has always picked
+        # for non-UTF-8 files, so project names keep matching existing rows
+        return "latin-1"
+
+
+def _sniff_separator(text: str, complete: bool, separators) -> str | None:
+    candidates = []
+    for sep in separators:
+        try:
+            records = list(csv.reader(io.StringIO(text), delimiter=sep))
+        except csv.Error:
+            continue
+        if not complete:
+            records = records[:-1]  # last record may be cut by the sample end
+        if not records or len(records[0]) < MIN_COLUMNS:
+            continue
+        width = len(records[0])
+        # pandas rejects rows wider than the header
+        if all(len(r) <= width for r in records[1:]):
+            candidates.append(sep)
+    return candidates[0] if len(candidates) == 1 else None
+
+
+def sniff_csv_format(file_path: Path, separators=("\t", ",", ";")) -> CsvFormat | None:
+    """Guess (encoding, separator) from the cache or the file's first bytes."""
+    sample, complete = _read_sample(file_path)
+    fingerprint = file_fingerprint(file_path, sample)
+    cached = _load_cache().get(fingerprint)
+    if cached:
+        return CsvFormat(cached["encoding"], cached["sep"], "cache")
+
+    encoding = _sniff_encoding(sample, complete)
+    text = codecs.getincrementaldecoder(encoding)(errors="replace").decode(sample, final=complete)
+    sep = _sniff_separator(text, complete, separators)
+    if sep is None:
+        return None
+
+    _memory_cache[fingerprint] = {"encoding": encoding, "sep": sep}
+    _save_cache()
+    return CsvFormat(encoding, sep, "sniff")
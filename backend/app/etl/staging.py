@@ -0,0 +1,128 @@
+"""
+Columnar staging cache for parsed source files.
+
+After an importer parses a CSV it can stage the resulting DataFrame as an
+uncompressed Arrow IPC file under data/staging/, keyed by the SHA-1 of the
+source file's bytes plus a caller-supplied key (parser version, column map).
+The next run on the same file loads the staged file (memory-mapped, then
+converted to pandas in a single pass) instead of parsing the CSV again; any
+change to the file or to the key misses the cache. Writing a new staging
+replaces the stale one of the same source and key only, so importers with
+different keys (tinsa_importer, import_tinsa) keep their own files.
+
+pyarrow is optional: without it read_staged() always misses and
+write_staged() does nothing.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # staging disabled
+    pa = None
+
+STAGING_DIR = Path(__file__).parent.parent.parent / "data" / "staging"
+STAGING_VERSION = 2
+HASH_BLOCK_BYTES = 1024 * 1024
+NAN_COLUMNS_KEY = b"staging_nan_columns"
+
+_digests: dict[tuple, str] = {}
+
+
+def staging_available() -> bool:
+    return pa is not None
+
+
+def file_digest(file_path: Path) -> str:
+    """SHA-1 of the whole file, memoized per (path, size, mtime) within the process."""
+    stat = Path(file_path).stat()
+    memo_key = (str(Path(file_path).resolve()), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _digests:
+        digest = hashlib.sha1()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+                digest.update(block)
+        _digests[memo_key] = digest.hexdigest()
+    return _digests[memo_key]
+
+
+def _nan_columns(df: pd.DataFrame) -> list[str]:
+    """
+    Object columns whose missing values are NaN rather than None.
+
+    Arrow stores both as null and to_pandas() hands back None, but raw CSV
+    columns carry NaN and callers rely on it (str(NaN) is "nan").
+    """
+    columns = []
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        missing = df[col][df[col].isna()]
+        if any(v is not None for v in missing):
+            columns.append(str(col))
+    return columns
+
+
+def _key_id(key: str) -> str:
+    return hashlib.sha1(f"{STAGING_VERSION}|{key}".encode("utf-8")).hexdigest()[:8]
+
+
+def staged_path(file_path: Path, key: str) -> Path:
+    """data/staging/<source stem>.<key id>.<content digest>.arrow"""
+    digest = hashlib.sha1(f"{STAGING_VERSION}|{key}|{file_digest(file_path)}".encode("utf-8")).hexdigest()
+    return STAGING_DIR / f"{Path(file_path).stem}.{_key_id(key)}.{digest[:16]}.arrow"
+
+
+def read_staged(file_path: Path, key: str) -> pd.DataFrame | None:
+    """
+    The staged DataFrame for (file contents, key), or None. The file is
+    memory-mapped, so only to_pandas() copies the data.
+    """
+    if pa is None:
+        return None
+    path = staged_path(file_path, key)
+    if not path.exists():
+        return None
+    try:
+        with pa.memory_map(str(path), "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        df = table.to_pandas()
+    except (OSError, pa.ArrowException):
+        return None
+    metadata = table.schema.metadata or {}
+    for col in json.loads(metadata.get(NAN_COLUMNS_KEY, b"[]")):
+        if col in df.columns:
+            df[col] = df[col].where(df[col].notna(), np.nan)
+    return df
+
+
+def write_staged(file_path: Path, key: str, df: pd.DataFrame) -> Path | None:
+    """Stage df for (file contents, key), replacing older stagings of the same source and key."""
+    if pa is None:
+        return None
+    path = staged_path(file_path, key)
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        metadata = dict(table.schema.metadata or {})
+        metadata[NAN_COLUMNS_KEY] = json.dumps(_nan_columns(df)).encode("utf-8")
+        table = table.replace_schema_metadata(metadata)
+    except (pa.ArrowException, TypeError, ValueError) as e:
+        print(f"  Staging omitido ({e})")
+        return None
+    STAGING_DIR.mkdir(parents=True, exist_ok=True)
+    for old in STAGING_DIR.glob(f"{Path(file_path).stem}.{_key_id(key)}.*.arrow"):
+        if old != path:
+            old.unlink(missing_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with pa.OSFile(str(tmp), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    tmp.replace(path)
+    return path
@@ -0,0 +1,269 @@
+"""
+Synthetic TINSA exports for benchmarks and load tests (no real data needed).
+
+Rows look like the TINSA CSVs: one row per project + typology + period,
+Chilean number formats ('4.250,0'), Spanish headers, '-' for missing values
+and the coordinate defects the importers repair (lost decimal point,
+swapped lat/lon, zeros, blanks). Files are written chunk by chunk, so
+multi-million-row exports never sit in memory whole, in any of the
+encoding / separator combinations the importers sniff.
+
+Uso:
+    python -m app.etl.synthetic --rows 100000
+    python -m app.etl.synthetic --rows 2000000 --encoding latin-1 --sep ";"
+    python -m app.etl.synthetic --rows 500000 --files 4 --periods 8  # Un formato distinto por archivo
+"""
+from __future__ import annotations
+
+import math
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SYNTHETIC_DIR = Path(__file__).parent.parent.parent / "data" / "synthetic"
+CHUNK_ROWS = 250_000  # rows generated and written at a time
+
+COMMUNES = [
+    ("SANTIAGO", "RM", "CENTRO"), ("LAS CONDES", "RM", "ORIENTE"),
+    ("ÑUÑOA", "RM", "ORIENTE"), ("ANTOFAGASTA", "II", "NORTE"),
+    ("LA SERENA", "IV", "NORTE"), ("CONCEPCIÓN", "VIII", "SUR"),
+    ("TEMUCO", "IX", "SUR"), ("PUERTO MONTT", "X", "SUR"),
+]
+TYPOLOGIES = ["1D-1B", "2D-1B", "2D-2B", "3D-2B", "3D+3B", "ST", "4D-3B"]
+PERIODS = [(2023, "1P"), (2023, "2P"), (2024, "1P"), (2024, "2P")]
+TYPOLOGIES_PER_PROJECT = 3
+LOST_DECIMALS = 0.2  # share of projects whose coordinates lost the decimal point (-33456789)
+COORDINATE_DEFECTS = {"swapped": 0.03, "zero": 0.01, "missing": 0.02}  # share of the remaining projects
+
+# (encoding, separator) per file of a multi-file dataset, as found in real exports
+DATASET_FORMATS = [("utf-8", "\t"), ("latin-1", ";"), ("utf-8-sig", ","), ("cp1252", "\t")]
+SEPARATOR_NAMES = {"\t": "tab", ",": "comma", ";": "semicolon"}
+
+
+def format_chilean(values: np.ndarray, decimals: int = 1) -> list[str]:
+    """Format floats the way TINSA exports them: 4250.0 → '4.250,0'."""
+    return [
+        f"{v:,.{decimals}f}".replace(",", "_").replace(".", ",").replace("_", ".")
+        for v in values
+    ]
+
+
+def make_periods(count: int, last: tuple[int, int] = (2024, 2)) -> list[tuple[int, str]]:
+    """The `count` semesters ending at `last`, oldest first: make_periods(3) → 2023 2P, 2024 1P, 2024 2P."""
+    year, half = last
+    periods = []
+    for _ in range(count):
+        periods.append((year, f"{half}P"))
+        year, half = (year, 1) if half == 2 else (year - 1, 2)
+    return periods[::-1]
+
+
+def project_count(rows: int, periods: int = len(PERIODS), typologies: int = TYPOLOGIES_PER_PROJECT) -> int:
+    """Project ids make_synthetic_tinsa_frame allots for `rows` rows (a few may end up without rows)."""
+    n_combos = max(1, -(-int(rows / 0.9) // periods))
+    return -(-n_combos // typologies)
+
+
+def make_synthetic_tinsa_frame(rows: int, seed=0, periods: list[tuple[int, str]] | None = None,
+                               typologies: int = TYPOLOGIES_PER_PROJECT, first_project: int = 0,
+                               defects: bool = True) -> pd.DataFrame:
+    """
+    Build a TINSA-shaped frame (one row per project + typology + period).
+
+    Each project has `typologies` typologies reported over `periods`
+    (default PERIODS); ~10% of rows are dropped so not every project reaches
+    the latest period. Values repeat across periods like the real exports do
+    (stock, floors, surfaces). Project numbers start at first_project, so
+    frames generated separately can be concatenated. With defects, some
+    projects' coordinates are swapped, zero or missing, on top of the
+    LOST_DECIMALS share that is always there.
+    """
+    periods = periods or PERIODS
+    rng = np.random.default_rng(seed)
+    n_combos = max(1, -(-int(rows / 0.9) // len(periods)))
+    combo = np.repeat(np.arange(n_combos), len(periods))
+    period = np.tile(np.arange(len(periods)), n_combos)
+    keep = np.sort(rng.permutation(len(combo))[:rows])
+    combo, period = combo[keep], period[keep]
+    rows = len(combo)
+
+    project = combo // typologies
+    commune = project % len(COMMUNES)
+    n_projects = int(project.max()) + 1
+
+    # Per project/typology values, stable across periods
+    combo_stock = rng.integers(5, 120, n_combos).astype(float)
+    combo_price = np.round(rng.uniform(1500, 15000, n_combos), -1)
+    combo_surface = np.round(rng.uniform(25, 160, n_combos), 1)
+    combo_typology = rng.choice(TYPOLOGIES, n_combos)
+    project_floors = rng.integers(3, 35, n_projects).astype(float)
+    project_lat = -18 - rng.uniform(0, 35, n_projects)
+    project_lon = -70 - rng.uniform(0, 3, n_projects)
+
+    stock = combo_stock[combo]
+    sold = np.floor(stock * (period + 1) / (len(periods) + 1))
+    price = combo_price[combo] * (1 + 0.02 * period)
+    surface = combo_surface[combo]
+
+    lat_raw = np.array(format_chilean(project_lat, 4), dtype=object)
+    lon_raw = np.array(format_chilean(project_lon, 4), dtype=object)
+    broken = rng.uniform(0, 1, n_projects) < LOST_DECIMALS
+    lat_raw[broken] = [str(int(v * 1e6)) for v in project_lat[broken]]
+    lon_raw[broken] = [str(int(v * 1e6)) for v in project_lon[broken]]
+    if defects:
+        # Own generator, so the columns below do not depend on the defect mix
+        defect_rng = np.random.default_rng([*np.atleast_1d(seed), 1])
+        draw = defect_rng.uniform(0, 1, n_projects)
+        low = 0.0
+        for defect, share in COORDINATE_DEFECTS.items():
+            hit = ~broken & (draw >= low) & (draw < low + share)
+            low += share
+            if defect == "swapped":
+                lat_raw[hit], lon_raw[hit] = lon_raw[hit], lat_raw[hit]
+            elif defect == "zero":
+                lat_raw[hit], lon_raw[hit] = "0", "0"
+            else:
+                lat_raw[hit], lon_raw[hit] = "-", ""
+
+    def sometimes_missing(values: list, p: float = 0.1) -> list:
+        mask = rng.uniform(0, 1, len(values)) < p
+        return ["-" if m else v for v, m in zip(values, mask)]
+
+    project += first_project
+    return pd.DataFrame({
+        "AÑO": [str(periods[p][0]) for p in period],
+        "PERIODO": [periods[p][1] for p in period],
+        "PROYECTO": [f"EDIFICIO {p:06d}" for p in project],
+        "COMUNA_INCOIN": [COMMUNES[c][0] for c in commune],
+        "REGION": [COMMUNES[c][1] for c in commune],
+        "ZONA": [COMMUNES[c][2] for c in commune],
+        "DIRECCION": [f"AV. PRINCIPAL {p % 500}" for p in project],
+        "NUMERO": [str(100 + p % 900) for p in project],
+        "DESARROLLADOR": [f"INMOBILIARIA {p % 97}" for p in project],
+        "VENDE": [f"INMOBILIARIA {p % 97}" for p in project],
+        "CONSTRUYE": [f"CONSTRUCTORA {p % 53}" for p in project],
+        "TIPO DE PROPIEDAD": "DEPARTAMENTO",
+        "TIPO CATEGORIA": rng.choice(["PRIVADO", "DS19", "DS49"], rows),
+        "ESTADO PROYECTO": rng.choice(["EN VENTA", "AGOTADO", "NUEVO"], rows),
+        "ESTADO OBRA": rng.choice(["FAENAS", "OBRA GRUESA", "TERMINACIONES", "ENTREGADO"], rows),
+        "LATITUD": lat_raw[project - first_project],
+        "LONGITUD": lon_raw[project - first_project],
+        "INICIO VENTAS": rng.choice(["01-07-2015", "diciembre-2017", "marzo-2024", "-"], rows),
+        "FECHA ENTREGA ESTIMADA": rng.choice(["15/03/2026", "2025-12-01", "junio-2027", "-"], rows),
+        "STOCK INICIAL": format_chilean(stock, 0),
+        "OFERTA DISPONIBLE": format_chilean(stock - sold, 0),
+        "UNIDADES VENDIDAS": sometimes_missing(format_chilean(sold, 0)),
+        "OFERTA DEL PERIODO": sometimes_missing(format_chilean(rng.integers(0, 40, rows), 0)),
+        "UNIDADES/MES (A)": sometimes_missing(format_chilean(np.round(rng.uniform(0, 12, rows), 1))),
+        "UNIDADES/MES (P)": sometimes_missing(format_chilean(np.round(rng.uniform(0, 12, rows), 1))),
+        "MESES PARA AGOTAR STOCK (A)": sometimes_missing(format_chilean(rng.uniform(1, 60, rows))),
+        "MESES EN VENTA": format_chilean(rng.integers(1, 80, rows), 0),
+        "PRECIO MINIMO UF": format_chilean(price * 0.8),
+        "PRECIO MAXIMO UF": format_chilean(price * 1.2),
+        "PRECIO PROMEDIO": format_chilean(price),
+        "UF/M² PROMEDIO": format_chilean(price / surface),
+        "NRO. PISOS": format_chilean(project_floors[project - first_project], 0),
+        "CANT ESTACIONAMIENTOS": sometimes_missing(format_chilean(rng.integers(0, 300, rows), 0)),
+        "PRECIO ESTACIONAMIENTO": sometimes_missing(format_chilean(np.round(rng.uniform(150, 600, rows), -1))),
+        "PRECIO BODEGA": sometimes_missing(format_chilean(np.round(rng.uniform(40, 150, rows), -1))),
+        "PILOTO DISPONIBLE": rng.choice(["SI", "NO", "-"], rows),
+        "SALA DE VENTAS EN EL PROYECTO": rng.choice(["SI", "NO", "-"], rows),
+        "DESCUENTO PROMEDIO": rng.choice(["0%", "5%", "2,5%", "-"], rows),
+        "TIPO DE SUBSIDIO": rng.choice(["-", "DS19", "DS1"], rows),
+        "TIPOLOGIA": combo_typology[combo],
+        "NOMBRE TIPOLOGIA": rng.choice(["A1", "B2", "C3", "-"], rows),
+        "TIPO DE COCINA": rng.choice(["CERRADA", "AMERICANA", "-"], rows),
+        "SUPERFICIE PROMEDIO": format_chilean(surface, 2),
+        "SUP TERRAZA PROMEDIO": sometimes_missing(format_chilean(surface * 0.12, 2)),
+        "SUPERFICIE TERRENO": sometimes_missing(format_chilean(np.round(rng.uniform(500, 5000, rows), -1)), 0.5),
+        "PLAZAS": sometimes_missing(format_chilean(rng.integers(0, 3, rows), 0)),
+    })
+
+
+def iter_synthetic_tinsa_frames(rows: int, seed: int = 0, chunk_rows: int = CHUNK_ROWS, first_project: int = 0,
+                                **options):
+    """
+    make_synthetic_tinsa_frame in chunks of up to chunk_rows rows, each with
+    its own projects; the first chunk is exactly make_synthetic_tinsa_frame(..., seed).
+    """
+    periods = options.get("periods") or PERIODS
+    typologies = options.get("typologies", TYPOLOGIES_PER_PROJECT)
+    for i, start in enumerate(range(0, rows, chunk_rows)):
+        n = min(chunk_rows, rows - start)
+        yield make_synthetic_tinsa_frame(n, seed if i == 0 else [seed, i], first_project=first_project, **options)
+        first_project += project_count(n, len(periods), typologies)
+
+
+def write_synthetic_tinsa_csv(path: Path, rows: int, seed: int = 0, encoding: str = "utf-8", sep: str = "\t",
+                              chunk_rows: int = CHUNK_ROWS, **options) -> Path:
+    """Write a synthetic TINSA CSV chunk by chunk (header once; a utf-8-sig BOM once)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding=encoding, newline="") as f:
+        for i, frame in enumerate(iter_synthetic_tinsa_frames(rows, seed, chunk_rows, **options)):
+            frame.to_csv(f, sep=sep, index=False, header=i == 0)
+    return path
+
+
+def write_synthetic_dataset(out_dir: Path, rows: int, files: int = len(DATASET_FORMATS), seed: int = 0,
+                            chunk_rows: int = CHUNK_ROWS, **options) -> list[Path]:
+    """
+    Split `rows` over `files` CSVs, one DATASET_FORMATS (encoding, separator)
+    each in turn, with disjoint projects, like the regional TINSA exports.
+    """
+    periods = options.get("periods") or PERIODS
+    typologies = options.get("typologies", TYPOLOGIES_PER_PROJECT)
+    paths = []
+    first_project = 0
+    per_file = math.ceil(rows / files)
+    for i in range(files):
+        n = min(per_file, rows - i * per_file)
+        if n <= 0:
+            break
+        encoding, sep = DATASET_FORMATS[i % len(DATASET_FORMATS)]
+        path = Path(out_dir) / f"tinsa_synthetic_{i + 1}_{encoding}_{SEPARATOR_NAMES[sep]}.csv"
+        paths.append(write_synthetic_tinsa_csv(path, n, seed + i, encoding, sep, chunk_rows,
+                                               first_project=first_project, **options))
+        first_project += sum(project_count(min(chunk_rows, n - s), len(periods), typologies)
+                             for s in range(0, n, chunk_rows))
+    return paths
+
+
+def main():
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Generar CSVs sintéticos con formato TINSA")
+    parser.add_argument("--rows", type=int, default=100_000, help="Filas totales")
+    parser.add_argument("--out", type=str, default=None,
+                        help="Archivo de salida (o carpeta con --files); por defecto data/synthetic/")
+    parser.add_argument("--files", type=int, default=1, help="Repartir en N archivos, cada uno con otro formato")
+    parser.add_argument("--encoding", default="utf-8", help="Encoding (con un solo archivo)")
+    parser.add_argument("--sep", default="\t", help="Separador (con un solo archivo)")
+    parser.add_argument("--periods", type=int, default=len(PERIODS), help="Semestres reportados (terminando en 2024-2P)")
+    parser.add_argument("--typologies", type=int, default=TYPOLOGIES_PER_PROJECT, help="Tipologías por proyecto")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--clean-coordinates", action="store_true",
+                        help="Sin coordenadas invertidas, en cero o vacías (sí con decimales perdidos)")
+    args = parser.parse_args()
+
+    options = {"periods": make_periods(args.periods), "typologies": args.typologies,
+               "defects": not args.clean_coordinates}
+    start = time.perf_counter()
+    if args.files > 1:
+        paths = write_synthetic_dataset(Path(args.out) if args.out else SYNTHETIC_DIR, args.rows, args.files,
+                                        args.seed, **options)
+    else:
+        sep_name = SEPARATOR_NAMES.get(args.sep, "sep")
+        default = SYNTHETIC_DIR / f"tinsa_synthetic_{args.rows}_{args.encoding}_{sep_name}.csv"
+        paths = [write_synthetic_tinsa_csv(Path(args.out) if args.out else default, args.rows, args.seed,
+                                           args.encoding, args.sep, **options)]
+    elapsed = time.perf_counter() - start
+    for path in paths:
+        print(f"✅ {path} ({path.stat().st_size / 1024 / 1024:.1f} MB)")
+    print(f"   {args.rows:,} filas en {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
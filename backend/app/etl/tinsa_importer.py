@@ -10,20 +10,23 @@ This script:
   2. Groups rows by project (PROYECTO + COMUNA_INCOIN) for the latest period
   3. Inserts/updates projects table (one row per project)
   4. Inserts typology-level data into project_typologies
-  5. Stores historical snapshots in project_metrics_history
+  5. Stores one snapshot per project and period (AÑO, PERIODO) in project_metrics_history
 
 Usage:
     python -m app.etl.tinsa_importer --preview            # See columns and sample data
     python -m app.etl.tinsa_importer --file data/tinsa_norte_sur.csv  # Dry-run
     python -m app.etl.tinsa_importer --file data/tinsa_norte_sur.csv --migrate  # Real import
+    python -m app.etl.tinsa_importer --file data/tinsa_norte_sur.csv --stream --migrate  # Chunked, bounded memory
+    python -m app.etl.tinsa_importer --file data/tinsa_norte_sur.csv --migrate --delta  # Only changed rows
+    python -m app.etl.tinsa_importer --all --migrate --postgres  # COPY straight into Postgres (SUPABASE_DB_URL)
+    python -m app.etl.tinsa_importer --file data/tinsa_norte_sur.csv --profile  # Per-stage timing → data/profiles/
 """
 from __future__ import annotations
 
 import os
 import sys
-import re
+import time
 from pathlib import Path
-from datetime import datetime
 from dotenv import load_dotenv
 import pandas as pd
 import numpy as np
@@ -31,166 +34,164 @@ import numpy as np
 # Load environment variables
 load_dotenv(Path(__file__).parent.parent.parent / ".env")
 
-from supabase import create_client, Client
+from supabase import Client
+
+from app.etl.parsing import (
+    clean_text_series,
+    parse_chilean_number,
+    parse_chilean_number_series,
+    parse_columns,
+)
+from app.etl.coordinates import format_repair_summary, normalize_coordinates
+from app.etl.staging import read_staged, write_staged
+from app.etl.sniffing import forget_csv_format, remember_csv_format, sniff_csv_format
+from app.etl.delta import load_manifest, manifest_scope, plan_delta, project_key, save_manifest, updated_state
+from app.etl.pipeline import get_supabase_client
+from app.etl.profiling import profiled, profiled_chunks, profiling, stage
+from app.etl.typologies import indoor_surface, typology_rooms
+from app.etl.postgres import PostgresClient, get_postgres_client, make_writer
+from app.etl.writer import WriteReport
 
 # Configuration
 BATCH_SIZE = 50
+UPLOAD_CONCURRENCY = 4
+STREAM_CHUNK_ROWS = 50_000
+SNAPSHOT_BATCH_SIZE = 500
+# project_metrics_history.recorded_at for each semester: 1P → enero, 2P → julio
+SNAPSHOT_PERIOD_MONTHS = {1: 1, 2: 7}
+CSV_ENCODINGS = ["utf-8", "latin-1", "iso-8859-1", "cp1252"]
+CSV_SEPARATORS = ["\t", ",", ";"]
 DEFAULT_FILES = [
     Path(__file__).parent.parent.parent / "data" / "tinsa_norte_sur.csv",
     Path(__file__).parent.parent.parent / "data" / "tinsa_rm.csv",
 ]
 
-
-def get_supabase_client() -> Client:
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_KEY")
-    if not url or not key:
-        raise ValueError("SUPABASE_URL y SUPABASE_KEY deben estar en backend/.env")
-    return create_client(url, key)
-
-
-# ---------------------------------------------------------------------------
-# Number parsing helpers (Chilean locale: dot=thousands, comma=decimal)
-# ---------------------------------------------------------------------------
-
-def parse_chilean_number(value) -> float | None:
-    """Parse a number in Chilean format: 4.250,0 → 4250.0"""
-    if value is None or (isinstance(value, float) and np.isnan(value)):
-        return None
-    s = str(value).strip()
-    if s in ("-", "", "nan", "None", "NaN"):
-        return None
-    # Remove dots (thousands), replace comma with period (decimal)
-    s = s.replace(".", "").replace(",", ".")
-    try:
-        return float(s)
-    except ValueError:
-        return None
-
-
-def parse_chilean_int(value) -> int | None:
-    n = parse_chilean_number(value)
-    if n is None:
-        return None
-    return int(round(n))
-
-
-def parse_percentage(value) -> float | None:
-    """Parse '5%' or '0%' → 5.0 or 0.0"""
-    if value is None or (isinstance(value, float) and np.isnan(value)):
-        return None
-    s = str(value).strip().replace("%", "").replace(",", ".")
-    if s in ("-", "", "nan"):
-        return None
-    try:
-        return float(s)
-    except ValueError:
-        return None
-
-
-def parse_boolean(value) -> bool | None:
-    """Parse 'SI'/'NO'/'-' → True/False/None"""
-    if value is None or (isinstance(value, float) and np.isnan(value)):
-        return None
-    s = str(value).strip().upper()
-    if s == "SI":
-        return True
-    if s == "NO":
-        return False
-    return None
-
-
-def parse_date(value) -> str | None:
-    """Try to parse various date formats from TINSA."""
-    if value is None or (isinstance(value, float) and np.isnan(value)):
-        return None
-    s = str(value).strip()
-    if s in ("-", "", "nan"):
-        return None
-
-    # Try "01-07-2015" format
-    for fmt in ("%d-%m-%Y", "%d/%m/%Y", "%Y-%m-%d"):
-        try:
-            return datetime.strptime(s, fmt).date().isoformat()
-        except ValueError:
-            continue
-
-    # Try "diciembre-2017", "marzo-2024" etc.
-    months_es = {
-        "enero": 1, "febrero": 2, "marzo": 3, "abril": 4,
-        "mayo": 5, "junio": 6, "julio": 7, "agosto": 8,
-        "septiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12,
-    }
-    s_lower = s.lower()
-    for month_name, month_num in months_es.items():
-        if month_name in s_lower:
-            year_match = re.search(r"(\d{4})", s)
-            if year_match:
-                year = int(year_match.group(1))
-                return f"{year}-{month_num:02d}-01"
-
-    return None
+# Typed columns consumed by transform_projects: field → (source columns, kind).
+# Source columns are listed in lookup priority; the first one present in the
+# CSV wins. Kinds are the vectorized parsers in app.etl.parsing.
+TINSA_COLUMN_TYPES = {
+    # Project-level text
+    "region": (("REGION",), "text"),
+    "zona": (("ZONA",), "text"),
+    "address": (("DIRECCION",), "text"),
+    "street_number": (("NUMERO",), "text"),
+    "developer": (("DESARROLLADOR",), "text"),
+    "seller": (("VENDE",), "text"),
+    "builder": (("CONSTRUYE",), "text"),
+    "property_type": (("TIPO DE PROPIEDAD",), "text"),
+    "category": (("TIPO CATEGORIA",), "text"),
+    "project_status": (("ESTADO PROYECTO (PERIODO)", "ESTADO PROYECTO"), "text"),
+    "construction_status": (("ESTADO OBRA (PERIODO)", "ESTADO OBRA"), "text"),
+    "subsidy_type": (("TIPO DE SUBSIDIO",), "text"),
+    # Dates
+    "sales_start_date": (("INICIO VENTAS",), "date"),
+    "delivery_date": (("FECHA ENTREGA ESTIMADA",), "date"),
+    # Units (summed across typologies)
+    "stock_initial": (("STOCK INICIAL", "STOCK INICIAL (PERIODO)"), "int"),
+    "available": (("OFERTA DISPONIBLE (PERIODO)", "OFERTA DISPONIBLE"), "int"),
+    "sold": (("UNIDADES VENDIDAS (PERIODO)", "UNIDADES VENDIDAS"), "int"),
+    "period_offer": (("OFERTA DEL PERIODO",), "int"),
+    # Velocity
+    "velocity_a": (("UNIDADES/MES (AÑO)", "UNIDADES/MES (A)"), "number"),
+    "velocity_p": (("UNIDADES/MES (PERIODO)", "UNIDADES/MES (P)"), "number"),
+    "months_to_sell_out": (("MESES PARA AGOTAR STOCK (PERIODO)", "MESES PARA AGOTAR STOCK (A)"), "number"),
+    "months_on_sale": (("MESES EN VENTA (PERIODO)", "MESES EN VENTA"), "number"),
+    # Prices
+    "min_price": (("PRECIO MINIMO UF",), "number"),
+    "max_price": (("PRECIO MAXIMO UF",), "number"),
+    "avg_price": (("PRECIO PROMEDIO",), "number"),
+    "uf_m2": (("UF/M² PROMEDIO",), "number"),
+    # Building & extras
+    "total_floors": (("NRO. PISOS",), "int"),
+    "parking_count": (("CANT ESTACIONAMIENTOS",), "int"),
+    "parking_price": (("PRECIO ESTACIONAMIENTO",), "number"),
+    "storage_price": (("PRECIO BODEGA",), "number"),
+    "pilot_available": (("PILOTO DISPONIBLE",), "bool"),
+    "sales_room": (("SALA DE VENTAS EN EL PROYECTO",), "bool"),
+    "discount_percentage": (("DESCUENTO PROMEDIO",), "percent"),
+    # Typology-level
+    "kitchen_type": (("TIPO DE COCINA",), "text"),
+    "surface": (("SUPERFICIE PROMEDIO",), "number"),
+    "terrace": (("SUP TERRAZA PROMEDIO",), "number"),
+    "land_surface": (("SUPERFICIE TERRENO",), "number"),
+    "parking_spots": (("PLAZAS",), "int"),
+    "typology_stock": (("OFERTA DISPONIBLE (PERIODO)", "OFERTA DISPONIBLE"), "int"),
+    "typology_total_units": (("STOCK INICIAL (PERIODO)", "STOCK INICIAL"), "int"),
+}
 
 
 def fix_coordinates(lat_raw, lon_raw) -> tuple[float | None, float | None]:
     """
-    Fix TINSA coordinate issues.
-    TINSA data often has:
-    - Swapped lat/lon columns
-    - Chilean decimal format (comma)
-    - Missing decimal points
+    Fix one TINSA coordinate pair (Chilean number format, lost decimal
+    point, swapped lat/lon). See app.etl.coordinates for the repair rules;
+    transform_typed repairs whole columns at once with normalize_coordinates.
     """
     lat = parse_chilean_number(lat_raw)
     lon = parse_chilean_number(lon_raw)
-
-    if lat is None or lon is None:
+    fixed_lat, fixed_lon, _ = normalize_coordinates(
+        [np.nan if lat is None else lat], [np.nan if lon is None else lon]
+    )
+    if np.isnan(fixed_lat[0]):
         return None, None
+    return float(fixed_lat[0]), float(fixed_lon[0])
 
-    # TINSA sometimes stores coordinates without proper decimal placement
-    # For Chile: lat should be roughly -17 to -56, lon should be roughly -66 to -76
 
-    # If values are way out of range, try dividing to find decimal position
-    for divisor in (1, 10, 100, 1000, 10000, 100000):
-        test_lat = lat / divisor
-        test_lon = lon / divisor
-        if -60 <= test_lat <= -15 and -80 <= test_lon <= -60:
-            return round(test_lat, 6), round(test_lon, 6)
+# ---------------------------------------------------------------------------
+# CSV reading
+# ---------------------------------------------------------------------------
 
-    # Maybe they're swapped
-    for divisor in (1, 10, 100, 1000, 10000, 100000):
-        test_lat = lon / divisor  # swap
-        test_lon = lat / divisor  # swap
-        if -60 <= test_lat <= -15 and -80 <= test_lon <= -60:
-            return round(test_lat, 6), round(test_lon, 6)
+def _read_csv(file_path: Path, enc: str, sep: str, **kwargs) -> pd.DataFrame:
+    return pd.read_csv(
+        file_path,
+        encoding=enc,
+        sep=sep,
+        dtype=str,  # Read everything as string first
+        na_values=["-", "nan", "NaN", ""],
+        keep_default_na=True,
+        **kwargs,
+    )
 
-    # Can't fix, return None
-    return None, None
 
+def _format_label(enc: str, sep: str) -> str:
+    return f"encoding={enc}, sep={'TAB' if sep == chr(9) else sep}"
 
-# ---------------------------------------------------------------------------
-# CSV reading
-# ---------------------------------------------------------------------------
 
+@profiled("read")
 def read_tinsa_csv(file_path: Path, nrows: int | None = None) -> pd.DataFrame:
-    """Read a TINSA CSV with proper encoding detection."""
-    encodings = ["utf-8", "latin-1", "iso-8859-1", "cp1252"]
-    separators = ["\t", ",", ";"]
+    """
+    Read a TINSA CSV with proper encoding detection.
 
-    for enc in encodings:
-        for sep in separators:
+    Encoding and separator are sniffed from the first KB of the file (or
+    taken from the format cache); the encoding × separator trial loop only
+    runs when sniffing is ambiguous or the sniffed format fails to parse.
+    """
+    start = time.perf_counter()
+    with stage("sniff"):
+        fmt = sniff_csv_format(file_path, CSV_SEPARATORS)
+    sniff_ms = (time.perf_counter() - start) * 1000
+    if fmt:
+        try:
+            df = _read_csv(file_path, fmt.encoding, fmt.sep, nrows=nrows)
+            if len(df.columns) > 5:
+                print(f"  CSV leido: {_format_label(fmt.encoding, fmt.sep)} (sniffing {sniff_ms:.1f} ms, {fmt.source})")
+                return df
+        except (UnicodeDecodeError, pd.errors.ParserError):
+            pass
+        forget_csv_format(file_path)
+        print(f"  Formato detectado ({_format_label(fmt.encoding, fmt.sep)}) no sirvió para el archivo completo")
+    else:
+        print(f"  Sniffing no concluyente ({sniff_ms:.1f} ms)")
+    print("  Probando combinaciones de encoding/separador...")
+
+    for enc in CSV_ENCODINGS:
+        for sep in CSV_SEPARATORS:
             try:
-                df = pd.read_csv(
-                    file_path,
-                    encoding=enc,
-                    sep=sep,
-                    nrows=nrows,
-                    dtype=str,  # Read everything as string first
-                    na_values=["-", "nan", "NaN", ""],
-                    keep_default_na=True,
-                )
+                df = _read_csv(file_path, enc, sep, nrows=nrows)
                 # Valid if we have more than 5 columns (not all in one column)
                 if len(df.columns) > 5:
-                    print(f"  CSV leido: encoding={enc}, sep={'TAB' if sep == chr(9) else sep}")
+                    print(f"  CSV leido: {_format_label(enc, sep)}")
+                    if nrows is None:
+                        remember_csv_format(file_path, enc, sep)
                     return df
             except (UnicodeDecodeError, pd.errors.ParserError):
                 continue
@@ -198,6 +199,82 @@ def read_tinsa_csv(file_path: Path, nrows: int | None = None) -> pd.DataFrame:
     raise ValueError(f"No se pudo leer {file_path} con ninguna combinación de encoding/separador")
 
 
+def _csv_formats(file_path: Path, sample_rows: int = 1000):
+    """
+    (encoding, separator) candidates that parse the first sample_rows rows of
+    a TINSA CSV: the sniffed (or cached) format first, then the same
+    encoding × separator trial loop as read_tinsa_csv.
+    """
+    start = time.perf_counter()
+    with stage("sniff"):
+        fmt = sniff_csv_format(file_path, CSV_SEPARATORS)
+    sniff_ms = (time.perf_counter() - start) * 1000
+    if fmt:
+        print(f"  Formato detectado en {sniff_ms:.1f} ms ({fmt.source})")
+    else:
+        print(f"  Sniffing no concluyente ({sniff_ms:.1f} ms)")
+
+    candidates = [(enc, sep) for enc in CSV_ENCODINGS for sep in CSV_SEPARATORS]
+    if fmt:
+        candidates.insert(0, (fmt.encoding, fmt.sep))
+    tried = set()
+    for enc, sep in candidates:
+        if (enc, sep) in tried:
+            continue
+        tried.add((enc, sep))
+        try:
+            if len(_read_csv(file_path, enc, sep, nrows=sample_rows).columns) > 5:
+                yield enc, sep
+                continue
+        except (UnicodeDecodeError, pd.errors.ParserError):
+            pass
+        if fmt and (enc, sep) == (fmt.encoding, fmt.sep):
+            forget_csv_format(file_path)
+
+
+def detect_csv_format(file_path: Path, sample_rows: int = 1000) -> tuple[str, str]:
+    """Find the (encoding, separator) of a TINSA CSV without reading all of it."""
+    for enc, sep in _csv_formats(file_path, sample_rows):
+        return enc, sep
+    raise ValueError(f"No se pudo leer {file_path} con ninguna combinación de encoding/separador")
+
+
+def iter_tinsa_csv(file_path: Path, chunk_rows: int = STREAM_CHUNK_ROWS, usecols=None):
+    """
+    Read a TINSA CSV in chunks of chunk_rows rows (same parsing options as
+    read_tinsa_csv). The row index keeps counting across chunks.
+
+    Falls back like read_tinsa_csv: when the detected format fails to parse
+    a chunk, the next encoding that parses the sample takes over from the
+    first row not yet yielded (the separator stays once rows have been
+    yielded), and the format that reads the whole file is remembered.
+    """
+    rows, failed = 0, None
+    for enc, sep in _csv_formats(file_path):
+        if rows and sep != failed[1]:
+            continue
+        print(f"  CSV en streaming: {_format_label(enc, sep)}, chunks de {chunk_rows:,} filas")
+        skip, offset = rows, rows
+        try:
+            chunks = _read_csv(file_path, enc, sep, chunksize=chunk_rows, usecols=usecols,
+                               skiprows=(lambda i: 0 < i <= skip) if skip else None)
+            for chunk in chunks:
+                if offset:
+                    chunk.index += offset
+                rows += len(chunk)
+                yield chunk
+        except (UnicodeDecodeError, pd.errors.ParserError):
+            forget_csv_format(file_path)
+            failed = (enc, sep)
+            print(f"  {_format_label(enc, sep)} falló tras {rows:,} filas; probando el siguiente formato")
+            continue
+        if failed:
+            remember_csv_format(file_path, enc, sep)
+        return
+
+    raise ValueError(f"No se pudo leer {file_path} con ninguna combinación de encoding/separador")
+
+
 def preview_csv(file_path: Path):
     """Show CSV structure and sample data."""
     print(f"\n{'='*70}")
@@ -208,265 +285,454 @@ def preview_csv(file_path: Path):
         print(f"  Archivo no encontrado: {file_path}")
         return
 
-    # Read sample
-    df = read_tinsa_csv(file_path, nrows=5)
+    # Read sample (from the staged typed frame when there is one)
+    staged = read_staged(file_path, TINSA_STAGING_KEY)
+    if staged is not None:
+        print("  Usando staging (sin parsear CSV)")
+        df = staged[raw_columns(staged)].head(5)
+    else:
+        df = read_tinsa_csv(file_path, nrows=5)
 
     print(f"\n  Columnas ({len(df.columns)}):")
     for i, col in enumerate(df.columns, 1):
         sample = df[col].dropna().iloc[0] if not df[col].dropna().empty else "(vacío)"
         print(f"    {i:2d}. {col:<40s} → {str(sample)[:50]}")
 
-    # Count total rows
-    df_count = read_tinsa_csv(file_path)
-    total = len(df_count)
-    projects = df_count["PROYECTO"].nunique() if "PROYECTO" in df_count.columns else "?"
-    communes = df_count["COMUNA_INCOIN"].nunique() if "COMUNA_INCOIN" in df_count.columns else "?"
-    periods = df_count["PERIODO"].unique().tolist() if "PERIODO" in df_count.columns else []
+    # Count rows, projects, communes and periods in one streaming pass
+    count_cols = {"PROYECTO", "COMUNA_INCOIN", "PERIODO", "LATITUD", "LONGITUD"}
+    total = 0
+    projects, communes, periods = set(), set(), {}
+    sample_coords = []
+    if staged is not None:
+        chunks = [staged[[c for c in raw_columns(staged) if c in count_cols]]]
+    else:
+        chunks = iter_tinsa_csv(file_path, usecols=lambda c: c in count_cols)
+    for chunk in chunks:
+        total += len(chunk)
+        if "PROYECTO" in chunk.columns:
+            projects.update(chunk["PROYECTO"].dropna().unique())
+        if "COMUNA_INCOIN" in chunk.columns:
+            communes.update(chunk["COMUNA_INCOIN"].dropna().unique())
+        if "PERIODO" in chunk.columns:
+            periods.update(dict.fromkeys(chunk["PERIODO"].dropna().unique()))
+        if "LATITUD" in chunk.columns and "LONGITUD" in chunk.columns and len(sample_coords) < 3:
+            coords = chunk[["LATITUD", "LONGITUD"]].dropna().head(3 - len(sample_coords))
+            sample_coords.extend(coords.itertuples(index=False, name=None))
 
     print(f"\n  Total filas:       {total:,}")
-    print(f"  Proyectos unicos:  {projects}")
-    print(f"  Comunas:           {communes}")
-    print(f"  Periodos:          {periods}")
+    print(f"  Proyectos unicos:  {len(projects) if 'PROYECTO' in df.columns else '?'}")
+    print(f"  Comunas:           {len(communes) if 'COMUNA_INCOIN' in df.columns else '?'}")
+    print(f"  Periodos:          {list(periods)}")
 
     # Coordinate sample
-    if "LATITUD" in df_count.columns and "LONGITUD" in df_count.columns:
-        sample_coords = df_count[["LATITUD", "LONGITUD"]].dropna().head(3)
+    if sample_coords:
         print(f"\n  Muestra coordenadas (raw):")
-        for _, row in sample_coords.iterrows():
-            lat, lon = fix_coordinates(row["LATITUD"], row["LONGITUD"])
-            print(f"    RAW: lat={row['LATITUD']}, lon={row['LONGITUD']}  →  FIXED: lat={lat}, lon={lon}")
+        for lat_raw, lon_raw in sample_coords:
+            lat, lon = fix_coordinates(lat_raw, lon_raw)
+            print(f"    RAW: lat={lat_raw}, lon={lon_raw}  →  FIXED: lat={lat}, lon={lon}")
 
 
 # ---------------------------------------------------------------------------
 # Data transformation
 # ---------------------------------------------------------------------------
 
-def transform_projects(df: pd.DataFrame) -> tuple[list[dict], list[dict]]:
+@profiled("parse")
+def add_typed_columns(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Transform TINSA rows into projects and typologies.
+    Append the parsed TINSA_COLUMN_TYPES fields (prefixed "_") plus the
+    _year / _period_sort keys used to find each project's latest period.
+    """
+    typed = parse_columns(df, TINSA_COLUMN_TYPES).add_prefix("_")
+    return _add_period_keys(pd.concat([df, typed], axis=1))
 
-    Since each CSV row = one typology in one period for one project,
-    we group by (PROYECTO, COMUNA_INCOIN) and take the latest period.
 
-    Returns: (projects_list, typologies_list)
+# Staged typed frames are only valid for the column map they were parsed with
+TINSA_STAGING_KEY = "tinsa_importer|" + repr(sorted(TINSA_COLUMN_TYPES.items()))
+
+
+def load_typed_frame(file_path: Path, use_cache: bool = True) -> pd.DataFrame:
     """
-    # Determine the latest period per project
-    # Sort so latest data wins: higher year + later period (2P > 1P)
+    read_tinsa_csv + add_typed_columns, staged in data/staging/ (see
+    app.etl.staging) so later runs on the same file skip CSV parsing.
+    """
+    if use_cache:
+        start = time.perf_counter()
+        with stage("read") as profile:
+            staged = read_staged(file_path, TINSA_STAGING_KEY)
+            profile.rows += 0 if staged is None else len(staged)
+        if staged is not None:
+            print(f"  Staging: {len(staged):,} filas tipadas leídas en {(time.perf_counter() - start) * 1000:.0f} ms (sin parsear CSV)")
+            return staged
+
+    typed = add_typed_columns(read_tinsa_csv(file_path))
+    if use_cache and write_staged(file_path, TINSA_STAGING_KEY, typed):
+        print(f"  Staging guardado para próximas ejecuciones")
+    return typed
+
+
+def raw_columns(df: pd.DataFrame) -> list[str]:
+    """The CSV's own columns of a typed frame (typed fields are prefixed '_')."""
+    return [c for c in df.columns if not c.startswith("_")]
+
+
+def _add_period_keys(df: pd.DataFrame) -> pd.DataFrame:
+    """_year / _period_sort sort keys from AÑO and PERIODO ('2P' → 2)."""
     df["_year"] = pd.to_numeric(df["AÑO"], errors="coerce").fillna(0).astype(int)
     df["_period_sort"] = df["PERIODO"].map(lambda x: int(str(x)[0]) if str(x) and str(x).strip() and str(x).strip()[0].isdigit() else 0)
+    return df
+
+
+def _segment_starts(groups: np.ndarray) -> np.ndarray:
+    """Start offsets of each run of equal ids in a sorted group-id array."""
+    return np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+
+
+def _positive_mean(values: pd.Series, starts: np.ndarray) -> np.ndarray:
+    """
+    Mean of the positive values of each segment (NaN if there are none).
+
+    np.add.reduceat adds left to right like sum() over a Python list, so the
+    result is bit-for-bit sum(positives) / len(positives).
+    """
+    v = values.to_numpy(dtype="float64", na_value=np.nan)
+    positive = v > 0
+    sums = np.add.reduceat(np.where(positive, v, 0.0), starts)
+    counts = np.add.reduceat(positive.astype("int64"), starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def _round2(values) -> list:
+    """Python round(v, 2) per value (np.round rounds differently), NaN → None."""
+    return [None if v != v else round(float(v), 2) for v in values]
+
+
+def select_latest_rows(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame, int]:
+    """
+    Pick the latest (AÑO, PERIODO) rows of every project.
+
+    Expects the output of add_typed_columns. Returns
+    (heads, latest, skipped): heads has one row per project (the first row
+    of its latest period, which carries the project-level fields), latest has
+    every typology row of that period, both ordered by the "_group" id.
+    """
+    # Sort so latest data wins: higher year + later period (2P > 1P)
     df = df.sort_values(["_year", "_period_sort"], ascending=[False, False])
 
-    # Group by project identity
-    grouped = df.groupby(["PROYECTO", "COMUNA_INCOIN"], sort=False)
+    # Group by project identity (rows without PROYECTO/COMUNA are dropped, as groupby does)
+    keys = ["PROYECTO", "COMUNA_INCOIN"]
+    df = df.dropna(subset=keys)
+    df["_group"] = df.groupby(keys, sort=False).ngroup()
+    heads = df.drop_duplicates("_group")
 
-    projects = []
-    typologies = []
-    skipped = 0
+    names = heads["PROYECTO"]
+    valid = (names.astype(bool) & heads["COMUNA_INCOIN"].astype(bool) & (names.astype(str) != "nan")).to_numpy()
+    skipped = int((~valid).sum())
 
-    for (project_name, commune), group in grouped:
-        if not project_name or not commune or str(project_name) == "nan":
-            skipped += 1
-            continue
+    # Broadcast each project's latest (year, period) back to its rows
+    groups = df["_group"].to_numpy()
+    head_year = heads["_year"].to_numpy()[groups]
+    head_period = heads["PERIODO"].to_numpy()[groups]
+    period = df["PERIODO"].to_numpy()
+    same_period = (period == head_period) | (pd.isna(period) & pd.isna(head_period))
+    latest = df[(df["_year"].to_numpy() == head_year) & same_period & valid[groups]]
+    latest = latest.sort_values("_group", kind="stable")
 
-        # Take latest period row(s) for this project
-        latest_year = group["_year"].iloc[0]
-        latest_period = group["PERIODO"].iloc[0]
-        latest_rows = group[
-            (group["_year"] == latest_year) & (group["PERIODO"] == latest_period)
-        ]
+    return heads[valid], latest, skipped
 
-        # Use first row for project-level data
-        row = latest_rows.iloc[0]
-
-        # Parse coordinates
-        lat, lon = fix_coordinates(row.get("LATITUD"), row.get("LONGITUD"))
-
-        # Aggregate units across typologies in the same period
-        total_stock = sum(parse_chilean_int(r.get("STOCK INICIAL", r.get("STOCK INICIAL (PERIODO)"))) or 0 for _, r in latest_rows.iterrows())
-        total_available = sum(parse_chilean_int(r.get("OFERTA DISPONIBLE (PERIODO)", r.get("OFERTA DISPONIBLE"))) or 0 for _, r in latest_rows.iterrows())
-        total_sold = sum(parse_chilean_int(r.get("UNIDADES VENDIDAS (PERIODO)", r.get("UNIDADES VENDIDAS"))) or 0 for _, r in latest_rows.iterrows())
-        total_offer = sum(parse_chilean_int(r.get("OFERTA DEL PERIODO", r.get("OFERTA DEL PERIODO"))) or 0 for _, r in latest_rows.iterrows())
-
-        # Average velocity across typologies
-        velocities_a = [parse_chilean_number(r.get("UNIDADES/MES (AÑO)", r.get("UNIDADES/MES (A)"))) for _, r in latest_rows.iterrows()]
-        velocities_a = [v for v in velocities_a if v is not None and v > 0]
-        avg_velocity_a = sum(velocities_a) / len(velocities_a) if velocities_a else None
-
-        velocities_p = [parse_chilean_number(r.get("UNIDADES/MES (PERIODO)", r.get("UNIDADES/MES (P)"))) for _, r in latest_rows.iterrows()]
-        velocities_p = [v for v in velocities_p if v is not None and v > 0]
-        avg_velocity_p = sum(velocities_p) / len(velocities_p) if velocities_p else None
-
-        # Price range across typologies
-        all_min_prices = [parse_chilean_number(r.get("PRECIO MINIMO UF")) for _, r in latest_rows.iterrows()]
-        all_max_prices = [parse_chilean_number(r.get("PRECIO MAXIMO UF")) for _, r in latest_rows.iterrows()]
-        all_avg_prices = [parse_chilean_number(r.get("PRECIO PROMEDIO")) for _, r in latest_rows.iterrows()]
-        all_uf_m2 = [parse_chilean_number(r.get("UF/M² PROMEDIO")) for _, r in latest_rows.iterrows()]
-
-        min_prices = [p for p in all_min_prices if p is not None and p > 0]
-        max_prices = [p for p in all_max_prices if p is not None and p > 0]
-        avg_prices = [p for p in all_avg_prices if p is not None and p > 0]
-        uf_m2_vals = [p for p in all_uf_m2 if p is not None and p > 0]
-
-        project = {
-            "name": str(project_name).strip(),
-            "commune": str(commune).strip(),
-            "region": str(row.get("REGION", "")).strip() or None,
-            "zona": str(row.get("ZONA", "")).strip() or None,
-            "address": str(row.get("DIRECCION", "")).strip() or None,
-            "street_number": str(row.get("NUMERO", "")).strip() or None,
-            "developer": str(row.get("DESARROLLADOR", "")).strip() or None,
-            "seller": str(row.get("VENDE", "")).strip() or None,
-            "builder": str(row.get("CONSTRUYE", "")).strip() or None,
-            "property_type": str(row.get("TIPO DE PROPIEDAD", "")).strip() or None,
-            "category": str(row.get("TIPO CATEGORIA", "")).strip() or None,
-            "project_status": str(row.get("ESTADO PROYECTO (PERIODO)", row.get("ESTADO PROYECTO", ""))).strip() or None,
-            "construction_status": str(row.get("ESTADO OBRA (PERIODO)", row.get("ESTADO OBRA", ""))).strip() or None,
-            "latitude": lat,
-            "longitude": lon,
-            # Period tracking
-            "year": int(latest_year) if latest_year else None,
-            "period": str(latest_period).strip() if latest_period else None,
-            # Dates
-            "sales_start_date": parse_date(row.get("INICIO VENTAS")),
-            "delivery_date": parse_date(row.get("FECHA ENTREGA ESTIMADA")),
-            # Units (aggregated across typologies)
-            "initial_stock": total_stock if total_stock > 0 else None,
-            "total_units": total_stock if total_stock > 0 else None,
-            "available_units": total_available,
-            "sold_units": total_sold,
-            "period_offer": total_offer if total_offer > 0 else None,
-            # Velocity
-            "sales_speed_monthly": round(avg_velocity_a, 2) if avg_velocity_a else None,
-            "velocity_projected": round(avg_velocity_p, 2) if avg_velocity_p else None,
-            "months_to_sell_out": parse_chilean_number(row.get("MESES PARA AGOTAR STOCK (PERIODO)", row.get("MESES PARA AGOTAR STOCK (A)"))),
-            "months_on_sale": parse_chilean_number(row.get("MESES EN VENTA (PERIODO)", row.get("MESES EN VENTA"))),
-            # Prices (range across typologies)
-            "min_price_uf": min(min_prices) if min_prices else None,
-            "max_price_uf": max(max_prices) if max_prices else None,
-            "avg_price_uf": round(sum(avg_prices) / len(avg_prices), 2) if avg_prices else None,
-            "avg_price_m2_uf": round(sum(uf_m2_vals) / len(uf_m2_vals), 2) if uf_m2_vals else None,
-            # Building
-            "total_floors": parse_chilean_int(row.get("NRO. PISOS")),
-            "total_apartments": total_stock if total_stock > 0 else None,
-            # Extras
-            "parking_count": parse_chilean_int(row.get("CANT ESTACIONAMIENTOS")),
-            "parking_price": parse_chilean_number(row.get("PRECIO ESTACIONAMIENTO")),
-            "storage_price": parse_chilean_number(row.get("PRECIO BODEGA")),
-            "pilot_available": parse_boolean(row.get("PILOTO DISPONIBLE")),
-            "sales_room": parse_boolean(row.get("SALA DE VENTAS EN EL PROYECTO")),
-            "discount_percentage": parse_percentage(row.get("DESCUENTO PROMEDIO")),
-            "subsidy_type": str(row.get("TIPO DE SUBSIDIO", "")).strip() or None,
-        }
-
-        # Clean None strings
-        for k, v in project.items():
-            if isinstance(v, str) and v.lower() in ("nan", "none", ""):
-                project[k] = None
-
-        projects.append(project)
-
-        # Build typologies for this project
-        for _, trow in latest_rows.iterrows():
-            typ_code = str(trow.get("TIPOLOGIA", "")).strip()
-            if not typ_code or typ_code == "nan":
-                continue
 
-            # Parse bedrooms/bathrooms from typology code like "1D-1B", "2D-2B"
-            beds, baths = None, None
-            typ_match = re.match(r"(\d+)D[+-](\d+)B", typ_code)
-            if typ_match:
-                beds = int(typ_match.group(1))
-                baths = int(typ_match.group(2))
-
-            surface = parse_chilean_number(trow.get("SUPERFICIE PROMEDIO"))
-            terrace = parse_chilean_number(trow.get("SUP TERRAZA PROMEDIO"))
-
-            typ = {
-                "_project_name": str(project_name).strip(),
-                "_project_commune": str(commune).strip(),
-                "name": str(trow.get("NOMBRE TIPOLOGIA", "")).strip() or typ_code,
-                "typology_code": typ_code,
-                "bedrooms": beds,
-                "bathrooms": baths,
-                "surface_total": surface,
-                "surface_indoor": round(surface - terrace, 2) if surface and terrace else surface,
-                "surface_terrace": terrace,
-                "land_surface": parse_chilean_number(trow.get("SUPERFICIE TERRENO")),
-                "kitchen_type": str(trow.get("TIPO DE COCINA", "")).strip() or None,
-                "parking_spots": parse_chilean_int(trow.get("PLAZAS")),
-                "avg_price_uf": parse_chilean_number(trow.get("PRECIO PROMEDIO")),
-                "price_per_m2_uf": parse_chilean_number(trow.get("UF/M² PROMEDIO")),
-                "min_price_uf": parse_chilean_number(trow.get("PRECIO MINIMO UF")),
-                "max_price_uf": parse_chilean_number(trow.get("PRECIO MAXIMO UF")),
-                "current_price_uf": parse_chilean_number(trow.get("PRECIO PROMEDIO")),
-                "stock": parse_chilean_int(trow.get("OFERTA DISPONIBLE (PERIODO)", trow.get("OFERTA DISPONIBLE"))),
-                "total_units": parse_chilean_int(trow.get("STOCK INICIAL (PERIODO)", trow.get("STOCK INICIAL"))),
-            }
-
-            # Clean
-            for k, v in typ.items():
-                if isinstance(v, str) and v.lower() in ("nan", "none", ""):
-                    typ[k] = None
-
-            typologies.append(typ)
+def transform_projects(df: pd.DataFrame) -> tuple[list[dict], list[dict]]:
+    """
+    Transform TINSA rows into projects and typologies.
+
+    Since each CSV row = one typology in one period for one project,
+    we group by (PROYECTO, COMUNA_INCOIN) and take the latest period.
+    Cells are parsed column-wise (see TINSA_COLUMN_TYPES) and the per-project
+    rollups (unit sums, positive-only velocity/price means, price ranges) are
+    computed for all projects at once with groupby/reduceat.
+
+    Returns: (projects_list, typologies_list)
+    """
+    return transform_typed(add_typed_columns(df))
+
+
+@profiled("transform")
+def transform_typed(df: pd.DataFrame) -> tuple[list[dict], list[dict]]:
+    """transform_projects for a frame that already went through add_typed_columns."""
+    heads, latest, skipped = select_latest_rows(df)
+    if heads.empty:
+        print(f"  Proyectos: 0, Tipologías: 0, Omitidos: {skipped}")
+        return [], []
+
+    # Project-level rollups over the latest period's typology rows
+    by_project = latest.groupby("_group", sort=True)
+    starts = _segment_starts(latest["_group"].to_numpy())
+
+    totals = by_project[["_stock_initial", "_available", "_sold", "_period_offer"]].sum()
+    total_stock = totals["_stock_initial"].tolist()
+    total_offer = totals["_period_offer"].tolist()
+    stock_or_none = [t if t > 0 else None for t in total_stock]
+
+    def positive(col: str) -> pd.Series:
+        return latest[col].where(latest[col] > 0)
+
+    min_prices = positive("_min_price").groupby(latest["_group"]).min()
+    max_prices = positive("_max_price").groupby(latest["_group"]).max()
+
+    missing = pd.Series(None, index=heads.index, dtype=object)
+    lat, lon, repairs = normalize_coordinates(
+        parse_chilean_number_series(heads["LATITUD"] if "LATITUD" in heads.columns else missing),
+        parse_chilean_number_series(heads["LONGITUD"] if "LONGITUD" in heads.columns else missing),
+    )
+    years = heads["_year"].tolist()
+
+    columns = {
+        "name": clean_text_series(heads["PROYECTO"]).tolist(),
+        "commune": clean_text_series(heads["COMUNA_INCOIN"]).tolist(),
+        "region": _values(heads["_region"]),
+        "zona": _values(heads["_zona"]),
+        "address": _values(heads["_address"]),
+        "street_number": _values(heads["_street_number"]),
+        "developer": _values(heads["_developer"]),
+        "seller": _values(heads["_seller"]),
+        "builder": _values(heads["_builder"]),
+        "property_type": _values(heads["_property_type"]),
+        "category": _values(heads["_category"]),
+        "project_status": _values(heads["_project_status"]),
+        "construction_status": _values(heads["_construction_status"]),
+        "latitude": _values(pd.Series(lat)),
+        "longitude": _values(pd.Series(lon)),
+        # Period tracking
+        "year": [y if y else None for y in years],
+        "period": clean_text_series(heads["PERIODO"]).tolist(),
+        # Dates
+        "sales_start_date": _values(heads["_sales_start_date"]),
+        "delivery_date": _values(heads["_delivery_date"]),
+        # Units (aggregated across typologies)
+        "initial_stock": stock_or_none,
+        "total_units": stock_or_none,
+        "available_units": totals["_available"].tolist(),
+        "sold_units": totals["_sold"].tolist(),
+        "period_offer": [t if t > 0 else None for t in total_offer],
+        # Velocity
+        "sales_speed_monthly": _round2(_positive_mean(latest["_velocity_a"], starts)),
+        "velocity_projected": _round2(_positive_mean(latest["_velocity_p"], starts)),
+        "months_to_sell_out": _values(heads["_months_to_sell_out"]),
+        "months_on_sale": _values(heads["_months_on_sale"]),
+        # Prices (range across typologies)
+        "min_price_uf": _values(min_prices),
+        "max_price_uf": _values(max_prices),
+        "avg_price_uf": _round2(_positive_mean(latest["_avg_price"], starts)),
+        "avg_price_m2_uf": _round2(_positive_mean(latest["_uf_m2"], starts)),
+        # Building
+        "total_floors": _values(heads["_total_floors"]),
+        "total_apartments": stock_or_none,
+        # Extras
+        "parking_count": _values(heads["_parking_count"]),
+        "parking_price": _values(heads["_parking_price"]),
+        "storage_price": _values(heads["_storage_price"]),
+        "pilot_available": _values(heads["_pilot_available"]),
+        "sales_room": _values(heads["_sales_room"]),
+        "discount_percentage": _values(heads["_discount_percentage"]),
+        "subsidy_type": _values(heads["_subsidy_type"]),
+    }
+    projects = _records(columns)
+    typologies = _typology_records(latest)
 
     print(f"  Proyectos: {len(projects)}, Tipologías: {len(typologies)}, Omitidos: {skipped}")
+    print(f"  Coordenadas: {format_repair_summary(repairs)}")
     return projects, typologies
 
 
+@profiled("typologies")
+def _typology_records(latest: pd.DataFrame) -> list[dict]:
+    """One project_typologies record per latest-period row with a TIPOLOGIA code."""
+    if "TIPOLOGIA" not in latest.columns:
+        return []
+    codes = latest["TIPOLOGIA"].astype(str).str.strip()
+    rows = latest[(codes != "") & (codes != "nan")]
+    codes = codes[rows.index]
+    if rows.empty:
+        return []
+
+    # Bedrooms/bathrooms from typology codes like "1D-1B", "2D-2B" (parsed once per distinct code)
+    rooms = typology_rooms(codes)
+    surface = rows["_surface"]
+    terrace = rows["_terrace"]
+
+    if "NOMBRE TIPOLOGIA" in rows.columns:
+        names = rows["NOMBRE TIPOLOGIA"].astype(str).str.strip()
+        names = names.where(names != "", codes)
+    else:
+        names = codes
+
+    columns = {
+        "_project_name": clean_text_series(rows["PROYECTO"]).tolist(),
+        "_project_commune": clean_text_series(rows["COMUNA_INCOIN"]).tolist(),
+        "name": clean_text_series(names).tolist(),
+        "typology_code": clean_text_series(codes).tolist(),
+        "bedrooms": _values(rooms["bedrooms"]),
+        "bathrooms": _values(rooms["bathrooms"]),
+        "surface_total": _values(surface),
+        "surface_indoor": indoor_surface(surface, terrace),
+        "surface_terrace": _values(terrace),
+        "land_surface": _values(rows["_land_surface"]),
+        "kitchen_type": _values(rows["_kitchen_type"]),
+        "parking_spots": _values(rows["_parking_spots"]),
+        "avg_price_uf": _values(rows["_avg_price"]),
+        "price_per_m2_uf": _values(rows["_uf_m2"]),
+        "min_price_uf": _values(rows["_min_price"]),
+        "max_price_uf": _values(rows["_max_price"]),
+        "current_price_uf": _values(rows["_avg_price"]),
+        "stock": _values(rows["_typology_stock"]),
+        "total_units": _values(rows["_typology_total_units"]),
+    }
+    return _records(columns)
+
+
+# Period snapshots for project_metrics_history: one row per project and
+# (AÑO, PERIODO). Aggregates are kept as partials (sums, positive sums and
+# counts, min/max, first row) so streaming chunks can be combined exactly.
+SNAPSHOT_KEYS = ["PROYECTO", "COMUNA_INCOIN", "_year", "_period_sort"]
+SNAPSHOT_MEANS = {
+    "sales_speed_monthly": "_velocity_a",
+    "velocity_projected": "_velocity_p",
+    "price_avg_uf": "_avg_price",
+    "price_avg_m2": "_uf_m2",
+}
+SNAPSHOT_AGG = {
+    "_stock_initial": "sum", "_available": "sum", "_sold": "sum",
+    "_min_price": "min", "_max_price": "max",
+    **{f"{col}_{part}": "sum" for col in SNAPSHOT_MEANS.values() for part in ("sum", "n")},
+}
+SNAPSHOT_FIRST = ["PERIODO", "_months_to_sell_out"]
+
+
+@profiled("snapshots")
+def snapshot_partials(df: pd.DataFrame) -> pd.DataFrame:
+    """Per (project, year, period) partial aggregates of a typed frame (or chunk)."""
+    df = df.dropna(subset=["PROYECTO", "COMUNA_INCOIN"])
+    names = df["PROYECTO"]
+    valid = names.astype(bool) & df["COMUNA_INCOIN"].astype(bool) & (names.astype(str) != "nan")
+    df = df[valid & (df["_year"] > 0) & df["_period_sort"].isin(list(SNAPSHOT_PERIOD_MONTHS))]
+
+    work = df[SNAPSHOT_KEYS + SNAPSHOT_FIRST + ["_stock_initial", "_available", "_sold"]].copy()
+    work["_min_price"] = df["_min_price"].where(df["_min_price"] > 0)
+    work["_max_price"] = df["_max_price"].where(df["_max_price"] > 0)
+    for col in SNAPSHOT_MEANS.values():
+        positive = df[col].where(df[col] > 0)
+        work[f"{col}_sum"] = positive.fillna(0.0)
+        work[f"{col}_n"] = positive.notna().astype("int64")
+
+    firsts = work.drop_duplicates(SNAPSHOT_KEYS).set_index(SNAPSHOT_KEYS)[SNAPSHOT_FIRST]
+    return work.groupby(SNAPSHOT_KEYS, sort=False).agg(SNAPSHOT_AGG).join(firsts)
+
+
+def combine_snapshot_partials(partials: list[pd.DataFrame]) -> pd.DataFrame:
+    """Merge partials of consecutive chunks (earlier chunks win the first-row fields)."""
+    parts = pd.concat(partials)
+    firsts = parts.loc[~parts.index.duplicated(), SNAPSHOT_FIRST]
+    return parts.groupby(level=list(range(len(SNAPSHOT_KEYS))), sort=False).agg(SNAPSHOT_AGG).join(firsts)
+
+
+def snapshot_records(parts: pd.DataFrame) -> list[dict]:
+    """Partials → project_metrics_history records, linked by _project_name/_project_commune."""
+    if parts.empty:
+        return []
+    index = parts.index
+    years = index.get_level_values("_year").tolist()
+    months = [SNAPSHOT_PERIOD_MONTHS[p] for p in index.get_level_values("_period_sort")]
+    means = {}
+    for field, col in SNAPSHOT_MEANS.items():
+        counts = parts[f"{col}_n"].to_numpy()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means[field] = np.where(counts > 0, parts[f"{col}_sum"].to_numpy() / counts, np.nan)
+
+    columns = {
+        "_project_name": clean_text_series(pd.Series(index.get_level_values("PROYECTO"))).tolist(),
+        "_project_commune": clean_text_series(pd.Series(index.get_level_values("COMUNA_INCOIN"))).tolist(),
+        "recorded_at": [f"{y}-{m:02d}-01" for y, m in zip(years, months)],
+        "year": years,
+        "period": clean_text_series(parts["PERIODO"]).tolist(),
+        "stock": _values(parts["_available"]),
+        "sold_accumulated": _values(parts["_sold"]),
+        "total_units": [t if t > 0 else None for t in parts["_stock_initial"].tolist()],
+        "sales_monthly": [None if v != v else int(round(v)) for v in means["sales_speed_monthly"]],
+        "sales_speed_monthly": _round2(means["sales_speed_monthly"]),
+        "velocity_projected": _round2(means["velocity_projected"]),
+        "price_avg_uf": _round2(means["price_avg_uf"]),
+        "price_avg_m2": _round2(means["price_avg_m2"]),
+        "min_price_uf": _values(parts["_min_price"]),
+        "max_price_uf": _values(parts["_max_price"]),
+        "months_to_sell_out": _values(parts["_months_to_sell_out"]),
+    }
+    return _records(columns)
+
+
+@profiled("snapshots")
+def transform_snapshots(df: pd.DataFrame) -> list[dict]:
+    """Period snapshots for every (AÑO, PERIODO) of every project in a typed frame."""
+    return snapshot_records(snapshot_partials(df))
+
+
+def _values(series: pd.Series) -> list:
+    """Typed column → list of plain Python values, None where missing."""
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def _records(columns: dict[str, list]) -> list[dict]:
+    """Column lists → list of row dicts (keys in column order)."""
+    keys = list(columns)
+    return [dict(zip(keys, row)) for row in zip(*columns.values())]
+
+
 # ---------------------------------------------------------------------------
 # Database operations
 # ---------------------------------------------------------------------------
 
 from collections import defaultdict
 
-def insert_projects(supabase: Client, projects: list[dict]) -> dict[str, str]:
-    """Insert projects and return mapping of (name, commune) → id."""
-    project_ids = {}
-    inserted = 0
-    errors = 0
+def _print_write_report(report: WriteReport):
+    print(f"  {report.summary()}")
+    for error in report.errors[:3]:
+        print(f"    Error: {error}")
+    slowest = report.slowest(3)
+    if slowest and report.requests > 1:
+        print("    Batches más lentos: " + ", ".join(f"{t * 1000:.0f} ms ({n} filas)" for t, n in slowest))
+
+
+def _project_payload(project: dict, keep_nulls: bool = False) -> dict:
+    """Project dict as sent to Supabase: None/'nan' values dropped unless keep_nulls."""
+    if keep_nulls:
+        return dict(project)
+    return {k: v for k, v in project.items() if v is not None and not (isinstance(v, str) and v.lower() in ("nan", "none", ""))}
 
+
+def insert_projects(supabase: Client | PostgresClient, projects: list[dict], keep_nulls: bool = False,
+                    batch_size: int = BATCH_SIZE, concurrency: int = UPLOAD_CONCURRENCY) -> dict[str, str]:
+    """
+    Insert projects and return mapping of (name, commune) → id.
+
+    None values are left out of the payload (existing columns are kept)
+    unless keep_nulls is set, in which case they are sent as NULL.
+    """
     # Group by shape (keys) to allow batch insert of dicts without None values
     groups = defaultdict(list)
     for p in projects:
-        clean_p = {k: v for k, v in p.items() if v is not None and not (isinstance(v, str) and v.lower() in ("nan", "none", ""))}
+        clean_p = _project_payload(p, keep_nulls)
         shape = tuple(sorted(clean_p.keys()))
         groups[shape].append(clean_p)
 
-    for shape, items in groups.items():
-        for i in range(0, len(items), BATCH_SIZE):
-            batch = items[i:i + BATCH_SIZE]
-            try:
-                res = supabase.table("projects").upsert(
-                    batch,
-                    on_conflict="name,commune"
-                ).execute()
-                if res.data:
-                    for p in res.data:
-                        project_ids[(p["name"], p["commune"])] = p["id"]
-                    inserted += len(res.data)
-            except Exception as e:
-                errors += 1
-                # Try one by one for this batch
-                for proj in batch:
-                    try:
-                        res = supabase.table("projects").upsert(
-                            proj,
-                            on_conflict="name,commune"
-                        ).execute()
-                        if res.data:
-                            p = res.data[0]
-                            project_ids[(p["name"], p["commune"])] = p["id"]
-                            inserted += 1
-                    except Exception as e2:
-                        pass
-        print(f"    Proyectos insertados: {inserted}/{len(projects)}...")
-
-    print(f"  Total proyectos insertados: {inserted}, errores: {errors}")
+    writer = make_writer(supabase, "projects", batch_size, concurrency)
+    report = writer.upsert(projects, on_conflict="name,commune", batches=list(groups.values()))
+
+    project_ids = {(p["name"], p["commune"]): p["id"] for p in report.data}
+    _print_write_report(report)
     return project_ids
 
 
-def insert_typologies(supabase: Client, typologies: list[dict], project_ids: dict[str, str]):
+def insert_typologies(supabase: Client | PostgresClient, typologies: list[dict], project_ids: dict[str, str],
+                      batch_size: int = BATCH_SIZE, concurrency: int = UPLOAD_CONCURRENCY):
     """Insert typologies linked to their projects."""
     # Resolve project_id from the mapping
     resolved = []
@@ -483,56 +749,430 @@ def insert_typologies(supabase: Client, typologies: list[dict], project_ids: dic
     if unresolved > 0:
         print(f"  Tipologías sin proyecto padre: {unresolved}")
 
-    # Delete existing typologies for these projects (to avoid duplicates on re-import)
+    writer = make_writer(supabase, "project_typologies", batch_size, concurrency)
+
+    # Delete existing typologies for these projects (to avoid duplicates on re-import).
+    # All deletes finish before the first insert is sent.
     unique_pids = list(set(t["project_id"] for t in resolved))
-    for i in range(0, len(unique_pids), BATCH_SIZE):
-        batch_pids = unique_pids[i:i + BATCH_SIZE]
-        try:
-            supabase.table("project_typologies").delete().in_("project_id", batch_pids).execute()
-        except Exception as e:
-            print(f"    Warning: No se pudieron borrar algunas tipologías previas (batch {i//BATCH_SIZE}): {e}")
+    deleted = writer.delete_in("project_id", unique_pids)
+    if deleted.failed:
+        print(f"    Warning: No se pudieron borrar tipologías previas de {deleted.failed} proyectos")
 
-    inserted = 0
-    for i in range(0, len(resolved), BATCH_SIZE):
-        batch = resolved[i:i + BATCH_SIZE]
-        try:
-            supabase.table("project_typologies").insert(batch).execute()
-            inserted += len(batch)
-            print(f"    Tipologías: {inserted}/{len(resolved)} insertadas...")
-        except Exception as e:
-            print(f"    Error batch tipologías: {e}")
-            # Try one by one
-            for typ in batch:
-                try:
-                    supabase.table("project_typologies").insert(typ).execute()
-                    inserted += 1
-                except Exception:
-                    pass
-
-    print(f"  Total tipologías insertadas: {inserted}")
+    report = writer.insert(resolved)
+    _print_write_report(report)
+
+
+def insert_snapshots(supabase: Client | PostgresClient, snapshots: list[dict], project_ids: dict[str, str],
+                     batch_size: int = SNAPSHOT_BATCH_SIZE, concurrency: int = UPLOAD_CONCURRENCY) -> WriteReport:
+    """Upsert period snapshots into project_metrics_history (one row per project and recorded_at)."""
+    rows, unresolved = [], 0
+    for snap in snapshots:
+        pid = project_ids.get((snap["_project_name"], snap["_project_commune"]))
+        if pid:
+            row = {k: v for k, v in snap.items() if k not in ("_project_name", "_project_commune", "_hash")}
+            row["project_id"] = pid
+            rows.append(row)
+        else:
+            unresolved += 1
+
+    if unresolved > 0:
+        print(f"  Snapshots sin proyecto padre: {unresolved}")
+
+    writer = make_writer(supabase, "project_metrics_history", batch_size, concurrency)
+    report = writer.upsert(rows, on_conflict="project_id,recorded_at")
+    _print_write_report(report)
+    return report
+
+
+def sync_projects(supabase: Client | PostgresClient, projects: list[dict], typologies: list[dict], file_path: Path,
+                  snapshots: list[dict] = (), delta: bool = False, batch_size: int = BATCH_SIZE,
+                  concurrency: int = UPLOAD_CONCURRENCY, released: set = frozenset()) -> dict[str, str]:
+    """
+    Write projects, typologies and period snapshots, recording content hashes
+    in the import manifest.
+
+    With delta=False every project is upserted and its typologies replaced
+    (same writes as insert_projects + insert_typologies). With delta=True only
+    projects whose payload changed since the last import of this file are
+    upserted, typology rows are inserted/deleted individually by hash and
+    only changed snapshots are upserted.
+
+    released lists projects now written from another file (see
+    assign_owners); they are dropped from this file's manifest.
+    """
+    manifest = load_manifest()
+    scope = manifest_scope(os.getenv("SUPABASE_URL", ""), file_path)
+    state = manifest["imports"].get(scope, {}) if delta else {}
+
+    payloads = [_project_payload(p) for p in projects]
+    plan = plan_delta(payloads, typologies, state, snapshots)
+    if delta:
+        print(f"   Delta: {len(plan.upsert)} proyectos a escribir, {plan.unchanged_projects} sin cambios")
+        print(f"          {len(plan.typology_inserts)} tipologías nuevas, {len(plan.typology_deletes)} a borrar, "
+              f"{plan.unchanged_typologies} sin cambios")
+        print(f"          {len(plan.snapshot_upserts)} snapshots a escribir, {plan.unchanged_snapshots} sin cambios")
+
+    print("\n   Proyectos...")
+    project_ids = dict(plan.known_ids)
+    written = insert_projects(supabase, plan.upsert, batch_size=batch_size, concurrency=concurrency) if plan.upsert else {}
+    failed_projects = {(p["name"], p["commune"]) for p in plan.upsert} - written.keys()
+    project_ids.update(written)
+
+    print("\n   Tipologías...")
+    writer = make_writer(supabase, "project_typologies", batch_size, concurrency)
+    resolved, unresolved = [], 0
+    for t in plan.typology_inserts:
+        pid = project_ids.get((t["_project_name"], t["_project_commune"]))
+        if pid:
+            resolved.append(t)
+        else:
+            unresolved += 1
+    if unresolved > 0:
+        print(f"  Tipologías sin proyecto padre: {unresolved}")
+
+    # Unknown typology rows (projects new to the manifest) are replaced wholesale;
+    # known ones are deleted by id. All deletes finish before the first insert.
+    replaced = [project_ids[k] for k in plan.replace if k in project_ids]
+    cleared = writer.delete_in("project_id", replaced)
+    removed = writer.delete_in("id", plan.typology_deletes)
+    if cleared.failed or removed.failed:
+        print(f"    Warning: No se pudieron borrar tipologías previas ({cleared.failed + removed.failed} fallidas)")
+
+    rows = [
+        {**{k: v for k, v in t.items() if k not in ("_project_name", "_project_commune", "_hash")},
+         "project_id": project_ids[(t["_project_name"], t["_project_commune"])]}
+        for t in resolved
+    ]
+    report = writer.insert(rows)
+    _print_write_report(report)
+
+    rejected_ids = {r["id"] for r in report.rejected}
+    inserted = [t for t in resolved if t["id"] not in rejected_ids]
+    deleted = set(plan.typology_deletes) - set(removed.rejected)
+
+    print("\n   Snapshots por periodo...")
+    written_snapshots = []
+    if plan.snapshot_upserts:
+        snap_report = insert_snapshots(supabase, plan.snapshot_upserts, project_ids, concurrency=concurrency)
+        rejected_keys = {(r["project_id"], r["recorded_at"]) for r in snap_report.rejected}
+        written_snapshots = [
+            s for s in plan.snapshot_upserts
+            if (s["_project_name"], s["_project_commune"]) in project_ids
+            and (project_ids[(s["_project_name"], s["_project_commune"])], s["recorded_at"]) not in rejected_keys
+        ]
+
+    new_state = updated_state(state, plan, project_ids, failed_projects, inserted, deleted, written_snapshots)
+    for key in released:
+        new_state.pop(project_key(*key), None)
+    manifest["imports"][scope] = new_state
+    save_manifest(manifest)
+    return project_ids
+
+
+def forget_import_manifest(file_path: Path):
+    """Drop the manifest entry of a file written outside sync_projects."""
+    manifest = load_manifest()
+    if manifest["imports"].pop(manifest_scope(os.getenv("SUPABASE_URL", ""), file_path), None) is not None:
+        save_manifest(manifest)
+
+
+# ---------------------------------------------------------------------------
+# Streaming import
+# ---------------------------------------------------------------------------
+
+def keep_latest_candidates(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Drop every row that can no longer be part of its project's latest period.
+
+    Keeps, per (PROYECTO, COMUNA_INCOIN), only the rows whose (_year,
+    _period_sort) equals the best seen so far, in their original order, so
+    select_latest_rows on the survivors gives the same result as on the
+    whole file.
+    """
+    df = df.dropna(subset=["PROYECTO", "COMUNA_INCOIN"])
+    rank = df["_year"] * 10 + df["_period_sort"]
+    best = rank.groupby([df["PROYECTO"], df["COMUNA_INCOIN"]], sort=False).transform("max")
+    return df[rank == best]
+
+
+def import_file_streaming(file_path: Path, dry_run: bool = True, chunk_rows: int = STREAM_CHUNK_ROWS,
+                          batch_size: int = BATCH_SIZE, concurrency: int = UPLOAD_CONCURRENCY,
+                          postgres: bool = False):
+    """
+    Import a TINSA CSV chunk by chunk with bounded memory.
+
+    Only the candidate rows for each project's latest period are kept between
+    chunks. In migrate mode the projects touched by each chunk are upserted
+    right away; when a later chunk brings a newer period the project is
+    upserted again, with explicit NULLs only for the fields an earlier flush
+    of this run set, so no field of the older period survives while values
+    already in the database before the import (e.g. geocoded coordinates)
+    are kept, as with import_file.
+    """
+    print(f"\n{'='*70}")
+    print(f"  IMPORTANDO (streaming): {file_path.name}")
+    print(f"  Tamaño: {file_path.stat().st_size / 1024 / 1024:.1f} MB")
+    print(f"  Modo: {'DRY-RUN (sin insertar)' if dry_run else 'MIGRACIÓN REAL'}")
+    print(f"{'='*70}")
+
+    supabase = None
+    if not dry_run:
+        supabase = get_postgres_client() if postgres else get_supabase_client()
+        # Typology rows are replaced outside the manifest: next --delta starts over
+        forget_import_manifest(file_path)
+    state = None
+    periods = None
+    total_rows = 0
+    project_ids = {}
+    flushed: dict[tuple, set] = {}  # (name, commune) → keys sent with a value so far
+
+    print("\n1. Leyendo CSV por chunks...")
+    for i, chunk in enumerate(profiled_chunks(iter_tinsa_csv(file_path, chunk_rows)), 1):
+        total_rows += len(chunk)
+        chunk = add_typed_columns(chunk)
+        state = keep_latest_candidates(chunk if state is None else pd.concat([state, chunk]))
+        partials = snapshot_partials(chunk)
+        periods = partials if periods is None else combine_snapshot_partials([periods, partials])
+        print(f"   Chunk {i}: {total_rows:,} filas leídas, {len(state):,} filas en estado")
+
+        if dry_run:
+            continue
+
+        # Upsert the projects whose latest-period rows came from this chunk
+        touched = state.index.isin(chunk.index)
+        touched_keys = pd.MultiIndex.from_frame(state.loc[touched, ["PROYECTO", "COMUNA_INCOIN"]]).unique()
+        in_touched = pd.MultiIndex.from_frame(state[["PROYECTO", "COMUNA_INCOIN"]]).isin(touched_keys)
+        projects, typologies = transform_typed(state[in_touched].copy())
+        first_time = [p for p in projects if (p["name"], p["commune"]) not in flushed]
+        again = []
+        for p in projects:
+            sent = flushed.get((p["name"], p["commune"]))
+            if sent is not None:
+                payload = _project_payload(p)
+                again.append({**{k: None for k in sent if k not in payload}, **payload})
+        ids = {}
+        with stage("upload") as profile:
+            if first_time:
+                ids.update(insert_projects(supabase, first_time, batch_size=batch_size, concurrency=concurrency))
+            if again:
+                ids.update(insert_projects(supabase, again, keep_nulls=True, batch_size=batch_size,
+                                           concurrency=concurrency))
+            insert_typologies(supabase, typologies, ids, batch_size=batch_size, concurrency=concurrency)
+            profile.rows += len(projects) + len(typologies)
+        project_ids.update(ids)
+        for p in projects:
+            flushed.setdefault((p["name"], p["commune"]), set()).update(_project_payload(p))
+
+    if state is None:
+        print("   El archivo no tiene filas.")
+        return
+
+    print("\n2. Transformando estado final...")
+    projects, typologies = transform_typed(state)
+    snapshots = snapshot_records(periods)
+
+    print(f"\n3. Resumen de transformación:")
+    print(f"   Filas leídas: {total_rows:,}")
+    print(f"   Proyectos únicos: {len(projects)}")
+    print(f"   Tipologías: {len(typologies)}")
+    print(f"   Snapshots por periodo: {len(snapshots)}")
+    with_coords = sum(1 for p in projects if p["latitude"] is not None)
+    print(f"   Con coordenadas válidas: {with_coords}/{len(projects)} ({100*with_coords//len(projects) if projects else 0}%)")
+
+    if dry_run:
+        print(f"\n   DRY-RUN completado. Para importar de verdad:")
+        print(f"   python -m app.etl.tinsa_importer --file {file_path} --stream --migrate")
+        return
+
+    print("\n4. Snapshots por periodo...")
+    with stage("upload") as profile:
+        insert_snapshots(supabase, snapshots, project_ids, concurrency=concurrency)
+        profile.rows += len(snapshots)
+
+    print(f"\n{'='*70}")
+    print(f"  IMPORTACIÓN COMPLETADA: {file_path.name}")
+    print(f"  Proyectos: {len(project_ids)}")
+    print(f"{'='*70}")
+
+
+# ---------------------------------------------------------------------------
+# Multi-file import
+# ---------------------------------------------------------------------------
+
+def scan_period_keys(file_path: Path, use_cache: bool = True) -> pd.DataFrame:
+    """Distinct (name, commune, _year, _period_sort) of a file, reading only the key columns."""
+    key_cols = {"PROYECTO", "COMUNA_INCOIN", "AÑO", "PERIODO"}
+    staged = read_staged(file_path, TINSA_STAGING_KEY) if use_cache else None
+    if staged is not None:
+        chunks = [staged[["PROYECTO", "COMUNA_INCOIN", "AÑO", "PERIODO"]].copy()]
+    else:
+        chunks = iter_tinsa_csv(file_path, usecols=lambda c: c in key_cols)
+    parts = []
+    for chunk in chunks:
+        chunk = _add_period_keys(chunk.dropna(subset=["PROYECTO", "COMUNA_INCOIN"]))
+        parts.append(pd.DataFrame({
+            "name": clean_text_series(chunk["PROYECTO"]),
+            "commune": clean_text_series(chunk["COMUNA_INCOIN"]),
+            "_year": chunk["_year"],
+            "_period_sort": chunk["_period_sort"],
+        }).drop_duplicates())
+    if not parts:
+        return pd.DataFrame(columns=["name", "commune", "_year", "_period_sort"])
+    return pd.concat(parts, ignore_index=True).drop_duplicates()
+
+
+def assign_owners(keys_by_file: list[pd.DataFrame]) -> list[tuple[set, set]]:
+    """
+    Decide which file writes each project and each period snapshot.
+
+    A project appearing in several files is written from the file holding its
+    latest (AÑO, PERIODO) (the first such file on ties). A period snapshot
+    comes from that same file when it has the period, otherwise from the
+    first file that does. Returns (project keys, (name, commune, recorded_at)
+    snapshot keys) per file.
+    """
+    keys = pd.concat([k.assign(_file=i) for i, k in enumerate(keys_by_file)], ignore_index=True)
+    project = ["name", "commune"]
+    keys["_rank"] = keys["_year"] * 10 + keys["_period_sort"]
+    winners = (keys.sort_values(["_rank", "_file"], ascending=[False, True], kind="stable")
+                   .drop_duplicates(project)[project + ["_file"]]
+                   .rename(columns={"_file": "_winner"}))
+    keys = keys.merge(winners, on=project)
+    keys["_not_winner"] = keys["_file"] != keys["_winner"]
+    periods = (keys[(keys["_year"] > 0) & keys["_period_sort"].isin(list(SNAPSHOT_PERIOD_MONTHS))]
+                   .sort_values(["_not_winner", "_file"], kind="stable")
+                   .drop_duplicates(project + ["_year", "_period_sort"]))
+    recorded_at = [f"{y}-{SNAPSHOT_PERIOD_MONTHS[p]:02d}-01" for y, p in zip(periods["_year"], periods["_period_sort"])]
+
+    owners = []
+    for i in range(len(keys_by_file)):
+        owned = winners[winners["_winner"] == i]
+        mine = (periods["_file"] == i).to_numpy()
+        owned_periods = {(n, c, r) for n, c, r, m in zip(periods["name"], periods["commune"], recorded_at, mine) if m}
+        owners.append((set(zip(owned["name"], owned["commune"])), owned_periods))
+    return owners
+
+
+def prepare_file(file_path: Path, owned_projects: set | None = None, owned_periods: set | None = None,
+                 use_cache: bool = True) -> dict:
+    """
+    Read + transform one file (runs in a worker process).
+
+    With owned_projects/owned_periods, projects, typologies and snapshots owned
+    by another file are dropped; the dropped project keys come back as
+    "released" so the file's import manifest forgets them. Owned snapshots of
+    projects written from another file come back as "foreign_snapshots": they
+    can only be linked once that file has been uploaded.
+    """
+    start = time.perf_counter()
+    typed = load_typed_frame(file_path, use_cache)
+    rows = len(typed)
+    projects, typologies = transform_typed(typed)
+    snapshots = transform_snapshots(typed)
+    del typed
+
+    released = set()
+    foreign_snapshots = []
+    if owned_projects is not None:
+        released = {(p["name"], p["commune"]) for p in projects} - owned_projects
+        projects = [p for p in projects if (p["name"], p["commune"]) in owned_projects]
+        typologies = [t for t in typologies if (t["_project_name"], t["_project_commune"]) in owned_projects]
+    if owned_periods is not None:
+        snapshots = [s for s in snapshots if (s["_project_name"], s["_project_commune"], s["recorded_at"]) in owned_periods]
+    if owned_projects is not None:
+        foreign_snapshots = [s for s in snapshots if (s["_project_name"], s["_project_commune"]) not in owned_projects]
+        snapshots = [s for s in snapshots if (s["_project_name"], s["_project_commune"]) in owned_projects]
+
+    return {
+        "file_path": file_path, "rows": rows, "projects": projects, "typologies": typologies,
+        "snapshots": snapshots, "foreign_snapshots": foreign_snapshots, "released": released,
+        "elapsed": time.perf_counter() - start,
+    }
+
+
+def import_files_parallel(files: list[Path], dry_run: bool = True, delta: bool = False,
+                          batch_size: int = BATCH_SIZE, concurrency: int = UPLOAD_CONCURRENCY,
+                          workers: int | None = None, use_cache: bool = True, postgres: bool = False):
+    """
+    Import several TINSA files: read + transform in a process pool, upload in
+    this process as each file becomes ready, so uploading one file overlaps
+    with transforming the next ones.
+
+    A cheap key scan runs first so cross-file duplicates are resolved by latest
+    period before anything is written: every project is written exactly once.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = workers or min(len(files), os.cpu_count() or 1)
+    print(f"\n{'='*70}")
+    print(f"  IMPORTANDO {len(files)} archivos en paralelo ({workers} procesos)")
+    print(f"  Modo: {'DRY-RUN (sin insertar)' if dry_run else 'MIGRACIÓN REAL'}")
+    print(f"{'='*70}")
+
+    start = time.perf_counter()
+    supabase = None if dry_run else (get_postgres_client() if postgres else get_supabase_client())
+    total_projects = 0
+    project_ids = {}
+    foreign_snapshots = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        print("\n1. Escaneando proyectos y periodos...")
+        owners = assign_owners(list(pool.map(scan_period_keys, files, [use_cache] * len(files))))
+        futures = [pool.submit(prepare_file, f, *owned, use_cache) for f, owned in zip(files, owners)]
+
+        for n, future in enumerate(futures, 2):
+            with stage("workers"):
+                result = future.result()
+            file_path = result["file_path"]
+            print(f"\n{n}. {file_path.name}: {result['rows']:,} filas transformadas en {result['elapsed']:.1f}s")
+            print(f"   Proyectos: {len(result['projects'])} (cedidos a otro archivo: {len(result['released'])})")
+            print(f"   Tipologías: {len(result['typologies'])}  "
+                  f"Snapshots: {len(result['snapshots']) + len(result['foreign_snapshots'])}")
+            total_projects += len(result["projects"])
+            foreign_snapshots.extend(result["foreign_snapshots"])
+            if dry_run:
+                continue
+            with stage("upload") as profile:
+                project_ids.update(sync_projects(
+                    supabase, result["projects"], result["typologies"], file_path, result["snapshots"],
+                    delta=delta, batch_size=batch_size, concurrency=concurrency, released=result["released"],
+                ))
+                profile.rows += len(result["projects"]) + len(result["typologies"]) + len(result["snapshots"])
+
+    if foreign_snapshots and not dry_run:
+        print(f"\n{len(files) + 2}. Snapshots de proyectos escritos desde otro archivo...")
+        with stage("upload") as profile:
+            insert_snapshots(supabase, foreign_snapshots, project_ids, concurrency=concurrency)
+            profile.rows += len(foreign_snapshots)
+
+    print(f"\n{'='*70}")
+    print(f"  {'DRY-RUN' if dry_run else 'IMPORTACIÓN'} COMPLETADA: {total_projects} proyectos en {time.perf_counter() - start:.1f}s")
+    print(f"{'='*70}")
 
 
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
 
-def import_file(file_path: Path, dry_run: bool = True):
-    """Import a single TINSA CSV file."""
+def import_file(file_path: Path, dry_run: bool = True, delta: bool = False,
+                batch_size: int = BATCH_SIZE, concurrency: int = UPLOAD_CONCURRENCY, use_cache: bool = True,
+                postgres: bool = False):
+    """Import a single TINSA CSV file (postgres: COPY into Postgres instead of the REST API)."""
     print(f"\n{'='*70}")
     print(f"  IMPORTANDO: {file_path.name}")
     print(f"  Tamaño: {file_path.stat().st_size / 1024 / 1024:.1f} MB")
     print(f"  Modo: {'DRY-RUN (sin insertar)' if dry_run else 'MIGRACIÓN REAL'}")
     print(f"{'='*70}")
 
-    # Read full CSV
+    # Read full CSV (or its staged typed frame)
     print("\n1. Leyendo CSV...")
-    df = read_tinsa_csv(file_path)
-    print(f"   Filas totales: {len(df):,}")
-    print(f"   Columnas: {len(df.columns)}")
+    typed = load_typed_frame(file_path, use_cache)
+    print(f"   Filas totales: {len(typed):,}")
+    print(f"   Columnas: {len(raw_columns(typed))}")
 
     # Transform
     print("\n2. Transformando datos...")
-    projects, typologies = transform_projects(df)
+    projects, typologies = transform_typed(typed)
+    snapshots = transform_snapshots(typed)
 
     if not projects:
         print("   No se generaron proyectos. Revisa el formato del CSV.")
@@ -542,6 +1182,7 @@ def import_file(file_path: Path, dry_run: bool = True):
     print(f"\n3. Resumen de transformación:")
     print(f"   Proyectos únicos: {len(projects)}")
     print(f"   Tipologías: {len(typologies)}")
+    print(f"   Snapshots por periodo: {len(snapshots)}")
 
     # Show sample project
     sample = projects[0]
@@ -564,14 +1205,13 @@ def import_file(file_path: Path, dry_run: bool = True):
         return
 
     # Real import
-    print("\n4. Insertando en Supabase...")
-    supabase = get_supabase_client()
-
-    print("\n   4a. Proyectos...")
-    project_ids = insert_projects(supabase, projects)
+    print(f"\n4. Insertando en {'Postgres (COPY)' if postgres else 'Supabase'}...")
+    supabase = get_postgres_client() if postgres else get_supabase_client()
 
-    print("\n   4b. Tipologías...")
-    insert_typologies(supabase, typologies, project_ids)
+    with stage("upload") as profile:
+        project_ids = sync_projects(supabase, projects, typologies, file_path, snapshots, delta=delta,
+                                    batch_size=batch_size, concurrency=concurrency)
+        profile.rows += len(projects) + len(typologies) + len(snapshots)
 
     print(f"\n{'='*70}")
     print(f"  IMPORTACIÓN COMPLETADA: {file_path.name}")
@@ -587,6 +1227,17 @@ def main():
     parser.add_argument("--migrate", action="store_true", help="Ejecutar importación real")
     parser.add_argument("--preview", action="store_true", help="Solo mostrar estructura del CSV")
     parser.add_argument("--all", action="store_true", help="Importar todos los archivos en data/")
+    parser.add_argument("--stream", action="store_true", help="Leer el CSV por chunks (memoria acotada)")
+    parser.add_argument("--chunk-rows", type=int, default=STREAM_CHUNK_ROWS, help="Filas por chunk en modo --stream")
+    parser.add_argument("--delta", action="store_true", help="Escribir solo proyectos/tipologías que cambiaron desde la última importación")
+    parser.add_argument("--no-cache", action="store_true", help="Ignorar el staging (data/staging/) y parsear el CSV")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos para leer/transformar archivos con --all")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Filas por request a Supabase")
+    parser.add_argument("--concurrency", type=int, default=UPLOAD_CONCURRENCY, help="Requests simultáneos a Supabase")
+    parser.add_argument("--postgres", action="store_true",
+                        help="Escribir directo en Postgres (COPY + INSERT ... ON CONFLICT) vía SUPABASE_DB_URL")
+    parser.add_argument("--profile", nargs="?", const="", default=None, metavar="RUTA",
+                        help="Medir tiempo, CPU y memoria por etapa; guarda un JSON (por defecto en data/profiles/)")
 
     args = parser.parse_args()
 
@@ -601,12 +1252,36 @@ def main():
                     print(f"\n  Archivo no encontrado: {f}")
         return
 
+    def profile(name: str):
+        return profiling(f"tinsa_importer {name}", Path(args.profile) if args.profile else None,
+                         enabled=args.profile is not None, migrate=args.migrate, stream=args.stream,
+                         delta=args.delta, postgres=args.postgres, batch_size=args.batch_size,
+                         concurrency=args.concurrency)
+
+    def run_import(file_path: Path):
+        if args.stream:
+            import_file_streaming(file_path, dry_run=not args.migrate, chunk_rows=args.chunk_rows,
+                                  batch_size=args.batch_size, concurrency=args.concurrency, postgres=args.postgres)
+        else:
+            import_file(file_path, dry_run=not args.migrate, delta=args.delta,
+                        batch_size=args.batch_size, concurrency=args.concurrency, use_cache=not args.no_cache,
+                        postgres=args.postgres)
+
     if args.all:
+        files = []
         for f in DEFAULT_FILES:
             if f.exists():
-                import_file(f, dry_run=not args.migrate)
+                files.append(f)
             else:
                 print(f"\n  Saltando (no encontrado): {f}")
+        with profile("all"):
+            if args.stream or len(files) < 2:
+                for f in files:
+                    run_import(f)
+            else:
+                import_files_parallel(files, dry_run=not args.migrate, delta=args.delta,
+                                      batch_size=args.batch_size, concurrency=args.concurrency, workers=args.workers,
+                                      use_cache=not args.no_cache, postgres=args.postgres)
         return
 
     if args.file:
@@ -614,13 +1289,19 @@ def main():
         if not file_path.exists():
             print(f"Archivo no encontrado: {file_path}")
             sys.exit(1)
-        import_file(file_path, dry_run=not args.migrate)
+        with profile(file_path.name):
+            run_import(file_path)
     else:
         print("Uso:")
         print("  python -m app.etl.tinsa_importer --preview")
         print("  python -m app.etl.tinsa_importer --file data/tinsa_norte_sur.csv")
         print("  python -m app.etl.tinsa_importer --file data/tinsa_norte_sur.csv --migrate")
+        print("  python -m app.etl.tinsa_importer --file data/tinsa_norte_sur.csv --stream --chunk-rows 20000 --migrate")
         print("  python -m app.etl.tinsa_importer --all --migrate")
+        print("  python -m app.etl.tinsa_importer --all --migrate --delta")
+        print("  python -m app.etl.tinsa_importer --all --migrate --batch-size 200 --concurrency 8")
+        print("  python -m app.etl.tinsa_importer --all --migrate --postgres")
+        print("  python -m app.etl.tinsa_importer --file data/tinsa_norte_sur.csv --profile")
         print()
 
         # Show what files exist
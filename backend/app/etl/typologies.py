@@ -0,0 +1,73 @@
+"""
+Typology normalization shared by the importers and mock_data.
+
+TINSA typology codes ("1D-1B", "2D+2B", "3D-2B", ...) encode bedrooms and
+bathrooms. A file has a handful of distinct codes repeated over thousands of
+rows, so codes are factorized, only the ones not seen before in this process
+go through the regex (one vectorized str.extract), and the result is kept in
+a module-level table reused by every later chunk and file:
+
+    rooms = typology_rooms(df["TIPOLOGIA"])      # Int64 bedrooms / bathrooms per row
+    typology_table()                             # code → bedrooms, bathrooms seen so far
+
+indoor_surface() derives surface_indoor (total minus terrace) for a whole
+column, rounding each distinct difference once.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+TYPOLOGY_PATTERN = r"^(\d+)D[+-](\d+)B"
+
+_rooms: dict[str, tuple] = {}  # code → (bedrooms, bathrooms), pd.NA when the code does not match
+
+
+def _learn(codes) -> None:
+    """Parse the codes not in the table yet, in one str.extract pass."""
+    new = [c for c in codes if c not in _rooms]
+    if not new:
+        return
+    parsed = pd.Series(new, dtype=object).str.extract(TYPOLOGY_PATTERN).astype("Int64")
+    _rooms.update(zip(new, zip(parsed[0].array, parsed[1].array)))
+
+
+def typology_rooms(codes: pd.Series) -> pd.DataFrame:
+    """
+    bedrooms / bathrooms (nullable Int64) for every code in a column; codes
+    that do not look like '<n>D±<m>B' give <NA>. Codes are stripped first.
+    """
+    keys, uniques = pd.factorize(codes.astype(str).str.strip())
+    _learn(uniques)
+    table = [_rooms[c] for c in uniques]
+    out = {}
+    for i, field in enumerate(("bedrooms", "bathrooms")):
+        values = pd.array([t[i] for t in table], dtype="Int64")
+        out[field] = values.take(keys) if len(keys) else pd.array([], dtype="Int64")
+    return pd.DataFrame(out, index=codes.index)
+
+
+def typology_table() -> pd.DataFrame:
+    """The codes normalized so far in this process, one row each (index: code)."""
+    return pd.DataFrame(
+        [(code, beds, baths) for code, (beds, baths) in _rooms.items()],
+        columns=["code", "bedrooms", "bathrooms"],
+    ).astype({"bedrooms": "Int64", "bathrooms": "Int64"}).set_index("code")
+
+
+def indoor_surface(surface: pd.Series, terrace: pd.Series) -> list:
+    """
+    surface_indoor per row: round(surface - terrace, 2) when both are present
+    and non-zero, else the total surface as is (None when missing). Python's
+    round() runs once per distinct difference, so values match a per-row loop.
+    """
+    surface = pd.Series(surface, dtype="float64")
+    terrace = pd.Series(terrace, dtype="float64", index=surface.index)
+    has_both = ((surface.fillna(0) != 0) & (terrace.fillna(0) != 0)).to_numpy()
+    diff = (surface - terrace).to_numpy()
+    keys, uniques = pd.factorize(diff[has_both])
+    rounded = np.array([round(d, 2) for d in uniques.tolist()], dtype=object)
+
+    out = np.array([None if s != s else s for s in surface.tolist()], dtype=object)
+    out[has_both] = rounded.take(keys) if len(keys) else []
+    return out.tolist()
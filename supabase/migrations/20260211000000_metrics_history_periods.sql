@@ -0,0 +1,12 @@
+-- Period snapshots written by the TINSA importer (one row per project and AÑO/PERIODO)
+-- recorded_at is the first day of the semester: 1P → YYYY-01-01, 2P → YYYY-07-01
+
+ALTER TABLE public.project_metrics_history ADD COLUMN IF NOT EXISTS year integer;
+ALTER TABLE public.project_metrics_history ADD COLUMN IF NOT EXISTS period text;                     -- '1P', '2P'
+ALTER TABLE public.project_metrics_history ADD COLUMN IF NOT EXISTS total_units integer;             -- STOCK INICIAL (sum of typologies)
+ALTER TABLE public.project_metrics_history ADD COLUMN IF NOT EXISTS sales_speed_monthly numeric(10,2); -- UNIDADES/MES (A)
+ALTER TABLE public.project_metrics_history ADD COLUMN IF NOT EXISTS velocity_projected numeric(10,2);  -- UNIDADES/MES (P)
+ALTER TABLE public.project_metrics_history ADD COLUMN IF NOT EXISTS min_price_uf numeric(10,2);       -- PRECIO MINIMO UF
+ALTER TABLE public.project_metrics_history ADD COLUMN IF NOT EXISTS max_price_uf numeric(10,2);       -- PRECIO MAXIMO UF
+
+CREATE INDEX IF NOT EXISTS project_metrics_history_recorded_at_idx ON public.project_metrics_history (recorded_at);
@@ -0,0 +1,17 @@
+-- Bulk coordinate write-back for app.etl.geocode_projects: one call per batch of
+-- [{"id": ..., "latitude": ..., "longitude": ...}, ...] instead of one UPDATE request per project.
+-- (An upsert of {id, latitude, longitude} would fail the NOT NULL checks on name/commune/region.)
+create or replace function update_project_coordinates(coords jsonb)
+returns integer
+language sql
+as $$
+  with updated as (
+    update public.projects p
+    set latitude = c.latitude,
+        longitude = c.longitude
+    from jsonb_to_recordset(coords) as c(id uuid, latitude numeric, longitude numeric)
+    where p.id = c.id
+    returning 1
+  )
+  select count(*)::integer from updated;
+$$;
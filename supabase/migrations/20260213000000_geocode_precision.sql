@@ -0,0 +1,20 @@
+-- Precision of each project's coordinates, as written by app.etl.geocode_projects:
+-- 'address' (provider or known address), 'street' (gazetteer street match), 'commune' (commune centroid)
+
+ALTER TABLE public.projects ADD COLUMN IF NOT EXISTS geocode_precision text;
+
+create or replace function update_project_coordinates(coords jsonb)
+returns integer
+language sql
+as $$
+  with updated as (
+    update public.projects p
+    set latitude = c.latitude,
+        longitude = c.longitude,
+        geocode_precision = coalesce(c.geocode_precision, p.geocode_precision)
+    from jsonb_to_recordset(coords) as c(id uuid, latitude numeric, longitude numeric, geocode_precision text)
+    where p.id = c.id
+    returning 1
+  )
+  select count(*)::integer from updated;
+$$;
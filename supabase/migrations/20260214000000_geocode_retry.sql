@@ -0,0 +1,45 @@
+-- Retry bookkeeping for app.etl.geocode_projects.
+-- geocoded_at: when the geocoder last wrote the row. Projects left at their commune
+-- centroid (geocode_precision = 'commune') are retried only once it is older than
+-- geocode_projects.RETRY_AFTER_DAYS, so unresolvable addresses don't hit the providers every run.
+
+ALTER TABLE public.projects ADD COLUMN IF NOT EXISTS geocoded_at timestamptz;
+
+-- Coordinates written by anything but the geocoder (importer upserts, manual edits)
+-- are source coordinates: clear geocode_precision so a centroid retry never overwrites them.
+create or replace function public.clear_geocode_precision()
+returns trigger as $$
+begin
+    if (new.latitude, new.longitude) is distinct from (old.latitude, old.longitude)
+       and new.geocoded_at is not distinct from old.geocoded_at then
+        new.geocode_precision = null;
+    end if;
+    return new;
+end;
+$$ language plpgsql;
+
+drop trigger if exists clear_geocode_precision on public.projects;
+create trigger clear_geocode_precision
+    before update of latitude, longitude on public.projects
+    for each row
+    execute procedure public.clear_geocode_precision();
+
+-- Only rows that still need geocoding (no coordinates, or still at the centroid) are
+-- written: an importer may have stored source coordinates since the geocoder read them.
+create or replace function update_project_coordinates(coords jsonb)
+returns integer
+language sql
+as $$
+  with updated as (
+    update public.projects p
+    set latitude = c.latitude,
+        longitude = c.longitude,
+        geocode_precision = coalesce(c.geocode_precision, p.geocode_precision),
+        geocoded_at = now()
+    from jsonb_to_recordset(coords) as c(id uuid, latitude numeric, longitude numeric, geocode_precision text)
+    where p.id = c.id
+      and (p.latitude is null or p.geocode_precision = 'commune')
+    returning 1
+  )
+  select count(*)::integer from updated;
+$$;